@@ -1,5 +1,22 @@
 // FishCar Arduino 控制程序（基于调试成功版本）
 // 协议: 串口接收 `V <vx> <vy> <omega>` 指令，返回状态行 `STATUS front=0 back=0 left=0 right=0`
+// 二进制协议（收到 `PROTO BIN` 后启用，与 raspi/src/serial_protocol.py 保持一致）:
+//   上行 7 字节: [0xA5][type][seq][vx][vy][omega][crc8]   type: 0x01=V, 0x02=PING
+//   下行 5 字节: [0xA6][type][seq][status][crc8]          type: 0x81=ACK, 0x82=PONG, 0x83=STATUS, 0x8E=NAK
+//   status 位: bit0=front bit1=back bit2=left bit3=right bit4=SPEED ERR bit5=碰撞限速
+//   crc8: CRC-8/SMBUS（多项式 0x07，初值 0），覆盖同步字节之后、crc 之前的字节
+// 波特率协商（上电固定 9600）:
+//   `BAUD?` -> `BAUDS 9600 115200 250000 500000`
+//   `BAUD <rate>` -> `BAUD OK <rate>` 后切换；1 秒内未收到 `BAUD CONFIRM` 则回退到原速率
+//   `ECHO <token>` -> 原样返回，用于切换后的链路验证
+// 心跳: `PING` -> `PONG`；`PING <seq>` -> `PONG <seq>`（用于往返时延测量）
+// 限位开关: 引脚变化中断 + 去抖，按下时立即在本地清零被阻挡的速度分量；
+//   STATUS 仅在限位变化时及每 500 ms 周期上报（不再随每条 V / PING 回复）
+//
+// 指令处理为逐字节状态机（固定缓冲区，无 String、无阻塞读、loop 无 delay）。
+// 时延上界：最后一个字节到达后，下一次 loop 迭代（< 1 ms）内完成解析与 I2C 写入（约 0.6 ms @100kHz），
+// 即“指令到电机”时延 ≤ 指令在线路上的传输时间 + 2 ms（见 raspi/src/serial_protocol.py 中的
+// FIRMWARE_PROCESSING_BOUND）。速度未变化时不重复写 I2C。
 
 #include <Wire.h>
 
@@ -15,8 +32,65 @@
 
 #define MOTOR_TYPE_JGB                3
 
+#define HOST_SYNC         0xA5
+#define DEVICE_SYNC       0xA6
+#define HOST_FRAME_LEN    7
+#define CMD_VECTOR        0x01
+#define CMD_PING          0x02
+#define REPLY_ACK         0x81
+#define REPLY_PONG        0x82
+#define REPLY_STATUS      0x83
+#define REPLY_NAK         0x8E
+
+#define LINE_BUFFER_SIZE  48
+#define FRAME_TIMEOUT_MS  20  // 二进制帧字节间最大间隔，超时丢弃残帧
+
+#define INITIAL_BAUD            9600
+#define BAUD_CONFIRM_TIMEOUT_MS 1000
+
+#define STATUS_FRONT      0x01
+#define STATUS_BACK       0x02
+#define STATUS_LEFT       0x04
+#define STATUS_RIGHT      0x08
+#define STATUS_SPEED_ERR  0x10
+#define STATUS_COLLISION  0x20
+
+#define LIMIT_DEBOUNCE_MS   5    // 开关松开需稳定的时间；按下立即生效
+#define STATUS_INTERVAL_MS  500  // 限位状态无变化时的周期上报间隔
+
 uint8_t motorType = MOTOR_TYPE_JGB;
 uint8_t motorEncoderPolarity = 0;  // 可根据电机线序调整
+bool binaryMode = false;  // 收到 PROTO BIN 后置位，碰撞提示不再以文本输出
+
+// 16MHz AVR 上误差可接受的波特率
+const long SUPPORTED_BAUDS[] = {9600, 115200, 250000, 500000};
+const uint8_t SUPPORTED_BAUD_COUNT = sizeof(SUPPORTED_BAUDS) / sizeof(SUPPORTED_BAUDS[0]);
+long currentBaud = INITIAL_BAUD;
+long previousBaud = INITIAL_BAUD;
+unsigned long baudConfirmDeadline = 0;  // 非 0 表示正在等待新波特率的确认
+
+// 接收状态机
+char lineBuffer[LINE_BUFFER_SIZE];
+uint8_t lineLength = 0;
+bool lineOverflow = false;
+uint8_t frameBuffer[HOST_FRAME_LEN];
+uint8_t frameLength = 0;  // > 0 表示正在接收二进制帧
+unsigned long lastFrameByteMs = 0;
+
+// 限位开关：引脚变化中断记录原始电平，loop() 中去抖
+volatile uint8_t rawLimitBits = 0;
+volatile unsigned long lastLimitEdgeMs = 0;
+uint8_t limitBits = 0;  // 去抖后的限位状态（STATUS_* 位）
+unsigned long lastStatusMs = 0;
+
+// 上位机最近一次请求的速度（限速前），开关触发时据此在本地重新限速
+int commandVx = 0;
+int commandVy = 0;
+int commandOmega = 0;
+
+// 最近一次写入电机驱动的速度，相同速度不重复写 I2C
+int8_t lastSpeeds[4] = {0, 0, 0, 0};
+bool lastSpeedsValid = false;
 
 bool wireWriteData(uint8_t reg, uint8_t* val, unsigned int len) {
   Wire.beginTransmission(I2C_ADDR);
@@ -27,6 +101,45 @@ bool wireWriteData(uint8_t reg, uint8_t* val, unsigned int len) {
   return Wire.endTransmission() == 0;
 }
 
+uint8_t crc8(const uint8_t* data, uint8_t len) {
+  uint8_t crc = 0;
+  for (uint8_t i = 0; i < len; i++) {
+    crc ^= data[i];
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (uint8_t)((crc << 1) ^ 0x07) : (uint8_t)(crc << 1);
+    }
+  }
+  return crc;
+}
+
+void sendReply(uint8_t type, uint8_t seq, uint8_t status) {
+  uint8_t frame[5] = {DEVICE_SYNC, type, seq, status, 0};
+  frame[4] = crc8(frame + 1, 3);
+  Serial.write(frame, sizeof(frame));
+}
+
+// 直接读端口寄存器（ATmega328P：D2~D5 对应 PD2~PD5），可在中断中调用
+uint8_t sampleLimitPins() {
+  uint8_t pressed = ~PIND;  // 上拉输入，按下为低电平
+  uint8_t bits = 0;
+  if (pressed & _BV(FRONT_PIN)) bits |= STATUS_FRONT;
+  if (pressed & _BV(BACK_PIN)) bits |= STATUS_BACK;
+  if (pressed & _BV(LEFT_PIN)) bits |= STATUS_LEFT;
+  if (pressed & _BV(RIGHT_PIN)) bits |= STATUS_RIGHT;
+  return bits;
+}
+
+ISR(PCINT2_vect) {
+  rawLimitBits = sampleLimitPins();
+  lastLimitEdgeMs = millis();
+}
+
+void enableLimitInterrupts() {
+  PCMSK2 |= _BV(FRONT_PIN) | _BV(BACK_PIN) | _BV(LEFT_PIN) | _BV(RIGHT_PIN);
+  PCIFR |= _BV(PCIF2);
+  PCICR |= _BV(PCIE2);
+}
+
 void publishStatus(bool front, bool back, bool left, bool right) {
   Serial.print("STATUS front=");
   Serial.print(front ? 1 : 0);
@@ -38,12 +151,19 @@ void publishStatus(bool front, bool back, bool left, bool right) {
   Serial.println(right ? 1 : 0);
 }
 
-void setMotorSpeeds(int8_t speeds[4]) {
-  if (wireWriteData(MOTOR_FIXED_SPEED_ADDR, (uint8_t*)speeds, 4)) {
-    Serial.println("SPEED OK");
+// 速度未变化时跳过 I2C 写入；返回是否成功
+bool setMotorSpeeds(int8_t speeds[4]) {
+  if (lastSpeedsValid && memcmp(speeds, lastSpeeds, sizeof(lastSpeeds)) == 0) {
+    return true;
+  }
+  bool ok = wireWriteData(MOTOR_FIXED_SPEED_ADDR, (uint8_t*)speeds, 4);
+  if (ok) {
+    memcpy(lastSpeeds, speeds, sizeof(lastSpeeds));
+    lastSpeedsValid = true;
   } else {
-    Serial.println("SPEED ERR");
+    lastSpeedsValid = false;  // 下次强制重写
   }
+  return ok;
 }
 
 void calculateMecanum(int vx, int vy, int omega, int8_t speeds[4]) {
@@ -54,34 +174,234 @@ void calculateMecanum(int vx, int vy, int omega, int8_t speeds[4]) {
   speeds[3] = constrain(vx + vy - omega * r, -127, 127);  // RR
 }
 
-void applyCollisionGuards(int& vx, int& vy) {
-  bool front = (digitalRead(FRONT_PIN) == LOW);
-  bool back = (digitalRead(BACK_PIN) == LOW);
-  bool left = (digitalRead(LEFT_PIN) == LOW);
-  bool right = (digitalRead(RIGHT_PIN) == LOW);
-
-  if (front && vy > 0) {
+// 根据限位状态清零被阻挡的速度分量，返回是否发生了限速
+bool applyCollisionGuards(int& vx, int& vy, uint8_t limits) {
+  bool clipped = false;
+  if ((limits & STATUS_FRONT) && vy > 0) {
     vy = 0;
-    Serial.println("COLLISION_FRONT");
+    clipped = true;
+    if (!binaryMode) Serial.println("COLLISION_FRONT");
   }
-  if (back && vy < 0) {
+  if ((limits & STATUS_BACK) && vy < 0) {
     vy = 0;
-    Serial.println("COLLISION_BACK");
+    clipped = true;
+    if (!binaryMode) Serial.println("COLLISION_BACK");
   }
-  if (left && vx < 0) {
+  if ((limits & STATUS_LEFT) && vx < 0) {
     vx = 0;
-    Serial.println("COLLISION_LEFT");
+    clipped = true;
+    if (!binaryMode) Serial.println("COLLISION_LEFT");
   }
-  if (right && vx > 0) {
+  if ((limits & STATUS_RIGHT) && vx > 0) {
     vx = 0;
-    Serial.println("COLLISION_RIGHT");
+    clipped = true;
+    if (!binaryMode) Serial.println("COLLISION_RIGHT");
+  }
+  return clipped;
+}
+
+void publishStatusBits(uint8_t limits) {
+  publishStatus(limits & STATUS_FRONT, limits & STATUS_BACK, limits & STATUS_LEFT, limits & STATUS_RIGHT);
+}
+
+// 上报当前限位状态：文本协议输出 STATUS 行，二进制协议发送 STATUS 帧
+void reportLimits() {
+  if (binaryMode) {
+    sendReply(REPLY_STATUS, 0, limitBits);
+  } else {
+    publishStatusBits(limitBits);
+  }
+  lastStatusMs = millis();
+}
+
+bool isSupportedBaud(long rate) {
+  for (uint8_t i = 0; i < SUPPORTED_BAUD_COUNT; i++) {
+    if (SUPPORTED_BAUDS[i] == rate) return true;
+  }
+  return false;
+}
+
+void switchBaud(long rate) {
+  Serial.flush();  // 等待回复以原速率发送完毕
+  Serial.end();
+  Serial.begin(rate);
+  currentBaud = rate;
+}
+
+void handleBaudCommand(const char* cmd) {
+  if (strcmp(cmd, "BAUD?") == 0) {
+    Serial.print("BAUDS");
+    for (uint8_t i = 0; i < SUPPORTED_BAUD_COUNT; i++) {
+      Serial.print(' ');
+      Serial.print(SUPPORTED_BAUDS[i]);
+    }
+    Serial.println();
+  } else if (strcmp(cmd, "BAUD CONFIRM") == 0) {
+    baudConfirmDeadline = 0;
+    Serial.println("BAUD CONFIRMED");
+  } else {
+    long rate = atol(cmd + 5);
+    if (!isSupportedBaud(rate)) {
+      Serial.println("BAUD ERR");
+      return;
+    }
+    Serial.print("BAUD OK ");
+    Serial.println(rate);
+    previousBaud = currentBaud;
+    switchBaud(rate);
+    baudConfirmDeadline = millis() + BAUD_CONFIRM_TIMEOUT_MS;
+    if (baudConfirmDeadline == 0) baudConfirmDeadline = 1;
+  }
+}
+
+// 解析 "<vx> <vy> <omega>"，三个整数都存在才返回 true
+bool parseVector(const char* args, int& vx, int& vy, int& omega) {
+  long values[3];
+  const char* cursor = args;
+  for (uint8_t i = 0; i < 3; i++) {
+    char* end;
+    values[i] = strtol(cursor, &end, 10);
+    if (end == cursor) return false;
+    cursor = end;
+  }
+  vx = (int)values[0];
+  vy = (int)values[1];
+  omega = (int)values[2];
+  return true;
+}
+
+// 按当前限位状态限速后写入电机
+void applyCommand(bool& clipped, bool& ok) {
+  int vx = commandVx;
+  int vy = commandVy;
+  clipped = applyCollisionGuards(vx, vy, limitBits);
+  int8_t speeds[4];
+  calculateMecanum(vx, vy, commandOmega, speeds);
+  ok = setMotorSpeeds(speeds);
+}
+
+void driveVector(int vx, int vy, int omega, bool& clipped, bool& ok) {
+  commandVx = vx;
+  commandVy = vy;
+  commandOmega = omega;
+  applyCommand(clipped, ok);
+}
+
+// 去抖并处理限位变化：新按下的开关立即在本地清零对应速度分量，不等待上位机
+void updateLimits() {
+  noInterrupts();
+  uint8_t raw = rawLimitBits;
+  unsigned long edgeMs = lastLimitEdgeMs;
+  interrupts();
+
+  uint8_t next = limitBits | raw;  // 按下立即生效，抖动不会造成误松开
+  if (millis() - edgeMs >= LIMIT_DEBOUNCE_MS) {
+    next = raw;  // 电平稳定后才接受松开
+  }
+  if (next != limitBits) {
+    bool newlyPressed = (next & ~limitBits) != 0;
+    limitBits = next;
+    if (newlyPressed) {
+      bool clipped, ok;
+      applyCommand(clipped, ok);
+    }
+    reportLimits();
+  } else if (millis() - lastStatusMs >= STATUS_INTERVAL_MS) {
+    reportLimits();
+  }
+}
+
+// 处理一个完整的二进制上行帧
+void handleBinaryFrame(const uint8_t* frame) {
+  uint8_t type = frame[1];
+  uint8_t seq = frame[2];
+  if (crc8(frame + 1, HOST_FRAME_LEN - 2) != frame[HOST_FRAME_LEN - 1]) {
+    sendReply(REPLY_NAK, seq, limitBits);
+    return;
   }
 
-  publishStatus(front, back, left, right);
+  if (type == CMD_VECTOR) {
+    bool clipped, ok;
+    driveVector((int8_t)frame[3], (int8_t)frame[4], (int8_t)frame[5], clipped, ok);
+    uint8_t status = limitBits;
+    if (clipped) status |= STATUS_COLLISION;
+    if (!ok) status |= STATUS_SPEED_ERR;
+    sendReply(REPLY_ACK, seq, status);
+  } else if (type == CMD_PING) {
+    sendReply(REPLY_PONG, seq, limitBits);
+  } else {
+    sendReply(REPLY_NAK, seq, limitBits);
+  }
+}
+
+// 处理一行文本指令（已去掉行尾）
+void handleTextCommand(const char* cmd) {
+  if (cmd[0] == 'V' && cmd[1] == ' ') {
+    int vx, vy, omega;
+    if (!parseVector(cmd + 2, vx, vy, omega)) {
+      Serial.println("CMD ERR");
+      return;
+    }
+    bool clipped, ok;
+    driveVector(vx, vy, omega, clipped, ok);
+    Serial.println(ok ? "SPEED OK" : "SPEED ERR");
+  } else if (strcmp(cmd, "BAUD?") == 0 || strncmp(cmd, "BAUD ", 5) == 0) {
+    handleBaudCommand(cmd);
+  } else if (strncmp(cmd, "ECHO ", 5) == 0) {
+    Serial.println(cmd);
+  } else if (strcmp(cmd, "PROTO BIN") == 0) {
+    binaryMode = true;
+    Serial.println("PROTO BIN OK");
+  } else if (strcmp(cmd, "PROTO TEXT") == 0) {
+    binaryMode = false;
+    Serial.println("PROTO TEXT OK");
+  } else if (strcmp(cmd, "PING") == 0 || strncmp(cmd, "PING ", 5) == 0) {
+    // 带序号的心跳原样回传序号，供上位机计算往返时延
+    if (cmd[4] == ' ') {
+      Serial.print("PONG ");
+      Serial.println(cmd + 5);
+    } else {
+      Serial.println("PONG");
+    }
+  } else if (cmd[0] != '\0') {
+    Serial.println("UNKNOWN");
+  }
+}
+
+// 逐字节状态机：行首的同步字节开始二进制帧，其余字节累积为文本行
+void processByte(uint8_t c) {
+  if (frameLength > 0 || (lineLength == 0 && !lineOverflow && c == HOST_SYNC)) {
+    frameBuffer[frameLength++] = c;
+    lastFrameByteMs = millis();
+    if (frameLength == HOST_FRAME_LEN) {
+      handleBinaryFrame(frameBuffer);
+      frameLength = 0;
+    }
+    return;
+  }
+
+  if (c == '\n') {
+    if (lineOverflow) {
+      Serial.println("CMD ERR");
+    } else {
+      // 去掉行尾空白（兼容 \r\n）
+      while (lineLength > 0 && (lineBuffer[lineLength - 1] == '\r' || lineBuffer[lineLength - 1] == ' ')) {
+        lineLength--;
+      }
+      lineBuffer[lineLength] = '\0';
+      handleTextCommand(lineBuffer);
+    }
+    lineLength = 0;
+    lineOverflow = false;
+  } else if (lineLength < LINE_BUFFER_SIZE - 1) {
+    lineBuffer[lineLength++] = (char)c;
+  } else {
+    lineOverflow = true;  // 丢弃超长行，直到下一个换行
+  }
 }
 
 void setup() {
-  Serial.begin(9600);
+  Serial.begin(INITIAL_BAUD);
   while (!Serial) {}
 
   pinMode(FRONT_PIN, INPUT_PULLUP);
@@ -95,44 +415,29 @@ void setup() {
   delay(5);
   wireWriteData(MOTOR_ENCODER_POLARITY_ADDR, &motorEncoderPolarity, 1);
 
-  publishStatus(false, false, false, false);
+  limitBits = sampleLimitPins();
+  rawLimitBits = limitBits;
+  enableLimitInterrupts();
+
+  reportLimits();
   Serial.println("READY");
 }
 
 void loop() {
-  if (Serial.available() > 0) {
-    String cmd = Serial.readStringUntil('\n');
-    cmd.trim();
-
-    if (cmd.startsWith("V ")) {
-      int first = cmd.indexOf(' ', 2);
-      int second = cmd.indexOf(' ', first + 1);
-      if (first > 0 && second > first) {
-        int vx = cmd.substring(2, first).toInt();
-        int vy = cmd.substring(first + 1, second).toInt();
-        int omega = cmd.substring(second + 1).toInt();
-
-        applyCollisionGuards(vx, vy);
-
-        int8_t speeds[4];
-        calculateMecanum(vx, vy, omega, speeds);
-        setMotorSpeeds(speeds);
-      } else {
-        Serial.println("CMD ERR");
-      }
-    } else if (cmd == "PING") {
-      publishStatus(
-        digitalRead(FRONT_PIN) == LOW,
-        digitalRead(BACK_PIN) == LOW,
-        digitalRead(LEFT_PIN) == LOW,
-        digitalRead(RIGHT_PIN) == LOW
-      );
-      Serial.println("PONG");
-    } else {
-      Serial.println("UNKNOWN");
-    }
+  updateLimits();
+
+  // 新波特率未在超时内确认：回退到切换前的速率
+  if (baudConfirmDeadline != 0 && (long)(millis() - baudConfirmDeadline) >= 0) {
+    baudConfirmDeadline = 0;
+    switchBaud(previousBaud);
   }
 
-  delay(20);
-}
+  // 残缺的二进制帧（字节丢失）超时丢弃，避免吞掉后续指令
+  if (frameLength > 0 && millis() - lastFrameByteMs > FRAME_TIMEOUT_MS) {
+    frameLength = 0;
+  }
 
+  while (Serial.available() > 0) {
+    processByte((uint8_t)Serial.read());
+  }
+}
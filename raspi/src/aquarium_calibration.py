@@ -39,6 +39,14 @@ class AquariumBounds:
             self.bottom_left
         ], dtype=np.float32)
 
+    def normalization_homography(self) -> np.ndarray:
+        """
+        计算像素坐标到鱼缸归一化坐标的单应矩阵（3x3）
+        四个角点分别映射到 (-1, -1)、(1, -1)、(1, 1)、(-1, 1)，可校正透视倾斜
+        """
+        target = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=np.float32)
+        return cv2.getPerspectiveTransform(self.to_array(), target)
+
     def get_rect(self) -> tuple[int, int, int, int]:
         """获取边界矩形 (x, y, width, height)"""
         x_coords = [self.top_left[0], self.top_right[0], 
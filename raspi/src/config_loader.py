@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Sequence
 
 import yaml
 
@@ -37,6 +38,19 @@ class MotionMappingConfig:
     invert_y: bool
     reference_width: int
     reference_height: int
+    # 坐标归一化方式："frame"（按 reference_width/height）或 "aquarium"（按标定角点的单应变换）
+    normalization: str = "frame"
+    # 控制模式："proportional"（纯比例，默认）或 "pid"
+    mode: str = "proportional"
+    # PID 模式参数（比例增益沿用 gain_x / gain_y，gain_rotation 作为方位角增益）
+    ki: float = 0.0
+    kd: float = 0.0
+    derivative_tau: float = 0.05  # 微分项低通滤波时间常数（秒）
+    integral_limit: float = 0.5  # 积分项限幅
+    feedforward_gain: float = 0.0  # 目标速度前馈增益（0 表示关闭）
+    reference_x: float = 0.0  # 小车参考点（归一化坐标）
+    reference_y: float = 0.0
+    max_dt: float = 0.5  # 帧间隔超过该值时重置控制器状态（秒）
 
 
 @dataclass(frozen=True)
@@ -46,6 +60,34 @@ class SerialConfig:
     timeout: float
     heartbeat_interval: float
     watchdog_timeout: float
+    # 通信协议："text"（默认）或 "binary"（连接时协商，固件不支持时回退到文本）
+    protocol: str = "text"
+    handshake_timeout: float = 2.5  # 协议协商超时（秒），需覆盖 Arduino 上电复位时间
+    # 连接后尝试提升到的波特率（从高到低尝试，空列表表示保持 baudrate）
+    baud_candidates: tuple[int, ...] = ()
+    # 写线程：相同指令去重（保活间隔内不重复发送），需小于 watchdog_timeout 以保证状态持续刷新
+    suppress_repeats: bool = True
+    keepalive_interval: float = 0.2
+    coalesce_heartbeat: bool = True  # 指令与心跳同时待发时合并为一次写入
+    # 断线自动重连：指数退避，按 USB VID/PID 重新发现串口（未配置时沿用首次连接设备的 VID/PID）
+    reconnect: bool = True
+    reconnect_initial_delay: float = 0.05
+    reconnect_max_delay: float = 2.0
+    usb_vid: int | None = None
+    usb_pid: int | None = None
+    # 链路丢失检测（固件复位但 USB 未重新枚举时串口不会报错）：收到 READY、连续 link_error_threshold 次
+    # 解析/CRC 错误、或超过 link_loss_factor * watchdog_timeout 未收到有效消息时按断线处理；0 表示关闭对应检测
+    link_error_threshold: int = 16
+    link_loss_factor: float = 4.0
+    capture_path: str | None = None  # 串口收发抓包文件（None 表示关闭），用 src.serial_capture 统计与回放
+
+
+@dataclass(frozen=True)
+class LoopWatchdogConfig:
+    # 主循环任一阶段（读帧/推理/控制/渲染）超过该时间（秒）未完成时由看门狗线程直接停车；0 表示关闭
+    deadline: float = 0.5
+    # 推理阶段单独的截止时间：树莓派上 YOLO 单帧推理可能超过 deadline；0 表示不检查推理阶段
+    detect_deadline: float = 2.0
 
 
 @dataclass(frozen=True)
@@ -57,6 +99,12 @@ class VisualizationConfig:
     show_aquarium_bounds: bool
     show_relative_coords: bool
     show_trajectory: bool
+    # MJPEG 推流（无显示环境时通过浏览器查看实时画面）
+    stream_enabled: bool = False
+    stream_host: str = "127.0.0.1"  # 无认证，0.0.0.0 会对整个网络开放摄像头画面
+    stream_port: int = 8080
+    stream_fps: float = 10.0
+    stream_quality: int = 70  # JPEG 质量 1~100
 
 
 @dataclass(frozen=True)
@@ -65,6 +113,16 @@ class TrajectoryConfig:
     max_points: int
     sample_interval: float
     save_path: str | None
+    detection_log_path: str | None = None  # 逐帧检测结果 CSV（离线调参使用）
+    # 流式轨迹日志目录（None 表示关闭）：后台线程追加写入，定期 fsync，按大小/时间轮转
+    log_dir: str | None = None
+    log_fsync_interval: float = 5.0
+    log_rotate_mb: float = 64.0
+    log_rotate_minutes: float = 60.0
+    log_compress: bool = False  # 日志使用差分 varint 编码（.trjz）
+    # 在线轨迹简化：丢弃的点到保留折线的距离不超过该值（归一化坐标，0 表示关闭）
+    simplify_tolerance: float = 0.0
+    simplify_max_interval: float = 1.0  # 相邻关键点的最大时间间隔（秒）
 
 
 @dataclass(frozen=True)
@@ -83,16 +141,35 @@ class AppConfig:
     logging: LoggingConfig
     calibration_path: str
     trajectory: TrajectoryConfig
+    loop_watchdog: LoopWatchdogConfig = LoopWatchdogConfig()
+
 
+def _merge_overlay(base: dict, overlay: dict) -> None:
+    """将覆盖配置递归合并到基础配置中（原地修改 base）"""
+    for key, value in overlay.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge_overlay(base[key], value)
+        else:
+            base[key] = value
 
-def load_config(path: Path) -> AppConfig:
+
+def load_config(path: Path, overlays: Sequence[Path] = ()) -> AppConfig:
     with path.open("r", encoding="utf-8") as fh:
         raw = yaml.safe_load(fh)
 
+    # 依次应用覆盖配置（如自动调参生成的 tuned.yaml）
+    for overlay_path in overlays:
+        with overlay_path.open("r", encoding="utf-8") as fh:
+            _merge_overlay(raw, yaml.safe_load(fh) or {})
+
     camera = CameraConfig(**raw["camera"])
     detector = DetectorConfig(**raw["detector"])
     motion_mapping = MotionMappingConfig(**raw["motion_mapping"])
-    serial = SerialConfig(**raw["serial"])
+    serial_raw = dict(raw["serial"])
+    serial_raw["baud_candidates"] = tuple(serial_raw.get("baud_candidates") or ())
+    # 旧配置把主循环看门狗放在 serial 下
+    legacy_deadline = serial_raw.pop("loop_deadline", None)
+    serial = SerialConfig(**serial_raw)
     
     # 可视化配置（支持新字段的默认值）
     viz_raw = raw.get("visualization", {})
@@ -104,6 +181,11 @@ def load_config(path: Path) -> AppConfig:
         show_aquarium_bounds=viz_raw.get("show_aquarium_bounds", True),
         show_relative_coords=viz_raw.get("show_relative_coords", True),
         show_trajectory=viz_raw.get("show_trajectory", True),
+        stream_enabled=viz_raw.get("stream_enabled", False),
+        stream_host=viz_raw.get("stream_host", "127.0.0.1"),
+        stream_port=viz_raw.get("stream_port", 8080),
+        stream_fps=viz_raw.get("stream_fps", 10.0),
+        stream_quality=viz_raw.get("stream_quality", 70),
     )
     
     # 轨迹记录配置
@@ -113,8 +195,23 @@ def load_config(path: Path) -> AppConfig:
         max_points=traj_raw.get("max_points", 1000),
         sample_interval=traj_raw.get("sample_interval", 0.1),
         save_path=traj_raw.get("save_path"),
+        detection_log_path=traj_raw.get("detection_log_path"),
+        log_dir=traj_raw.get("log_dir"),
+        log_fsync_interval=traj_raw.get("log_fsync_interval", 5.0),
+        log_rotate_mb=traj_raw.get("log_rotate_mb", 64.0),
+        log_rotate_minutes=traj_raw.get("log_rotate_minutes", 60.0),
+        log_compress=traj_raw.get("log_compress", False),
+        simplify_tolerance=traj_raw.get("simplify_tolerance", 0.0),
+        simplify_max_interval=traj_raw.get("simplify_max_interval", 1.0),
     )
     
+    loop_raw = raw.get("loop_watchdog", {})
+    default_deadline = LoopWatchdogConfig.deadline if legacy_deadline is None else legacy_deadline
+    loop_watchdog = LoopWatchdogConfig(
+        deadline=loop_raw.get("deadline", default_deadline),
+        detect_deadline=loop_raw.get("detect_deadline", LoopWatchdogConfig.detect_deadline),
+    )
+
     logging = LoggingConfig(**raw["logging"])
     calibration_path = raw.get("calibration_path", str(path.parent / "calibration.json"))
 
@@ -127,5 +224,6 @@ def load_config(path: Path) -> AppConfig:
         logging=logging,
         calibration_path=calibration_path,
         trajectory=trajectory,
+        loop_watchdog=loop_watchdog,
     )
 
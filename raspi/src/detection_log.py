@@ -0,0 +1,57 @@
+"""
+检测结果日志模块
+逐帧记录目标像素坐标（CSV），供离线调参与回放使用
+"""
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+
+import numpy as np
+
+from .detector import DetectionResult
+
+FIELDS = ("timestamp", "has_target", "cx", "cy", "confidence")
+
+
+class DetectionLogWriter:
+    """追加写入检测结果，时间戳与 TrajectoryRecorder 一致使用 time.monotonic()"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not path.exists() or path.stat().st_size == 0
+        self._fh = path.open("a", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._fh)
+        if is_new:
+            self._writer.writerow(FIELDS)
+
+    def write(self, timestamp: float, detection: DetectionResult) -> None:
+        if detection.has_target and detection.center is not None:
+            cx, cy = detection.center
+            conf = detection.confidence if detection.confidence is not None else ""
+            self._writer.writerow((f"{timestamp:.6f}", 1, f"{cx:.2f}", f"{cy:.2f}", conf))
+        else:
+            self._writer.writerow((f"{timestamp:.6f}", 0, "", "", ""))
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+
+
+def load_detection_log(path: Path) -> tuple[np.ndarray, np.ndarray]:
+    """
+    读取检测日志
+    返回 (timestamps (N,), centers (N, 2))，无目标的行为 NaN
+    """
+    timestamps: list[float] = []
+    centers: list[tuple[float, float]] = []
+    with path.open("r", encoding="utf-8", newline="") as fh:
+        for row in csv.DictReader(fh):
+            timestamps.append(float(row["timestamp"]))
+            if row["has_target"] == "1":
+                centers.append((float(row["cx"]), float(row["cy"])))
+            else:
+                centers.append((np.nan, np.nan))
+    return np.asarray(timestamps, dtype=np.float64), np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+
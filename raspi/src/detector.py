@@ -11,11 +11,17 @@ from typing import Deque, Optional
 import cv2
 import numpy as np
 from loguru import logger
-from ultralytics import YOLO
 
 from .config_loader import DetectorConfig
 
 
+def _load_yolo(weights: str):
+    """延迟导入 ultralytics（会连带导入 torch），只在真正加载模型时付出导入开销"""
+    from ultralytics import YOLO
+
+    return YOLO(weights)
+
+
 @dataclass
 class DetectionResult:
     has_target: bool
@@ -35,7 +41,7 @@ class FishDetector:
         if is_pretrained:
             # 直接使用预训练模型
             logger.info(f"使用预训练模型: {weights_path_str}")
-            self.model = YOLO(weights_path_str)
+            self.model = _load_yolo(weights_path_str)
             self._filter_fish_only = (self.config.classes is None)
             if self._filter_fish_only:
                 logger.info("自动设置检测类别为 fish (ID: 15)")
@@ -47,7 +53,7 @@ class FishDetector:
                 logger.info("自动切换到 YOLOv8n 预训练模型（COCO 数据集，包含 fish 类别）")
                 logger.info("提示: COCO 数据集中 fish 的类别 ID 是 15")
                 # 使用 YOLOv8n (nano) 版本，适合树莓派
-                self.model = YOLO('yolov8n.pt')
+                self.model = _load_yolo('yolov8n.pt')
                 # 如果配置中没有指定类别，自动设置为 fish (15)
                 if self.config.classes is None:
                     logger.info("自动设置检测类别为 fish (ID: 15)")
@@ -56,19 +62,30 @@ class FishDetector:
                     self._filter_fish_only = False
             else:
                 try:
-                    self.model = YOLO(str(weights_path))
+                    self.model = _load_yolo(str(weights_path))
                     self._filter_fish_only = False
                     logger.info(f"已加载自定义模型: {weights_path}")
                 except Exception as e:
                     logger.error(f"加载模型失败: {e}")
                     logger.info("回退到 YOLOv8n 预训练模型")
-                    self.model = YOLO('yolov8n.pt')
+                    self.model = _load_yolo('yolov8n.pt')
                     self._filter_fish_only = (self.config.classes is None)
                     if self._filter_fish_only:
                         logger.info("自动设置检测类别为 fish (ID: 15)")
         
         self.history: Deque[tuple[float, float]] = deque(maxlen=5)
 
+    def warmup(self, width: int, height: int) -> None:
+        """用空白帧执行一次推理，提前完成算子初始化与内存分配，避免首帧卡顿"""
+        dummy = np.zeros((height, width, 3), dtype=np.uint8)
+        self.model.predict(
+            source=dummy,
+            conf=self.config.conf_threshold,
+            iou=self.config.iou_threshold,
+            verbose=False,
+            max_det=self.config.max_detections,
+        )
+
     def detect(self, frame: cv2.typing.MatLike) -> DetectionResult:
         # 如果使用预训练模型且需要过滤 fish，设置类别
         classes = self.config.classes
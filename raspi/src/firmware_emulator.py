@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+fishcar.ino 固件模拟器
+在伪终端（PTY）上模拟 Arduino 的串口行为，SerialBridge 可以像连接真实设备一样连接它，
+用于吞吐量压测、断线重连与看门狗测试。
+
+FirmwareModel 是与 arduino/fishcar/fishcar.ino 一致的纯状态机（不涉及 IO，便于单元测试）；
+FirmwareEmulator 负责 PTY、按波特率模拟线路传输时间、固件处理延迟与可脚本化的限位开关。
+上位机设置的串口波特率（PTY 的 termios 速率）与固件当前波特率不一致时，双向数据都变成乱码。
+
+使用方法:
+  python -m src.firmware_emulator --link /tmp/fishcar [--delay 0.0005] [--no-pace]
+然后在配置中设置 serial.port: /tmp/fishcar
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import select
+import termios
+import threading
+import time
+import tty
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from . import serial_protocol as proto
+
+SUPPORTED_BAUDS = (9600, 115200, 250000, 500000)
+INITIAL_BAUD = 9600
+LINE_BUFFER_SIZE = 48
+FRAME_TIMEOUT = 0.02
+STATUS_INTERVAL = 0.5
+MECANUM_OMEGA_SCALE = 10
+# termios 速率常量 -> 波特率（平台不支持的速率不在表中，视为与固件一致）
+_TERMIOS_BAUDS = {
+    getattr(termios, f"B{rate}"): rate for rate in SUPPORTED_BAUDS if hasattr(termios, f"B{rate}")
+}
+
+_LIMIT_NAMES = (
+    ("front", proto.STATUS_FRONT),
+    ("back", proto.STATUS_BACK),
+    ("left", proto.STATUS_LEFT),
+    ("right", proto.STATUS_RIGHT),
+)
+
+
+def _constrain(value: int) -> int:
+    return max(-127, min(127, value))
+
+
+def calculate_mecanum(vx: int, vy: int, omega: int) -> tuple[int, int, int, int]:
+    """与固件 calculateMecanum 一致，返回 (FL, FR, RL, RR)"""
+    r = MECANUM_OMEGA_SCALE
+    return (
+        _constrain(vx + vy + omega * r),
+        _constrain(vx - vy - omega * r),
+        _constrain(vx - vy + omega * r),
+        _constrain(vx + vy - omega * r),
+    )
+
+
+class FirmwareModel:
+    """
+    固件状态机：逐字节输入，返回需要发送给上位机的字节
+    时间由调用方传入（秒），便于在测试中精确控制
+    """
+
+    def __init__(self, status_interval: float = STATUS_INTERVAL) -> None:
+        self.status_interval = status_interval
+        self.binary_mode = False
+        self.baudrate = INITIAL_BAUD
+        self._previous_baud = INITIAL_BAUD
+        self._confirm_deadline: Optional[float] = None
+        self.limits = 0  # STATUS_* 位
+        self.command = (0, 0, 0)  # 限速前的最近一次指令
+        self.wheel_speeds = (0, 0, 0, 0)
+        self.motor_writes = 0  # 实际写入电机驱动的次数（速度不变时不写）
+        self.commands = 0
+        self._line = bytearray()
+        self._overflow = False
+        self._frame = bytearray()
+        self._frame_time = 0.0
+        self._last_status = float("-inf")
+
+    # ------------------------------------------------------------ 输入
+    def boot(self, now: float) -> bytes:
+        """上电输出：STATUS + READY"""
+        return self._report_limits(now) + b"READY\r\n"
+
+    def feed(self, data: bytes, now: float) -> bytes:
+        out = bytearray()
+        for byte in data:
+            out += self._process_byte(byte, now)
+        return bytes(out)
+
+    def tick(self, now: float) -> bytes:
+        """对应固件 loop() 中与输入无关的部分：波特率回退、残帧超时、周期状态上报"""
+        if self._confirm_deadline is not None and now >= self._confirm_deadline:
+            self._confirm_deadline = None
+            self.baudrate = self._previous_baud
+        if self._frame and now - self._frame_time > FRAME_TIMEOUT:
+            self._frame.clear()
+        if self.status_interval > 0 and now - self._last_status >= self.status_interval:
+            return self._report_limits(now)
+        return b""
+
+    def set_limits(self, bits: int, now: float) -> bytes:
+        """限位变化（模拟中断 + 去抖后的结果）：新按下时立即在本地重新限速，并上报状态"""
+        if bits == self.limits:
+            return b""
+        newly_pressed = bits & ~self.limits
+        self.limits = bits
+        out = bytearray()
+        if newly_pressed:
+            out += self._apply_command()[0]
+        out += self._report_limits(now)
+        return bytes(out)
+
+    # ------------------------------------------------------------ 状态机
+    def _process_byte(self, byte: int, now: float) -> bytes:
+        if self._frame or (not self._line and not self._overflow and byte == proto.HOST_SYNC):
+            self._frame.append(byte)
+            self._frame_time = now
+            if len(self._frame) == proto.HOST_FRAME_LEN:
+                frame = bytes(self._frame)
+                self._frame.clear()
+                return self._handle_frame(frame)
+            return b""
+        if byte == 0x0A:
+            if self._overflow:
+                reply = b"CMD ERR\r\n"
+            else:
+                reply = self._handle_line(self._line.decode("ascii", errors="replace").rstrip("\r "), now)
+            self._line.clear()
+            self._overflow = False
+            return reply
+        if len(self._line) < LINE_BUFFER_SIZE - 1:
+            self._line.append(byte)
+        else:
+            self._overflow = True
+        return b""
+
+    def _handle_frame(self, frame: bytes) -> bytes:
+        kind, seq = frame[1], frame[2]
+        if proto.crc8(frame[1:6]) != frame[6]:
+            return proto.encode_reply(proto.REPLY_NAK, seq, self.limits)
+        if kind == proto.CMD_VECTOR:
+            vx, vy, omega = (b - 256 if b > 127 else b for b in frame[3:6])
+            self.command = (vx, vy, omega)
+            self.commands += 1
+            _, clipped, ok = self._apply_command(verbose=False)
+            status = self.limits
+            if clipped:
+                status |= proto.STATUS_COLLISION
+            if not ok:
+                status |= proto.STATUS_SPEED_ERR
+            return proto.encode_reply(proto.REPLY_ACK, seq, status)
+        if kind == proto.CMD_PING:
+            return proto.encode_reply(proto.REPLY_PONG, seq, self.limits)
+        return proto.encode_reply(proto.REPLY_NAK, seq, self.limits)
+
+    def _handle_line(self, cmd: str, now: float) -> bytes:
+        if cmd.startswith("V "):
+            parts = cmd[2:].split()
+            try:
+                vx, vy, omega = (int(p) for p in parts[:3])
+            except ValueError:
+                return b"CMD ERR\r\n"
+            self.command = (vx, vy, omega)
+            self.commands += 1
+            out, _, ok = self._apply_command()
+            return out + (b"SPEED OK\r\n" if ok else b"SPEED ERR\r\n")
+        if cmd == proto.BAUD_QUERY:
+            return ("BAUDS " + " ".join(str(b) for b in SUPPORTED_BAUDS) + "\r\n").encode("ascii")
+        if cmd == proto.BAUD_CONFIRM:
+            self._confirm_deadline = None
+            return b"BAUD CONFIRMED\r\n"
+        if cmd.startswith("BAUD "):
+            rate = cmd[5:].strip()
+            if not rate.isdigit() or int(rate) not in SUPPORTED_BAUDS:
+                return b"BAUD ERR\r\n"
+            self._previous_baud = self.baudrate
+            self.baudrate = int(rate)
+            self._confirm_deadline = now + proto.BAUD_REVERT_TIMEOUT
+            return f"BAUD OK {rate}\r\n".encode("ascii")
+        if cmd.startswith("ECHO "):
+            return (cmd + "\r\n").encode("ascii")
+        if cmd == proto.NEGOTIATE_BINARY:
+            self.binary_mode = True
+            return b"PROTO BIN OK\r\n"
+        if cmd == "PROTO TEXT":
+            self.binary_mode = False
+            return b"PROTO TEXT OK\r\n"
+        if cmd == "PING":
+            return b"PONG\r\n"
+        if cmd.startswith("PING "):
+            return f"PONG {cmd[5:]}\r\n".encode("ascii")
+        if cmd:
+            return b"UNKNOWN\r\n"
+        return b""
+
+    def _apply_command(self, verbose: bool = True) -> tuple[bytes, bool, bool]:
+        """按当前限位限速后写电机，返回 (碰撞提示输出, 是否限速, 写入是否成功)"""
+        vx, vy, omega = self.command
+        out = bytearray()
+        clipped = False
+        for name, bit, blocked in (
+            ("FRONT", proto.STATUS_FRONT, vy > 0),
+            ("BACK", proto.STATUS_BACK, vy < 0),
+            ("LEFT", proto.STATUS_LEFT, vx < 0),
+            ("RIGHT", proto.STATUS_RIGHT, vx > 0),
+        ):
+            if self.limits & bit and blocked:
+                if bit in (proto.STATUS_FRONT, proto.STATUS_BACK):
+                    vy = 0
+                else:
+                    vx = 0
+                clipped = True
+                if verbose and not self.binary_mode:
+                    out += f"COLLISION_{name}\r\n".encode("ascii")
+        speeds = calculate_mecanum(vx, vy, omega)
+        if speeds != self.wheel_speeds:
+            self.wheel_speeds = speeds
+            self.motor_writes += 1
+        return bytes(out), clipped, True
+
+    def _report_limits(self, now: float) -> bytes:
+        self._last_status = now
+        if self.binary_mode:
+            return proto.encode_reply(proto.REPLY_STATUS, 0, self.limits)
+        values = " ".join(f"{name}={int(bool(self.limits & bit))}" for name, bit in _LIMIT_NAMES)
+        return f"STATUS {values}\r\n".encode("ascii")
+
+
+class FirmwareEmulator:
+    """
+    PTY 上的固件模拟器（后台线程）
+    link 不为 None 时创建指向当前 PTY 的符号链接，模拟断线重连后上位机仍能用同一路径找到设备
+    """
+
+    def __init__(
+        self,
+        link: Optional[Path] = None,
+        processing_delay: float = 0.0005,
+        pace: bool = True,
+        status_interval: float = STATUS_INTERVAL,
+    ) -> None:
+        self.link = link
+        self.processing_delay = processing_delay
+        self.pace = pace
+        self.status_interval = status_interval
+        self.model = FirmwareModel(status_interval)
+        self.responsive = True  # False 时吞掉输入且不回复（模拟固件卡死）
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self._slave_name = ""
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def port(self) -> str:
+        return str(self.link) if self.link is not None else self._slave_name
+
+    def start(self) -> str:
+        """打开 PTY 并开始运行，返回上位机应连接的路径"""
+        self._open_pty()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        logger.info("固件模拟器已启动: {}", self.port)
+        return self.port
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._close_pty()
+
+    def disconnect(self) -> None:
+        """模拟拔掉 USB：关闭 PTY 并删除符号链接，上位机的读写随即出错"""
+        with self._lock:
+            self._close_pty()
+
+    def reset(self) -> None:
+        """模拟固件复位（如欠压）：USB 不重新枚举、PTY 保持打开，固件回到 9600 与文本协议并重新输出 READY"""
+        with self._lock:
+            self.model = FirmwareModel(self.status_interval)
+            self._send(self.model.boot(time.monotonic()))
+
+    def reconnect(self) -> str:
+        """模拟重新插入：新建 PTY（设备名会变化）并复位固件状态"""
+        with self._lock:
+            self._close_pty()
+            self.model = FirmwareModel(self.status_interval)
+            self._open_pty()
+        return self.port
+
+    def set_limits(self, front: bool = False, back: bool = False, left: bool = False, right: bool = False) -> None:
+        """脚本化限位开关状态"""
+        bits = 0
+        for pressed, (_, bit) in zip((front, back, left, right), _LIMIT_NAMES):
+            if pressed:
+                bits |= bit
+        with self._lock:
+            out = self.model.set_limits(bits, time.monotonic())
+            self._send(out)
+
+    def _open_pty(self) -> None:
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        self._master, self._slave = master, slave
+        self._slave_name = os.ttyname(slave)
+        if self.link is not None:
+            tmp = self.link.with_name(self.link.name + ".tmp")
+            tmp.unlink(missing_ok=True)
+            tmp.symlink_to(self._slave_name)
+            tmp.replace(self.link)
+        self._send(self.model.boot(time.monotonic()))
+
+    def _close_pty(self) -> None:
+        if self.link is not None:
+            self.link.unlink(missing_ok=True)
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def _wire_time(self, nbytes: int, baudrate: Optional[int] = None) -> float:
+        return nbytes * 10 / (baudrate or self.model.baudrate) if self.pace else 0.0
+
+    def _host_baud(self) -> Optional[int]:
+        """上位机当前设置的波特率（未知时返回 None）"""
+        if self._master is None:
+            return None
+        try:
+            return _TERMIOS_BAUDS.get(termios.tcgetattr(self._master)[5])
+        except termios.error:
+            return None
+
+    def _garbled(self, baudrate: int) -> bool:
+        host = self._host_baud()
+        return host is not None and host != baudrate
+
+    def _send(self, data: bytes, baudrate: Optional[int] = None) -> None:
+        """
+        调用方持有 _lock；按波特率占用线路时间后写出
+        baudrate 为发送时固件使用的速率（默认当前速率），与上位机不一致时上位机只收到乱码
+        """
+        if not data or self._master is None:
+            return
+        baudrate = baudrate or self.model.baudrate
+        delay = self._wire_time(len(data), baudrate)
+        if delay > 0:
+            time.sleep(delay)
+        if self._garbled(baudrate):
+            data = bytes(len(data))
+        os.write(self._master, data)
+        self.bytes_sent += len(data)
+
+    def _run(self) -> None:
+        while self._running:
+            master = self._master
+            if master is None:
+                time.sleep(0.01)
+                continue
+            try:
+                ready, _, _ = select.select([master], [], [], 0.01)
+                chunk = os.read(master, 4096) if ready else b""
+            except (OSError, ValueError):
+                # 断线期间文件描述符已关闭
+                time.sleep(0.01)
+                continue
+            with self._lock:
+                if master != self._master:
+                    continue
+                now = time.monotonic()
+                if chunk:
+                    self.bytes_received += len(chunk)
+                    # 波特率不一致时固件收不到有效字节
+                    if self.responsive and not self._garbled(self.model.baudrate):
+                        self._handle_chunk(chunk, now)
+                self._send(self.model.tick(time.monotonic()))
+
+    def _handle_chunk(self, chunk: bytes, arrived: float) -> None:
+        """逐字节处理；每个字节按波特率计算到达时刻，指令完整后再加处理延迟"""
+        byte_time = self._wire_time(1)
+        for i, byte in enumerate(chunk):
+            # 回复以处理指令时的速率发出（BAUD OK 在切换前发送）
+            baudrate = self.model.baudrate
+            reply = self.model.feed(bytes((byte,)), arrived + (i + 1) * byte_time)
+            if reply:
+                wait = arrived + (i + 1) * byte_time + self.processing_delay - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self._send(reply, baudrate)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="fishcar.ino 固件模拟器（PTY）")
+    parser.add_argument("--link", type=Path, default=Path("/tmp/fishcar"), help="指向模拟串口的符号链接")
+    parser.add_argument("--delay", type=float, default=0.0005, help="每条指令的固件处理延迟（秒）")
+    parser.add_argument("--no-pace", action="store_true", help="不模拟波特率对应的线路传输时间")
+    parser.add_argument("--status-interval", type=float, default=STATUS_INTERVAL, help="周期 STATUS 间隔（秒）")
+    parser.add_argument("--limits", nargs="*", default=[], choices=[name for name, _ in _LIMIT_NAMES],
+                        help="初始处于按下状态的限位开关")
+    args = parser.parse_args()
+
+    emulator = FirmwareEmulator(args.link, args.delay, not args.no_pace, args.status_interval)
+    emulator.start()
+    emulator.set_limits(**{name: True for name in args.limits})
+    logger.info("在配置中设置 serial.port: {}，Ctrl+C 退出", emulator.port)
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+        logger.info("收到 {} 字节，发送 {} 字节，指令 {} 条", emulator.bytes_received, emulator.bytes_sent,
+                    emulator.model.commands)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+串口链路往返时延统计
+按序号匹配请求与回复（PING/PONG、二进制 V/ACK），维护滚动窗口直方图与抖动估计
+"""
+from __future__ import annotations
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+
+import numpy as np
+
+# 直方图桶上界（秒），最后一个桶收纳更大的值
+HISTOGRAM_EDGES = (0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, float("inf"))
+
+
+@dataclass(frozen=True)
+class LatencySnapshot:
+    """时延统计快照（单位秒），无样本时各项为 None"""
+    samples: int
+    lost: int
+    last: Optional[float]
+    mean: Optional[float]
+    p50: Optional[float]
+    p95: Optional[float]
+    max: Optional[float]
+    jitter: float  # RFC 3550 风格的平滑抖动
+    histogram: tuple[int, ...]  # 与 HISTOGRAM_EDGES 对应的计数
+
+
+class RttTracker:
+    """线程安全：写线程记录发送，读线程记录回复"""
+
+    def __init__(self, window: int = 256, timeout: float = 2.0) -> None:
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending: dict[int, float] = {}
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._last: Optional[float] = None
+        self._jitter = 0.0
+        self._lost = 0
+
+    def sent(self, seq: int, timestamp: float) -> None:
+        with self._lock:
+            self._expire(timestamp)
+            if seq in self._pending:
+                # 序号回绕时旧请求仍未回复，视为丢失
+                self._lost += 1
+            self._pending[seq] = timestamp
+
+    def received(self, seq: int, timestamp: float) -> Optional[float]:
+        """返回本次往返时延，序号未知（重复或已超时）时返回 None"""
+        with self._lock:
+            sent_at = self._pending.pop(seq, None)
+            if sent_at is None:
+                return None
+            rtt = timestamp - sent_at
+            if self._last is not None:
+                self._jitter += (abs(rtt - self._last) - self._jitter) / 16
+            self._last = rtt
+            self._samples.append(rtt)
+            return rtt
+
+    def snapshot(self, now: Optional[float] = None) -> LatencySnapshot:
+        with self._lock:
+            if now is not None:
+                self._expire(now)
+            samples = np.fromiter(self._samples, dtype=np.float64)
+            lost = self._lost
+            last = self._last
+            jitter = self._jitter
+        if samples.size == 0:
+            return LatencySnapshot(0, lost, None, None, None, None, None, jitter, (0,) * len(HISTOGRAM_EDGES))
+        p50, p95 = np.percentile(samples, (50, 95))
+        bins = np.searchsorted(HISTOGRAM_EDGES, samples, side="left")
+        histogram = np.bincount(bins, minlength=len(HISTOGRAM_EDGES))
+        return LatencySnapshot(
+            samples=int(samples.size),
+            lost=lost,
+            last=last,
+            mean=float(samples.mean()),
+            p50=float(p50),
+            p95=float(p95),
+            max=float(samples.max()),
+            jitter=jitter,
+            histogram=tuple(int(c) for c in histogram),
+        )
+
+    def discard_pending(self) -> None:
+        """丢弃未回复的请求但不计为丢失（连接重建后旧序号不会再有回复）"""
+        with self._lock:
+            self._pending.clear()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._samples.clear()
+            self._last = None
+            self._jitter = 0.0
+            self._lost = 0
+
+    def _expire(self, now: float) -> None:
+        expired = [seq for seq, sent_at in self._pending.items() if now - sent_at > self.timeout]
+        for seq in expired:
+            del self._pending[seq]
+        self._lost += len(expired)
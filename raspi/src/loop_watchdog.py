@@ -0,0 +1,133 @@
+"""
+主循环卡顿看门狗
+独立线程跟踪 Application._loop 的心跳，主循环超过截止时间未更新心跳时直接下发停车指令，
+并记录每次卡顿的时长、所处阶段和主线程调用栈，便于定位阻塞点（摄像头读取、推理、渲染等）。
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Mapping, Optional
+
+from loguru import logger
+
+# 记录调用栈时保留的最内层帧数
+_STACK_DEPTH = 4
+
+
+@dataclass(frozen=True)
+class StallRecord:
+    started: float  # 最后一次心跳时刻（time.monotonic()）
+    duration: float  # 卡顿时长（秒），主循环恢复时确定
+    stage: str  # 最后一次心跳标记的阶段
+    location: str  # 检测到卡顿时主循环线程的调用栈（最内层若干帧）
+
+
+class LoopWatchdog:
+    """
+    beat() 由主循环调用（只做几次赋值，开销可忽略）；
+    超时后调用一次 on_stall，主循环恢复后记录本次卡顿。
+    stage_deadlines 为个别阶段单独指定截止时间（例如耗时较长的推理），math.inf 表示不检查该阶段
+    """
+
+    def __init__(
+        self,
+        deadline: float,
+        on_stall: Callable[[], None],
+        history: int = 100,
+        stage_deadlines: Optional[Mapping[str, float]] = None,
+    ) -> None:
+        self.deadline = deadline
+        self.stage_deadlines = dict(stage_deadlines or {})
+        self._on_stall = on_stall
+        self._last_beat = time.monotonic()
+        self._beat_deadline = deadline
+        self._stage = "start"
+        self._loop_thread_id: Optional[int] = None
+        self._stalled_since: Optional[float] = None
+        self._stalled_stage = ""
+        self._stalled_location = ""
+        self._lock = threading.Lock()
+        self._stalls: Deque[StallRecord] = deque(maxlen=history)
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def start(self) -> None:
+        """在主循环所在线程调用"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._beat_deadline = self.deadline
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        stalls = self.stalls()
+        if stalls:
+            worst = max(stalls, key=lambda record: record.duration)
+            logger.info(
+                "主循环卡顿 {} 次，最长 {:.0f} ms（阶段: {}）",
+                len(stalls), worst.duration * 1000, worst.stage,
+            )
+
+    def beat(self, stage: str) -> None:
+        """标记主循环进入某个阶段"""
+        now = time.monotonic()
+        if self._stalled_since is not None:
+            self._record_recovery(now)
+        self._stage = stage
+        self._beat_deadline = self.stage_deadlines.get(stage, self.deadline)
+        self._last_beat = now
+
+    def stalls(self) -> list[StallRecord]:
+        with self._lock:
+            return list(self._stalls)
+
+    def _record_recovery(self, now: float) -> None:
+        with self._lock:
+            started = self._stalled_since
+            if started is None:
+                return
+            record = StallRecord(started, now - started, self._stalled_stage, self._stalled_location)
+            self._stalls.append(record)
+            self._stalled_since = None
+        logger.warning(
+            "主循环恢复：卡顿 {:.0f} ms（阶段: {}）\n{}", record.duration * 1000, record.stage, record.location,
+        )
+
+    def _run(self) -> None:
+        delay = self.deadline
+        while not self._stop_event.wait(delay):
+            now = time.monotonic()
+            last_beat = self._last_beat
+            deadline = self._beat_deadline
+            late = now - last_beat
+            if late <= deadline:
+                delay = min(deadline - late, self.deadline)
+                continue
+            delay = self.deadline
+            with self._lock:
+                if self._stalled_since == last_beat or self._last_beat != last_beat:
+                    continue  # 本次卡顿已处理，或刚好恢复
+                self._stalled_since = last_beat
+                self._stalled_stage = self._stage
+                self._stalled_location = self._capture_location()
+            logger.error("主循环 {:.0f} ms 未更新（阶段: {}），直接下发停车指令", late * 1000, self._stalled_stage)
+            try:
+                self._on_stall()
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("卡顿停车失败: {}", exc)
+
+    def _capture_location(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id) if self._loop_thread_id is not None else None
+        if frame is None:
+            return "（无法获取主循环调用栈）"
+        return "".join(traceback.format_stack(frame)[-_STACK_DEPTH:]).rstrip()
@@ -1,9 +1,12 @@
 import argparse
+import math
 import os
 import signal
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Sequence
 
 # 在导入 OpenCV 相关模块之前设置环境变量（避免 headless 模式下的 Qt 插件错误）
 if not os.environ.get("DISPLAY"):
@@ -18,11 +21,16 @@ try:
     from .aquarium_calibration import AquariumBounds, AquariumCalibrator
     from .camera import CameraStream
     from .config_loader import load_config
+    from .detection_log import DetectionLogWriter
     from .detector import FishDetector
     from .logging_utils import setup_logging
+    from .loop_watchdog import LoopWatchdog
     from .motion_mapping import MecanumMapper
     from .serial_comm import SerialBridge
     from .safety import SafetyManager
+    from .startup import StartupTimeline
+    from .trajectory_compression import StreamingSimplifier
+    from .trajectory_log import TrajectoryLogWriter
     from .trajectory_recorder import TrajectoryRecorder
     from .visualizer import Visualizer
 except ImportError:
@@ -34,24 +42,39 @@ except ImportError:
     from src.aquarium_calibration import AquariumBounds, AquariumCalibrator
     from src.camera import CameraStream
     from src.config_loader import load_config
+    from src.detection_log import DetectionLogWriter
     from src.detector import FishDetector
     from src.logging_utils import setup_logging
+    from src.loop_watchdog import LoopWatchdog
     from src.motion_mapping import MecanumMapper
     from src.serial_comm import SerialBridge
     from src.safety import SafetyManager
+    from src.startup import StartupTimeline
+    from src.trajectory_compression import StreamingSimplifier
+    from src.trajectory_log import TrajectoryLogWriter
     from src.trajectory_recorder import TrajectoryRecorder
     from src.visualizer import Visualizer
 
 
 class Application:
-    def __init__(self, config_path: Path) -> None:
-        self.config = load_config(config_path)
-        setup_logging(self.config.logging)
+    def __init__(self, config_path: Path, overlays: Sequence[Path] = ()) -> None:
+        self.timeline = StartupTimeline()
+        with self.timeline.phase("config"):
+            self.config = load_config(config_path, overlays)
+            setup_logging(self.config.logging)
         self.camera = CameraStream(self.config.camera)
-        self.detector = FishDetector(self.config.detector)
-        self.mapper = MecanumMapper(self.config.motion_mapping)
+        # 模型在 start() 中与摄像头、串口并行加载
+        self.detector: FishDetector | None = None
         self.serial = SerialBridge(self.config.serial)
         self.safety = SafetyManager(self.config.serial.watchdog_timeout)
+        self.loop_watchdog: LoopWatchdog | None = None
+        loop_config = self.config.loop_watchdog
+        if loop_config.deadline > 0:
+            self.loop_watchdog = LoopWatchdog(
+                loop_config.deadline,
+                self.safety.force_stop,
+                stage_deadlines={"detect": loop_config.detect_deadline or math.inf},
+            )
         
         # 加载鱼缸边界标定
         calibrator = AquariumCalibrator(Path(self.config.calibration_path))
@@ -60,31 +83,77 @@ class Application:
             logger.info("已加载鱼缸边界标定数据")
         else:
             logger.warning("未找到鱼缸边界标定数据，运行标定工具进行标定")
+        self.mapper = MecanumMapper(self.config.motion_mapping, aquarium_bounds)
         
         # 初始化轨迹记录器
         trajectory_recorder = None
+        self.trajectory_log: TrajectoryLogWriter | None = None
         if self.config.trajectory.enabled:
-            save_path = Path(self.config.trajectory.save_path) if self.config.trajectory.save_path else None
+            traj_config = self.config.trajectory
+            save_path = Path(traj_config.save_path) if traj_config.save_path else None
+            if traj_config.log_dir:
+                self.trajectory_log = TrajectoryLogWriter(
+                    Path(traj_config.log_dir),
+                    fsync_interval=traj_config.log_fsync_interval,
+                    rotate_bytes=int(traj_config.log_rotate_mb * 1024 * 1024),
+                    rotate_seconds=traj_config.log_rotate_minutes * 60,
+                    compress=traj_config.log_compress,
+                )
+                logger.info("流式轨迹日志: {}（会话 {}）", traj_config.log_dir, self.trajectory_log.session)
+            simplifier = None
+            if traj_config.simplify_tolerance > 0:
+                simplifier = StreamingSimplifier(traj_config.simplify_tolerance, traj_config.simplify_max_interval)
             trajectory_recorder = TrajectoryRecorder(
-                max_points=self.config.trajectory.max_points,
-                sample_interval=self.config.trajectory.sample_interval,
+                max_points=traj_config.max_points,
+                sample_interval=traj_config.sample_interval,
                 save_path=save_path,
+                log=self.trajectory_log,
+                simplifier=simplifier,
             )
             logger.info("轨迹记录已启用 (max_points={}, interval={}s)", 
                         self.config.trajectory.max_points, 
                         self.config.trajectory.sample_interval)
         
         self.trajectory_recorder = trajectory_recorder
+
+        # 检测结果日志（供离线调参）
+        self.detection_log: DetectionLogWriter | None = None
+        if self.config.trajectory.detection_log_path:
+            self.detection_log = DetectionLogWriter(Path(self.config.trajectory.detection_log_path))
+            logger.info("检测结果日志已启用: {}", self.config.trajectory.detection_log_path)
+
         self.visualizer = Visualizer(self.config.visualization, aquarium_bounds, trajectory_recorder)
         self._running = False
 
     def start(self) -> None:
         logger.info("启动 FishCar 控制系统")
         self._running = True
-        self.camera.open()
-        self.serial.open()
+        self._initialize_subsystems()
+        # 限位变化与串口超时由读线程/看门狗线程直接处理，不等待主循环
+        self.safety.attach(self.serial)
+        self.timeline.report()
         self._loop()
 
+    def _initialize_subsystems(self) -> None:
+        """并行执行模型加载/预热、摄像头打开和串口打开，总耗时取决于最慢的一项"""
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup") as pool:
+            futures = [
+                pool.submit(self.timeline.run, "detector", self._load_detector),
+                pool.submit(self.timeline.run, "camera", self.camera.open),
+                pool.submit(self.timeline.run, "serial", self.serial.open),
+            ]
+            # 等待全部完成后再抛出第一个异常，避免残留未完成的初始化线程
+            errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def _load_detector(self) -> None:
+        detector = FishDetector(self.config.detector)
+        with self.timeline.phase("detector_warmup"):
+            detector.warmup(self.config.camera.width, self.config.camera.height)
+        self.detector = detector
+
     def shutdown(self) -> None:
         if not self._running:
             return
@@ -92,28 +161,59 @@ class Application:
         self._running = False
         
         # 保存轨迹
-        if self.trajectory_recorder and self.trajectory_recorder.points:
+        if self.trajectory_recorder:
+            self.trajectory_recorder.flush()
+            simplifier = self.trajectory_recorder.simplifier
+            if simplifier and simplifier.points_out:
+                logger.info(
+                    "轨迹简化: {} -> {} 个点（{:.1f} 倍），最大位置误差 {:.4f}",
+                    simplifier.points_in, simplifier.points_out, simplifier.ratio, simplifier.max_error,
+                )
+        if self.trajectory_recorder and self.trajectory_recorder.save_path and self.trajectory_recorder.points:
             logger.info("保存轨迹数据 ({} 个点)", len(self.trajectory_recorder.points))
             self.trajectory_recorder.save()
+        if self.trajectory_log:
+            self.trajectory_log.close()
+        if self.detection_log:
+            self.detection_log.close()
         
+        if self.loop_watchdog:
+            self.loop_watchdog.stop()
+        self.safety.detach()
         self.serial.stop()
         self.camera.close()
         self.visualizer.close()
         logger.info("已安全退出")
 
     def _loop(self) -> None:
+        assert self.detector is not None
         last_heartbeat = time.monotonic()
+        first_command_sent = False
+        watchdog = self.loop_watchdog
+        if watchdog:
+            watchdog.start()
         while self._running:
+            if watchdog:
+                watchdog.beat("camera")
             frame = self.camera.read()
+            frame_time = time.monotonic()
             if frame is None:
                 logger.warning("未获取到帧，稍候重试")
                 time.sleep(0.01)
                 continue
 
+            if watchdog:
+                watchdog.beat("detect")
             result = self.detector.detect(frame)
-            mapped = self.mapper.calculate(result)
-            safe_vector = self.safety.apply(mapped, self.serial.read_status())
-            self.serial.send_vector(safe_vector)
+            if watchdog:
+                watchdog.beat("control")
+            if self.detection_log:
+                self.detection_log.write(frame_time, result)
+            mapped = self.mapper.calculate(result, timestamp=frame_time)
+            safe_vector = self.safety.submit(mapped)
+            if not first_command_sent:
+                first_command_sent = True
+                logger.info("首条运动指令已发送（启动后 {:.3f}s）", self.timeline.mark("first_command"))
             
             # 更新轨迹记录
             if self.trajectory_recorder:
@@ -127,6 +227,8 @@ class Application:
                 self.serial.send_heartbeat()
                 last_heartbeat = now
 
+            if watchdog:
+                watchdog.beat("render")
             self.visualizer.render(frame, result, safe_vector)
 
 
@@ -160,6 +262,13 @@ def parse_args() -> argparse.Namespace:
         default=default_config,
         help=f"配置文件路径（默认: {default_config}）",
     )
+    parser.add_argument(
+        "--overlay",
+        type=Path,
+        action="append",
+        default=[],
+        help="覆盖配置文件（可多次指定，如 tune_gains 生成的 tuned.yaml）",
+    )
     return parser.parse_args()
 
 
@@ -173,7 +282,7 @@ def main() -> None:
         logger.error("示例: python main.py -c /path/to/config.yaml")
         sys.exit(1)
     
-    app = Application(args.config)
+    app = Application(args.config, args.overlay)
 
     def handle_exit(signum: int, frame) -> None:  # type: ignore[override]
         logger.warning("收到信号 {sign}, 准备退出", sign=signum)
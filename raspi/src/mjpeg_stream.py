@@ -0,0 +1,197 @@
+"""
+MJPEG 实时画面推流
+无显示环境时通过 HTTP 查看带标注的画面：浏览器打开 http://<地址>:<端口>/ 即可，/snapshot.jpg 返回单帧。
+没有任何认证，默认只监听 127.0.0.1（通过 SSH 端口转发访问），监听 0.0.0.0 会让同一网络中的任何人看到摄像头画面。
+至少有一个客户端连接时才编码；JPEG 编码在后台线程按配置的帧率与质量进行，
+publish() 只替换待编码的最新画面。每个客户端只发送当时最新的一帧，慢速客户端跳帧而不会积压。
+"""
+from __future__ import annotations
+
+# 必须在导入 cv2 之前初始化
+from . import opencv_init  # noqa: F401
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import cv2
+import numpy as np
+from loguru import logger
+
+BOUNDARY = b"fishcarframe"
+_CLIENT_POLL = 1.0  # 客户端等待新帧的超时（秒），用于及时响应 stop()
+_SNAPSHOT_TIMEOUT = 2.0
+
+
+class MjpegStreamer:
+    """publish() 由渲染线程调用：无客户端时立即返回，否则只保存画面引用（调用方之后不得修改该数组）"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080, fps: float = 10.0, quality: int = 70) -> None:
+        self.host = host
+        self.port = port
+        self.fps = fps
+        self.quality = quality
+        self.frames_encoded = 0
+        self._cond = threading.Condition()
+        self._clients = 0
+        self._frame: Optional[np.ndarray] = None
+        self._frame_seq = 0
+        self._jpeg: Optional[bytes] = None
+        self._jpeg_seq = 0
+        self._running = False
+        self._stop_event = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def clients(self) -> int:
+        return self._clients
+
+    @property
+    def active(self) -> bool:
+        """是否有客户端在观看（无人观看时调用方可以跳过绘制）"""
+        return self._clients > 0
+
+    def start(self) -> None:
+        """绑定端口失败时抛出 OSError"""
+        server = ThreadingHTTPServer((self.host, self.port), _StreamHandler)
+        server.streamer = self  # type: ignore[attr-defined]
+        self._server = server
+        self.port = server.server_address[1]
+        self._running = True
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=server.serve_forever, name="mjpeg-http", daemon=True),
+            threading.Thread(target=self._encode_loop, name="mjpeg-encoder", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info("MJPEG 推流: http://{}:{}/（{} fps，质量 {}）", self.host, self.port, self.fps, self.quality)
+
+    def stop(self) -> None:
+        if not self._running:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._stop_event.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+        logger.info("MJPEG 推流已停止（共编码 {} 帧）", self.frames_encoded)
+
+    def publish(self, frame: np.ndarray) -> None:
+        if not self._clients:
+            return
+        with self._cond:
+            self._frame = frame
+            self._frame_seq += 1
+            self._cond.notify_all()
+
+    def _encode_loop(self) -> None:
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)]
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        encoded_seq = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: not self._running or (self._frame is not None and self._frame_seq != encoded_seq))
+                if not self._running:
+                    return
+                frame, encoded_seq = self._frame, self._frame_seq
+                self._frame = None
+            started = time.monotonic()
+            ok, buffer = cv2.imencode(".jpg", frame, params)
+            if ok:
+                with self._cond:
+                    self._jpeg = buffer.tobytes()
+                    self._jpeg_seq += 1
+                    self.frames_encoded += 1
+                    self._cond.notify_all()
+            # 限制帧率：期间到达的画面只保留最新一帧
+            remaining = interval - (time.monotonic() - started)
+            if remaining > 0 and self._stop_event.wait(remaining):
+                return
+
+    def _attach(self) -> None:
+        with self._cond:
+            self._clients += 1
+
+    def _detach(self) -> None:
+        with self._cond:
+            self._clients -= 1
+            if not self._clients:
+                # 无人观看时不保留旧画面，下一个客户端从新画面开始
+                self._frame = None
+                self._jpeg = None
+
+    def _next_jpeg(self, last_seq: int, timeout: float) -> tuple[Optional[bytes], int]:
+        """等待比 last_seq 更新的 JPEG，超时或停止时返回 (None, last_seq)"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: not self._running or (self._jpeg is not None and self._jpeg_seq != last_seq), timeout,
+            )
+            if not self._running or self._jpeg is None or self._jpeg_seq == last_seq:
+                return None, last_seq
+            return self._jpeg, self._jpeg_seq
+
+    def _serve_stream(self, handler: BaseHTTPRequestHandler) -> None:
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY.decode()}")
+        handler.send_header("Cache-Control", "no-cache, private")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        self._attach()
+        logger.info("MJPEG 客户端连接: {}（当前 {} 个）", handler.client_address[0], self._clients)
+        try:
+            last_seq = 0
+            while self._running:
+                jpeg, last_seq = self._next_jpeg(last_seq, _CLIENT_POLL)
+                if jpeg is None:
+                    continue
+                handler.wfile.write(
+                    b"--" + BOUNDARY + b"\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                    + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n"
+                )
+                handler.wfile.flush()
+        except OSError:
+            pass  # 客户端断开或发送超时
+        finally:
+            self._detach()
+            logger.info("MJPEG 客户端断开: {}（当前 {} 个）", handler.client_address[0], self._clients)
+
+    def _serve_snapshot(self, handler: BaseHTTPRequestHandler) -> None:
+        self._attach()
+        try:
+            jpeg, _ = self._next_jpeg(0, _SNAPSHOT_TIMEOUT)
+        finally:
+            self._detach()
+        if jpeg is None:
+            handler.send_error(503, "no frame available")
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/jpeg")
+        handler.send_header("Content-Length", str(len(jpeg)))
+        handler.send_header("Cache-Control", "no-cache, private")
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    timeout = 10.0  # 发送阻塞超过该时间的客户端视为断开
+
+    def do_GET(self) -> None:  # noqa: N802
+        streamer: MjpegStreamer = self.server.streamer  # type: ignore[attr-defined]
+        path = self.path.split("?", 1)[0]
+        if path in ("/", "/stream", "/stream.mjpg"):
+            streamer._serve_stream(self)
+        elif path == "/snapshot.jpg":
+            streamer._serve_snapshot(self)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        logger.debug("MJPEG {}: {}", self.client_address[0], format % args)
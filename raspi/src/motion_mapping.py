@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import math
+import time
 from dataclasses import dataclass
+from typing import Optional
 
 import numpy as np
+from loguru import logger
 
+from .aquarium_calibration import AquariumBounds
 from .config_loader import MotionMappingConfig
 from .detector import DetectionResult
 
@@ -16,16 +21,202 @@ class MotionVector:
     active: bool
 
 
+@dataclass
+class MotionBatch:
+    """批量运动向量（每个字段为长度 N 的数组），用于离线回放与调参"""
+    vx: np.ndarray
+    vy: np.ndarray
+    omega: np.ndarray
+    active: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.active)
+
+    def to_vectors(self) -> list[MotionVector]:
+        """转换回逐条的 MotionVector 列表"""
+        return [
+            MotionVector(float(vx), float(vy), float(omega), bool(active))
+            for vx, vy, omega, active in zip(self.vx, self.vy, self.omega, self.active)
+        ]
+
+
+class PIDController:
+    """单轴 PID 控制器：条件积分 + 限幅抗饱和，微分项一阶低通滤波"""
+
+    def __init__(
+        self,
+        kp: float,
+        ki: float,
+        kd: float,
+        derivative_tau: float,
+        integral_limit: float,
+        output_limit: float,
+    ) -> None:
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.derivative_tau = derivative_tau
+        self.integral_limit = integral_limit
+        self.output_limit = output_limit
+        self.reset()
+
+    def reset(self) -> None:
+        self.integral = 0.0
+        self.derivative = 0.0
+        self._prev_error: Optional[float] = None
+
+    def update(self, error: float, dt: float, feedforward: float = 0.0) -> float:
+        """dt 为真实时间间隔（秒），dt <= 0 时只计算比例与前馈项"""
+        if dt > 0 and self._prev_error is not None:
+            raw_derivative = (error - self._prev_error) / dt
+            alpha = dt / (self.derivative_tau + dt) if self.derivative_tau > 0 else 1.0
+            self.derivative += alpha * (raw_derivative - self.derivative)
+        self._prev_error = error
+
+        p_term = self.kp * error
+        d_term = self.kd * self.derivative
+        if dt > 0 and self.ki != 0.0:
+            candidate = float(np.clip(self.integral + error * dt, -self.integral_limit, self.integral_limit))
+            unsaturated = p_term + self.ki * candidate + d_term + feedforward
+            # 条件积分：输出未饱和，或误差方向有助于退出饱和时才累积
+            if abs(unsaturated) <= self.output_limit or unsaturated * error < 0:
+                self.integral = candidate
+
+        output = p_term + self.ki * self.integral + d_term + feedforward
+        return float(np.clip(output, -self.output_limit, self.output_limit))
+
+
 class MecanumMapper:
-    def __init__(self, config: MotionMappingConfig) -> None:
+    MODES = ("proportional", "pid")
+    NORMALIZATIONS = ("frame", "aquarium")
+
+    def __init__(
+        self,
+        config: MotionMappingConfig,
+        aquarium_bounds: Optional[AquariumBounds] = None,
+    ) -> None:
+        if config.mode not in self.MODES:
+            raise ValueError(f"未知的控制模式: {config.mode}（可选: {', '.join(self.MODES)}）")
+        if config.normalization not in self.NORMALIZATIONS:
+            raise ValueError(
+                f"未知的归一化方式: {config.normalization}（可选: {', '.join(self.NORMALIZATIONS)}）"
+            )
         self.config = config
+        # 鱼缸单应矩阵只在加载时计算一次，逐帧只做 9 次乘加
+        self._homography: Optional[tuple[float, ...]] = None
+        if config.normalization == "aquarium":
+            if aquarium_bounds is None:
+                logger.warning("normalization=aquarium 但未找到鱼缸标定数据，回退到按画面尺寸归一化")
+            else:
+                self._homography = tuple(float(v) for v in aquarium_bounds.normalization_homography().ravel())
+        self._pid_x = self._make_pid(config.gain_x)
+        self._pid_y = self._make_pid(config.gain_y)
+        self._last_timestamp: Optional[float] = None
+        self._last_target: Optional[tuple[float, float]] = None
+        self._target_velocity = (0.0, 0.0)
+
+    def reset(self) -> None:
+        """清空 PID 积分、微分与目标速度估计"""
+        self._pid_x.reset()
+        self._pid_y.reset()
+        self._last_timestamp = None
+        self._last_target = None
+        self._target_velocity = (0.0, 0.0)
 
-    def calculate(self, detection: DetectionResult) -> MotionVector:
+    def calculate(self, detection: DetectionResult, timestamp: Optional[float] = None) -> MotionVector:
+        """timestamp 为帧采集时刻（time.monotonic()），PID 模式使用它计算真实 dt"""
         if not detection.has_target or detection.center is None:
+            if self.config.mode == "pid":
+                # 目标丢失：清空控制器状态，避免重新出现时积分项突变
+                self.reset()
             return MotionVector(0.0, 0.0, 0.0, False)
 
-        cx, cy = detection.center
         # 使用归一化坐标，范围 [-1, 1]
+        nx, ny = self.normalize_center(detection.center)
+        return self.calculate_normalized(nx, ny, timestamp)
+
+    def calculate_normalized(self, nx: float, ny: float, timestamp: Optional[float] = None) -> MotionVector:
+        """直接根据归一化目标坐标计算运动向量（离线仿真与调参使用）"""
+        if self.config.mode == "pid":
+            return self._calculate_pid(nx, ny, timestamp)
+
+        if abs(nx) < self.config.deadzone and abs(ny) < self.config.deadzone:
+            return MotionVector(0.0, 0.0, 0.0, False)
+
+        vx = np.clip(nx * self.config.gain_x, -self.config.max_speed, self.config.max_speed)
+        vy = np.clip(ny * self.config.gain_y, -self.config.max_speed, self.config.max_speed)
+        omega = np.clip(self.config.gain_rotation, -self.config.max_speed, self.config.max_speed)
+
+        vx = self._apply_min_speed(vx)
+        vy = self._apply_min_speed(vy)
+
+        return MotionVector(vx, vy, omega, True)
+
+    def _calculate_pid(self, nx: float, ny: float, timestamp: Optional[float]) -> MotionVector:
+        if timestamp is None:
+            timestamp = time.monotonic()
+        dt = 0.0
+        if self._last_timestamp is not None:
+            dt = timestamp - self._last_timestamp
+            if dt <= 0 or dt > self.config.max_dt:
+                # 帧间隔异常（暂停/严重丢帧），重新开始
+                self.reset()
+                dt = 0.0
+        self._last_timestamp = timestamp
+
+        self._update_target_velocity(nx, ny, dt)
+
+        ex = nx - self.config.reference_x
+        ey = ny - self.config.reference_y
+        if abs(ex) < self.config.deadzone and abs(ey) < self.config.deadzone:
+            self._pid_x.reset()
+            self._pid_y.reset()
+            return MotionVector(0.0, 0.0, 0.0, False)
+
+        ff = self.config.feedforward_gain
+        vx = self._pid_x.update(ex, dt, ff * self._target_velocity[0])
+        vy = self._pid_y.update(ey, dt, ff * self._target_velocity[1])
+
+        # 角速度与目标相对前进方向（+y）的方位角成正比，方位角归一化到 [-1, 1]
+        bearing = math.atan2(ex, ey) / math.pi
+        omega = float(np.clip(self.config.gain_rotation * bearing, -self.config.max_speed, self.config.max_speed))
+
+        return MotionVector(self._apply_min_speed(vx), self._apply_min_speed(vy), omega, True)
+
+    def _update_target_velocity(self, nx: float, ny: float, dt: float) -> None:
+        """由相邻帧目标位置差分估计目标速度（与微分项共用低通时间常数）"""
+        if self._last_target is not None and dt > 0:
+            raw_vx = (nx - self._last_target[0]) / dt
+            raw_vy = (ny - self._last_target[1]) / dt
+            tau = self.config.derivative_tau
+            alpha = dt / (tau + dt) if tau > 0 else 1.0
+            tvx, tvy = self._target_velocity
+            self._target_velocity = (tvx + alpha * (raw_vx - tvx), tvy + alpha * (raw_vy - tvy))
+        self._last_target = (nx, ny)
+
+    def _make_pid(self, kp: float) -> PIDController:
+        return PIDController(
+            kp=kp,
+            ki=self.config.ki,
+            kd=self.config.kd,
+            derivative_tau=self.config.derivative_tau,
+            integral_limit=self.config.integral_limit,
+            output_limit=self.config.max_speed,
+        )
+
+    def normalize_center(self, center: tuple[float, float]) -> tuple[float, float]:
+        """像素坐标转换为归一化坐标 [-1, 1]（已考虑 invert_x / invert_y）"""
+        cx, cy = center
+        if self._homography is not None:
+            h = self._homography
+            cx, cy = float(cx), float(cy)
+            w = h[6] * cx + h[7] * cy + h[8]
+            nx = np.clip((h[0] * cx + h[1] * cy + h[2]) / w, -1.0, 1.0)
+            ny = np.clip((h[3] * cx + h[4] * cy + h[5]) / w, -1.0, 1.0)
+            return (
+                nx * (-1 if self.config.invert_x else 1),
+                ny * (-1 if self.config.invert_y else 1),
+            )
         nx = self._normalize(
             coord=cx,
             reference=self.config.reference_width,
@@ -34,18 +225,62 @@ class MecanumMapper:
             coord=cy,
             reference=self.config.reference_height,
         ) * (-1 if self.config.invert_y else 1)
+        return nx, ny
 
-        if abs(nx) < self.config.deadzone and abs(ny) < self.config.deadzone:
-            return MotionVector(0.0, 0.0, 0.0, False)
+    def calculate_batch(
+        self,
+        centers: np.ndarray,
+        has_target: np.ndarray | None = None,
+    ) -> MotionBatch:
+        """
+        向量化版本的 calculate，结果与逐条调用逐位一致
+        centers: (N, 2) 像素坐标，无目标的行可以为 NaN
+        has_target: (N,) 是否检测到目标，缺省时按 centers 是否为 NaN 判断
+        PID 模式有状态，只能逐帧调用 calculate
+        """
+        if self.config.mode != "proportional":
+            raise ValueError("calculate_batch 仅支持 proportional 模式")
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        if has_target is None:
+            has_target = ~np.isnan(centers).any(axis=1)
+        else:
+            has_target = np.asarray(has_target, dtype=bool)
+
+        if self._homography is not None:
+            h = self._homography
+            cx, cy = centers[:, 0], centers[:, 1]
+            w = h[6] * cx + h[7] * cy + h[8]
+            nx = np.clip((h[0] * cx + h[1] * cy + h[2]) / w, -1.0, 1.0)
+            ny = np.clip((h[3] * cx + h[4] * cy + h[5]) / w, -1.0, 1.0)
+        else:
+            nx = self._normalize_array(centers[:, 0], self.config.reference_width)
+            ny = self._normalize_array(centers[:, 1], self.config.reference_height)
+        nx = nx * (-1 if self.config.invert_x else 1)
+        ny = ny * (-1 if self.config.invert_y else 1)
+
+        in_deadzone = (np.abs(nx) < self.config.deadzone) & (np.abs(ny) < self.config.deadzone)
+        active = has_target & ~in_deadzone
 
         vx = np.clip(nx * self.config.gain_x, -self.config.max_speed, self.config.max_speed)
         vy = np.clip(ny * self.config.gain_y, -self.config.max_speed, self.config.max_speed)
         omega = np.clip(self.config.gain_rotation, -self.config.max_speed, self.config.max_speed)
 
-        vx = self._apply_min_speed(vx)
-        vy = self._apply_min_speed(vy)
+        vx = np.where(active, self._apply_min_speed_array(vx), 0.0)
+        vy = np.where(active, self._apply_min_speed_array(vy), 0.0)
+        omega = np.where(active, omega, 0.0)
+        return MotionBatch(vx, vy, omega, active)
 
-        return MotionVector(vx, vy, omega, True)
+    @staticmethod
+    def _normalize_array(coords: np.ndarray, reference: int) -> np.ndarray:
+        if reference == 0:
+            return np.zeros_like(coords)
+        return coords / reference * 2 - 1
+
+    def _apply_min_speed_array(self, values: np.ndarray) -> np.ndarray:
+        sign = np.where(values > 0, 1.0, -1.0)
+        with np.errstate(invalid="ignore"):
+            kicked = sign * np.maximum(np.abs(values), self.config.min_speed)
+        return np.where(values == 0.0, values, kicked)
 
     @staticmethod
     def _normalize(coord: float, reference: int) -> float:
@@ -0,0 +1,170 @@
+"""
+可视化叠加层缓存
+把很少变化的内容预先绘制到持久图层中，每帧只做一次带掩码的合成，绘制开销与画面内容的多少无关。
+"""
+from __future__ import annotations
+
+# 必须在导入 cv2 之前初始化
+from . import opencv_init  # noqa: F401
+
+import math
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from .aquarium_calibration import AquariumBounds
+from .config_loader import VisualizationConfig
+from .trajectory_recorder import TrajectoryRecorder, TrajectoryView
+
+TRAJECTORY_COLOR = (0, 191, 64)
+TRAJECTORY_THICKNESS = 2
+BOUNDS_COLOR = (255, 255, 0)
+
+
+class TrajectoryLayer:
+    """
+    轨迹的持久绘制层：每帧只绘制新存储的线段（O(新增点数)）；
+    画面尺寸或坐标范围变化、轨迹被清空、或图层中的点数超过 2 * max_points 时，
+    用一次 cv2.polylines 重绘最近 max_points 个点
+    """
+
+    def __init__(self, max_points: int = 500, margin: int = 50) -> None:
+        self.max_points = max_points
+        self.margin = margin
+        self.redraws = 0
+        self._image: Optional[np.ndarray] = None
+        self._mask: Optional[np.ndarray] = None
+        self._extent = (-1.0, 1.0, -1.0, 1.0)
+        self._base_seq = 0  # 图层中最早的点的序号
+        self._drawn_seq = 0  # 已绘制到的序号（不含）
+
+    def update(self, recorder: TrajectoryRecorder, shape: tuple[int, ...]) -> None:
+        h, w = shape[:2]
+        seq = recorder.sequence
+        extent = self._extent_for(recorder.get_bounds())
+        if (
+            self._image is None
+            or self._image.shape[:2] != (h, w)
+            or extent != self._extent
+            or seq < self._drawn_seq
+            or seq - self._base_seq > 2 * self.max_points
+        ):
+            self._redraw(recorder, (h, w), extent)
+        elif seq > self._drawn_seq:
+            # 连同上一个已绘制的点一起取出，新线段与旧轨迹相连
+            new = min(seq - self._drawn_seq, self.max_points)
+            self._draw(recorder.get_recent_points(new + 1))
+        self._drawn_seq = seq
+
+    def composite(self, display: np.ndarray) -> None:
+        if self._image is not None:
+            cv2.copyTo(self._image, self._mask, display)
+
+    def to_pixels(self, x: np.ndarray, y: np.ndarray, shape: tuple[int, ...]) -> tuple[np.ndarray, np.ndarray]:
+        """归一化坐标 -> 像素坐标：坐标范围映射到画面四周留出 margin 的区域"""
+        h, w = shape[:2]
+        min_x, max_x, min_y, max_y = self._extent
+        margin = self.margin
+        px = (x - min_x) / (max_x - min_x) * (w - 2 * margin) + margin
+        py = (y - min_y) / (max_y - min_y) * (h - 2 * margin) + margin
+        return px.astype(np.int32), py.astype(np.int32)
+
+    def _redraw(self, recorder: TrajectoryRecorder, size: tuple[int, int], extent: tuple[float, ...]) -> None:
+        self.redraws += 1
+        self._extent = extent
+        if self._image is None or self._image.shape[:2] != size:
+            self._image = np.zeros((*size, 3), np.uint8)
+            self._mask = np.zeros(size, np.uint8)
+        else:
+            self._image[:] = 0
+            self._mask[:] = 0
+        points = recorder.get_recent_points(self.max_points)
+        self._base_seq = recorder.sequence - len(points)
+        self._draw(points)
+
+    def _draw(self, points: TrajectoryView) -> None:
+        """只绘制两端都激活的线段，全部线段一次 cv2.polylines 调用完成"""
+        if len(points) < 2:
+            return
+        active = points.active
+        segments = np.flatnonzero(active[:-1] & active[1:])
+        if not segments.size:
+            return
+        px, py = self.to_pixels(points.x, points.y, self._image.shape)
+        starts = np.column_stack((px[segments], py[segments]))
+        ends = np.column_stack((px[segments + 1], py[segments + 1]))
+        lines = np.stack((starts, ends), axis=1)
+        cv2.polylines(self._image, lines, False, TRAJECTORY_COLOR, TRAJECTORY_THICKNESS)
+        cv2.polylines(self._mask, lines, False, 255, TRAJECTORY_THICKNESS)
+
+    @staticmethod
+    def _extent_for(bounds: tuple[float, float, float, float]) -> tuple[float, float, float, float]:
+        """默认显示 -1~1；轨迹超出时按 0.5 的步长扩大，范围只在跨过步长时变化，避免频繁重绘"""
+        min_x, min_y, max_x, max_y = bounds
+        return (
+            min(-1.0, math.floor(min_x * 2) / 2),
+            max(1.0, math.ceil(max_x * 2) / 2),
+            min(-1.0, math.floor(min_y * 2) / 2),
+            max(1.0, math.ceil(max_y * 2) / 2),
+        )
+
+
+class StaticOverlay:
+    """
+    鱼缸边界与角点标签的预渲染图层（图像 + 掩码），每帧一次 cv2.copyTo 合成；
+    画面尺寸、标定角点或 show_aquarium_bounds 变化时重建
+    """
+
+    def __init__(self) -> None:
+        self.rebuilds = 0
+        self._key: Optional[tuple] = None
+        self._image: Optional[np.ndarray] = None
+        self._mask: Optional[np.ndarray] = None
+        self._empty = True
+
+    def composite(
+        self,
+        display: np.ndarray,
+        config: VisualizationConfig,
+        aquarium_bounds: Optional[AquariumBounds],
+    ) -> None:
+        corners = None
+        if aquarium_bounds is not None:
+            # AquariumBounds 可变，按角点取值比较而不是按对象
+            corners = (
+                aquarium_bounds.top_left, aquarium_bounds.top_right,
+                aquarium_bounds.bottom_right, aquarium_bounds.bottom_left,
+            )
+        key = (display.shape, config.show_aquarium_bounds, corners)
+        if key != self._key:
+            self._build(display.shape, config, aquarium_bounds)
+            self._key = key
+        if not self._empty:
+            cv2.copyTo(self._image, self._mask, display)
+
+    def _build(
+        self,
+        shape: tuple[int, ...],
+        config: VisualizationConfig,
+        aquarium_bounds: Optional[AquariumBounds],
+    ) -> None:
+        self.rebuilds += 1
+        h, w = shape[:2]
+        image = np.zeros((h, w, 3), np.uint8)
+        mask = np.zeros((h, w), np.uint8)
+
+        if config.show_aquarium_bounds and aquarium_bounds is not None:
+            bounds_pts = aquarium_bounds.to_array().astype(int)
+            # 标注四个角点
+            labels = ["TL", "TR", "BR", "BL"]
+            for target, color in ((image, BOUNDS_COLOR), (mask, 255)):
+                cv2.polylines(target, [bounds_pts], True, color, 2)
+                for pt, label in zip(bounds_pts, labels):
+                    cv2.circle(target, tuple(int(v) for v in pt), 5, color, -1)
+                    cv2.putText(target, label, (int(pt[0]) + 5, int(pt[1]) - 5),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+        self._image = image
+        self._mask = mask
+        self._empty = not mask.any()
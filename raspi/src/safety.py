@@ -1,17 +1,128 @@
 from __future__ import annotations
 
+import threading
 import time
+from dataclasses import dataclass, replace
 
-from .motion_mapping import MotionVector
-from .serial_comm import ArduinoStatus
+import numpy as np
+from loguru import logger
+
+from . import serial_protocol as proto
+from .motion_mapping import MotionBatch, MotionVector
+from .serial_comm import ArduinoStatus, SerialBridge
+
+# apply_batch 中 limits 数组的列顺序
+LIMIT_KEYS = ("front", "rear", "left", "right")
+
+
+_STOP = MotionVector(0.0, 0.0, 0.0, False)
+
+
+@dataclass
+class SafetyStats:
+    """事件驱动停车计数"""
+    limit_stops: int = 0  # 限位变化后由读线程立即下发的限速/停车
+    watchdog_stops: int = 0  # 状态超时后由看门狗线程下发的停车
 
 
 class SafetyManager:
     def __init__(self, watchdog_timeout: float) -> None:
         self.watchdog_timeout = watchdog_timeout
+        # 事件驱动部分（attach 后启用）：主循环与读线程/看门狗线程经同一把锁下发指令，
+        # 保证主循环基于旧状态算出的指令不会覆盖事件触发的停车
+        self._serial: SerialBridge | None = None
+        self._lock = threading.Lock()
+        self._requested = _STOP  # 主循环最近一次请求的（限速前）指令
+        self._sent = _STOP  # 最近一次下发的指令
+        self._stale = False
+        self._stats = SafetyStats()
+        self._watch_thread: threading.Thread | None = None
+        self._stop_event = threading.Event()
+
+    def attach(self, serial: SerialBridge) -> None:
+        """订阅串口消息并启动看门狗线程：限位变化与状态超时不再等待主循环处理下一帧"""
+        self._serial = serial
+        self._stop_event.clear()
+        serial.add_listener(self._on_message)
+        self._watch_thread = threading.Thread(target=self._watch_loop, name="safety-watchdog", daemon=True)
+        self._watch_thread.start()
+
+    def detach(self) -> None:
+        if self._serial is None:
+            return
+        self._serial.remove_listener(self._on_message)
+        self._stop_event.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=1.0)
+            self._watch_thread = None
+        stats = self.stats()
+        logger.info("安全停车统计: 限位 {} 次，看门狗 {} 次", stats.limit_stops, stats.watchdog_stops)
+        self._serial = None
 
-    def apply(self, vector: MotionVector, status: ArduinoStatus) -> MotionVector:
-        if time.monotonic() - status.timestamp > self.watchdog_timeout:
+    def submit(self, vector: MotionVector) -> MotionVector:
+        """主循环使用：按最新状态限速并下发，返回实际下发的指令"""
+        assert self._serial is not None, "submit() 需要先 attach()"
+        with self._lock:
+            self._requested = vector
+            self._sent = self.apply(vector, self._serial.read_status())
+            self._serial.send_vector(self._sent)
+            return self._sent
+
+    def force_stop(self) -> None:
+        """绕过主循环立即停车（主循环卡顿时由看门狗调用），主循环下次 submit() 前保持停车"""
+        assert self._serial is not None, "force_stop() 需要先 attach()"
+        with self._lock:
+            self._requested = _STOP
+            self._sent = _STOP
+            self._serial.send_vector(_STOP)
+
+    def stats(self) -> SafetyStats:
+        with self._lock:
+            return replace(self._stats)
+
+    def _on_message(self, message: proto.DeviceMessage) -> None:
+        """读线程回调：限位状态更新后立即按新状态重新限速（此时 read_status() 已是新状态）"""
+        if message.limits is None or self._serial is None:
+            return
+        with self._lock:
+            safe = self.apply(self._requested, self._serial.read_status())
+            if safe != self._sent:
+                self._sent = safe
+                self._serial.send_vector(safe)
+                self._stats.limit_stops += 1
+                logger.warning("限位变化，立即下发限速指令: vx={:.2f} vy={:.2f}", safe.vx, safe.vy)
+
+    def _watch_loop(self) -> None:
+        """在状态时间戳到期时刻醒来检查，超时立即停车（不依赖读线程收到数据）"""
+        assert self._serial is not None
+        serial = self._serial
+        delay = self.watchdog_timeout
+        while not self._stop_event.wait(delay):
+            now = time.monotonic()
+            age = now - serial.read_status().timestamp
+            stale = age > self.watchdog_timeout
+            with self._lock:
+                if stale and not self._stale:
+                    self._stale = True
+                    self._sent = _STOP
+                    serial.send_vector(_STOP)
+                    self._stats.watchdog_stops += 1
+                    logger.warning("串口状态超时 {:.0f} ms，立即停车", age * 1000)
+                elif not stale and self._stale:
+                    self._stale = False
+                    logger.info("串口状态恢复")
+            # 未超时：睡到截止时刻；已超时：定期检查是否恢复
+            delay = max(self.watchdog_timeout - age, 0.001) if not stale else self.watchdog_timeout / 10
+
+    def apply(
+        self,
+        vector: MotionVector,
+        status: ArduinoStatus,
+        now: float | None = None,
+    ) -> MotionVector:
+        if now is None:
+            now = time.monotonic()
+        if now - status.timestamp > self.watchdog_timeout:
             return MotionVector(0.0, 0.0, 0.0, False)
 
         vx, vy = vector.vx, vector.vy
@@ -29,3 +140,33 @@ class SafetyManager:
 
         return MotionVector(vx, vy, vector.omega, vector.active)
 
+    def apply_batch(
+        self,
+        vectors: MotionBatch,
+        limits: np.ndarray,
+        status_timestamps: np.ndarray,
+        now: np.ndarray,
+    ) -> MotionBatch:
+        """
+        向量化版本的 apply，结果与逐条调用逐位一致
+        limits: (N, 4) 布尔数组，列顺序见 LIMIT_KEYS
+        status_timestamps: (N,) 每个样本对应的 ArduinoStatus.timestamp
+        now: (N,) 每个样本的处理时刻
+        """
+        limits = np.asarray(limits, dtype=bool).reshape(-1, len(LIMIT_KEYS))
+        front, rear, left, right = limits.T
+        stale = np.asarray(now, dtype=np.float64) - np.asarray(
+            status_timestamps, dtype=np.float64
+        ) > self.watchdog_timeout
+
+        vx = np.asarray(vectors.vx, dtype=np.float64)
+        vy = np.asarray(vectors.vy, dtype=np.float64)
+        vy = np.where((front & (vy > 0)) | (rear & (vy < 0)), 0.0, vy)
+        vx = np.where((left & (vx < 0)) | (right & (vx > 0)), 0.0, vx)
+
+        stopped = stale | ((vx == 0.0) & (vy == 0.0))
+        vx = np.where(stopped, 0.0, vx)
+        vy = np.where(stopped, 0.0, vy)
+        omega = np.where(stale, 0.0, np.asarray(vectors.omega, dtype=np.float64))
+        active = ~stopped & np.asarray(vectors.active, dtype=bool)
+        return MotionBatch(vx, vy, omega, active)
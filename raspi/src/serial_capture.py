@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+串口收发抓包与回放
+SerialBridge 开启 capture_path 后把双向的每个字节连同 time.monotonic() 时间戳写入紧凑的二进制文件，
+写盘在后台线程完成，不占用收发线程。本模块同时提供统计与回放命令行工具。
+
+文件格式（小端）:
+  文件头: [b"FCAP"][version:u8][wall_time:f64]
+  记录:   [timestamp:f64][direction:u8][length:u16][payload]   direction: 0=发送 1=接收
+
+使用方法:
+  python -m src.serial_capture stats logs/serial.cap
+  python -m src.serial_capture replay logs/serial.cap --port /dev/ttyACM0 [--speed 1.0] [-o logs/replay.cap]
+"""
+from __future__ import annotations
+
+import argparse
+import queue
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterable, Optional, Sequence
+
+import numpy as np
+import serial
+from loguru import logger
+
+MAGIC = b"FCAP"
+VERSION = 1
+TX = 0
+RX = 1
+
+_HEADER = struct.Struct("<4sBd")
+_RECORD = struct.Struct("<dBH")
+_MAX_PAYLOAD = 0xFFFF
+# 写盘队列上限（条）：磁盘卡顿时丢弃新记录而不是无限占用内存
+_MAX_QUEUED = 4096
+_CLOSE_TIMEOUT = 2.0  # close() 等待后台线程的时间（秒）
+
+# 回放时跳过的握手指令：波特率切换无法在固定速率的端口上重现
+_REPLAY_SKIP_PREFIXES = (b"BAUD", b"ECHO")
+
+
+@dataclass(frozen=True)
+class CaptureRecord:
+    timestamp: float
+    direction: int  # TX / RX
+    data: bytes
+
+
+def _write_record(fh: BinaryIO, direction: int, timestamp: float, data: bytes) -> None:
+    """超过 u16 长度的数据拆成多条记录"""
+    for start in range(0, len(data), _MAX_PAYLOAD):
+        chunk = data[start:start + _MAX_PAYLOAD]
+        fh.write(_RECORD.pack(timestamp, direction, len(chunk)))
+        fh.write(chunk)
+
+
+class CaptureWriter:
+    """
+    SerialBridge 收发线程使用的抓包写入器，线程安全；record() 只把数据放入有界队列，打包与写盘由后台线程完成。
+    队列满时丢弃新记录并计入 dropped（不阻塞收发线程）；close() 开始后 record() 不再接受数据。
+    离线写出完整的记录列表请用 write_capture()
+    """
+
+    def __init__(self, path: Path, max_queued: int = _MAX_QUEUED) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = path.open("wb")
+        self._fh.write(_HEADER.pack(MAGIC, VERSION, time.time()))
+        self._queue: queue.Queue[Optional[tuple[int, float, bytes]]] = queue.Queue(max_queued)
+        self._lock = threading.Lock()
+        self._closing = False
+        self.records = 0
+        self.bytes = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, direction: int, timestamp: float, data: bytes) -> None:
+        if not data:
+            return
+        with self._lock:
+            if self._closing:
+                return
+            try:
+                self._queue.put_nowait((direction, timestamp, bytes(data)))
+            except queue.Full:
+                self.dropped += 1
+                if self.dropped == 1:
+                    logger.warning("串口抓包写盘跟不上，开始丢弃记录: {}", self.path)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+        if self._thread.is_alive():
+            try:
+                # 队列满时等待后台线程腾出位置
+                self._queue.put(None, timeout=_CLOSE_TIMEOUT)
+            except queue.Full:
+                # 写盘卡住：丢弃排队的记录，保证停止流程不被阻塞
+                discarded = self._discard_queued()
+                logger.warning("串口抓包写盘超时，丢弃 {} 条排队记录: {}", discarded, self.path)
+                self._queue.put_nowait(None)
+            self._thread.join(timeout=_CLOSE_TIMEOUT)
+        if self._thread.is_alive():
+            logger.warning("串口抓包写盘线程未能及时退出: {}", self.path)
+        elif not self._fh.closed:
+            self._fh.close()
+
+    def _discard_queued(self) -> int:
+        discarded = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            discarded += 1
+        self.dropped += discarded
+        return discarded
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._write(*item)
+            # 队列暂时清空时才刷新，突发数据合并为一次系统调用
+            if self._queue.empty():
+                self._fh.flush()
+        self._fh.flush()
+
+    def _write(self, direction: int, timestamp: float, data: bytes) -> None:
+        _write_record(self._fh, direction, timestamp, data)
+        self.records += 1
+        self.bytes += len(data)
+
+
+def read_capture(path: Path) -> list[CaptureRecord]:
+    """读取抓包文件；末尾不完整的记录（进程被中断）被忽略"""
+    raw = path.read_bytes()
+    if len(raw) < _HEADER.size or raw[:4] != MAGIC:
+        raise ValueError(f"不是串口抓包文件: {path}")
+    _, version, _ = _HEADER.unpack_from(raw)
+    if version != VERSION:
+        raise ValueError(f"不支持的抓包文件版本: {version}")
+    records: list[CaptureRecord] = []
+    pos = _HEADER.size
+    while pos + _RECORD.size <= len(raw):
+        timestamp, direction, length = _RECORD.unpack_from(raw, pos)
+        pos += _RECORD.size
+        if pos + length > len(raw):
+            break
+        records.append(CaptureRecord(timestamp, direction, raw[pos:pos + length]))
+        pos += length
+    return records
+
+
+@dataclass(frozen=True)
+class TimingSummary:
+    """一组时间间隔的统计（秒），无样本时各项为 None"""
+    count: int
+    mean: Optional[float]
+    p50: Optional[float]
+    p95: Optional[float]
+    max: Optional[float]
+
+    @classmethod
+    def from_samples(cls, samples: np.ndarray) -> "TimingSummary":
+        if samples.size == 0:
+            return cls(0, None, None, None, None)
+        p50, p95 = np.percentile(samples, (50, 95))
+        return cls(int(samples.size), float(samples.mean()), float(p50), float(p95), float(samples.max()))
+
+    def describe(self) -> str:
+        if not self.count:
+            return "无样本"
+        return "n={} 平均 {:.2f} ms p50 {:.2f} ms p95 {:.2f} ms 最大 {:.2f} ms".format(
+            self.count, self.mean * 1000, self.p50 * 1000, self.p95 * 1000, self.max * 1000,
+        )
+
+
+@dataclass(frozen=True)
+class CaptureStats:
+    duration: float
+    tx_bytes: int
+    rx_bytes: int
+    command_gaps: TimingSummary  # 相邻两次发送之间的间隔
+    reply_latency: TimingSummary  # 发送到下一次发送之前首个接收字节的时延
+    unanswered: int  # 下一次发送前没有收到任何回复的发送
+    bursts: int  # 间隔小于 burst_gap 的连续发送组数（组内至少 2 次）
+    max_burst: int  # 最大的连续发送次数
+
+
+def analyze(records: Sequence[CaptureRecord], burst_gap: float = 0.005) -> CaptureStats:
+    if not records:
+        empty = TimingSummary.from_samples(np.empty(0))
+        return CaptureStats(0.0, 0, 0, empty, empty, 0, 0, 0)
+    timestamps = np.fromiter((r.timestamp for r in records), dtype=np.float64, count=len(records))
+    directions = np.fromiter((r.direction for r in records), dtype=np.uint8, count=len(records))
+    sizes = np.fromiter((len(r.data) for r in records), dtype=np.int64, count=len(records))
+    order = np.argsort(timestamps, kind="stable")
+    timestamps, directions, sizes = timestamps[order], directions[order], sizes[order]
+
+    tx_times = timestamps[directions == TX]
+    rx_times = timestamps[directions == RX]
+    gaps = np.diff(tx_times)
+
+    # 每次发送后的首个接收时刻，需早于下一次发送才算作回复
+    latency = np.empty(0)
+    unanswered = 0
+    if tx_times.size:
+        idx = np.searchsorted(rx_times, tx_times, side="left")
+        has_rx = idx < rx_times.size
+        first_rx = np.full(tx_times.shape, np.inf)
+        first_rx[has_rx] = rx_times[idx[has_rx]]
+        next_tx = np.append(tx_times[1:], np.inf)
+        answered = first_rx < next_tx
+        latency = first_rx[answered] - tx_times[answered]
+        unanswered = int(tx_times.size - answered.sum())
+
+    bursts = 0
+    max_burst = 1 if tx_times.size else 0
+    if gaps.size:
+        # 连续“短间隔”的游程长度 + 1 即为突发大小
+        short = np.concatenate(([False], gaps < burst_gap, [False])).astype(np.int8)
+        edges = np.diff(short)
+        runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+        bursts = int(runs.size)
+        if runs.size:
+            max_burst = int(runs.max()) + 1
+
+    return CaptureStats(
+        duration=float(timestamps[-1] - timestamps[0]),
+        tx_bytes=int(sizes[directions == TX].sum()),
+        rx_bytes=int(sizes[directions == RX].sum()),
+        command_gaps=TimingSummary.from_samples(gaps),
+        reply_latency=TimingSummary.from_samples(latency),
+        unanswered=unanswered,
+        bursts=bursts,
+        max_burst=max_burst,
+    )
+
+
+def log_stats(title: str, stats: CaptureStats) -> None:
+    logger.info("== {} ==", title)
+    logger.info("时长 {:.2f} s，发送 {} 字节，接收 {} 字节", stats.duration, stats.tx_bytes, stats.rx_bytes)
+    logger.info("发送间隔: {}", stats.command_gaps.describe())
+    logger.info("回复时延: {}（无回复 {}）", stats.reply_latency.describe(), stats.unanswered)
+    logger.info("突发发送: {} 组，最大连续 {} 次", stats.bursts, stats.max_burst)
+
+
+def replay(
+    records: Iterable[CaptureRecord],
+    port: str,
+    baudrate: int,
+    speed: float = 1.0,
+    settle: float = 0.5,
+) -> list[CaptureRecord]:
+    """按原始时间间隔（除以 speed）重放发送方向的数据，返回本次回放的收发记录"""
+    outgoing = [
+        r for r in records
+        if r.direction == TX and not r.data.startswith(_REPLAY_SKIP_PREFIXES)
+    ]
+    result: list[CaptureRecord] = []
+    stop = threading.Event()
+    with serial.Serial(port, baudrate, timeout=0.01) as ser:
+        def read_loop() -> None:
+            while not stop.is_set():
+                chunk = ser.read(ser.in_waiting or 1)
+                if chunk:
+                    result.append(CaptureRecord(time.monotonic(), RX, chunk))
+
+        reader = threading.Thread(target=read_loop, daemon=True)
+        reader.start()
+        if outgoing:
+            base = outgoing[0].timestamp
+            start = time.monotonic()
+            for record in outgoing:
+                delay = start + (record.timestamp - base) / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                now = time.monotonic()
+                ser.write(record.data)
+                result.append(CaptureRecord(now, TX, record.data))
+        time.sleep(settle)
+        stop.set()
+        reader.join(timeout=1.0)
+    result.sort(key=lambda r: r.timestamp)
+    return result
+
+
+def write_capture(path: Path, records: Iterable[CaptureRecord]) -> None:
+    """同步写出全部记录（离线使用，不经过 CaptureWriter 的有界队列，不会丢弃记录）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as fh:
+        fh.write(_HEADER.pack(MAGIC, VERSION, time.time()))
+        for record in records:
+            if record.data:
+                _write_record(fh, record.direction, record.timestamp, record.data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="串口抓包统计与回放")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = sub.add_parser("stats", help="统计抓包文件的时序")
+    stats_parser.add_argument("capture", type=Path)
+    stats_parser.add_argument("--burst-gap", type=float, default=0.005, help="判定为突发的发送间隔（秒）")
+
+    replay_parser = sub.add_parser("replay", help="向真实设备或模拟器重放发送数据并统计时序")
+    replay_parser.add_argument("capture", type=Path)
+    replay_parser.add_argument("--port", required=True, help="串口路径（可为模拟器的 PTY）")
+    replay_parser.add_argument("--baud", type=int, default=9600, help="打开串口的波特率（BAUD/ECHO 握手不重放）")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="回放倍速")
+    replay_parser.add_argument("--burst-gap", type=float, default=0.005, help="判定为突发的发送间隔（秒）")
+    replay_parser.add_argument("-o", "--output", type=Path, help="保存本次回放的抓包")
+    args = parser.parse_args()
+
+    records = read_capture(args.capture)
+    log_stats(f"抓包 {args.capture}", analyze(records, args.burst_gap))
+    if args.command == "replay":
+        replayed = replay(records, args.port, args.baud, args.speed)
+        log_stats(f"回放 {args.port}", analyze(replayed, args.burst_gap))
+        if args.output:
+            write_capture(args.output, replayed)
+            logger.info("回放抓包已保存: {}", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,121 @@
 from __future__ import annotations
 
+import os
+import secrets
 import threading
 import time
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, replace
 from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Deque, Mapping, Optional
 
 import serial
 from loguru import logger
+from serial.tools import list_ports
 
+from . import serial_protocol as proto
 from .config_loader import SerialConfig
+from .link_latency import LatencySnapshot, RttTracker
+from .serial_capture import RX, TX, CaptureWriter
 from .motion_mapping import MotionVector
 
 
-@dataclass
+_MAX_RX_BUFFER = 256
+# 不携带限位状态、但刷新状态时间戳（看门狗）的回复
+_LIVENESS_KINDS = frozenset((proto.MSG_PONG, proto.MSG_ACK, proto.MSG_SPEED_OK, proto.MSG_SPEED_ERR))
+
+
+class LinkLostError(serial.SerialException):
+    """串口未报错但链路已不可用（固件复位、波特率不一致），按断线处理"""
+
+
+@dataclass(frozen=True)
 class ArduinoStatus:
-    timestamp: float
-    limits: dict[str, bool]
+    """Arduino 状态快照（不可变，读线程整体替换）"""
+    timestamp: float  # 最近一次收到有效回复的时刻
+    limits: Mapping[str, bool]
+    rtt: Optional[float] = None  # 最近一次 PING 往返时延（秒）
+
+
+@dataclass
+class LinkStats:
+    """读线程计数（链路健康度）"""
+    bytes_received: int = 0
+    messages: int = 0
+    status_updates: int = 0
+    speed_errors: int = 0  # SPEED ERR / 状态字节 bit4
+    command_errors: int = 0  # CMD ERR
+    unknown_replies: int = 0  # UNKNOWN
+    nak: int = 0  # 二进制 NAK
+    collisions: int = 0  # COLLISION_* / 状态字节 bit5
+    crc_errors: int = 0
+    parse_errors: int = 0  # 无法识别的文本行或噪声
+    reconnects: int = 0  # 断线后成功重连的次数
+
+
+@dataclass
+class WriterStats:
+    """写线程计数"""
+    sent: int = 0  # 实际发送的速度指令
+    dropped: int = 0  # 发送前被更新的指令覆盖
+    suppressed: int = 0  # 与上一条相同且未到保活间隔，跳过
+    coalesced: int = 0  # 与心跳合并为一次发送
+    heartbeats: int = 0  # 发送的心跳
 
 
 class SerialBridge:
     def __init__(self, config: SerialConfig) -> None:
         self.config = config
         self._serial: serial.Serial | None = None
-        self._lock = threading.Lock()
         self._status = ArduinoStatus(
-            time.monotonic(), {"front": False, "rear": False, "left": False, "right": False}
+            time.monotonic(),
+            MappingProxyType({"front": False, "rear": False, "left": False, "right": False}),
         )
+        self._link_stats = LinkStats()
+        self._listeners: list[Callable[[proto.DeviceMessage], None]] = []
+        # 往返时延：PING->PONG（两种协议）与 V->ACK（仅二进制协议）
+        self._ping_rtt = RttTracker()
+        self._ack_rtt = RttTracker()
+        self._link_degraded = False
+        # 链路丢失检测（读线程）：最近一次有效消息的时刻、连续解析/CRC 错误次数、待处理的断线原因
+        self._last_message = time.monotonic()
+        self._error_run = 0
+        self._link_lost: str | None = None
+        self._recent_messages: Deque[tuple[float, proto.DeviceMessage]] = deque(maxlen=64)
         self._reader_thread: threading.Thread | None = None
         self._running = False
+        self._stop_event = threading.Event()
+        # 断线重连：重连期间 _connected 清除，写线程跳过发送；握手期间持有 _link_lock
+        self._connected = threading.Event()
+        self._link_lock = threading.Lock()
+        self._usb_id: tuple[int, int | None] | None = (
+            (config.usb_vid, config.usb_pid) if config.usb_vid is not None else None
+        )
+        # 实际使用的协议（open() 时协商得到）
+        self.protocol = "text"
+        # 实际使用的波特率（open() 时协商得到）
+        self.baudrate = config.baudrate
+        self._seq = 0
+        self._rx_buffer = bytearray()
+        # 写线程：单槽“最新指令”邮箱，旧指令未发出即被覆盖
+        self._writer_thread: threading.Thread | None = None
+        self._write_cond = threading.Condition()
+        self._pending_vector: tuple[int, int, int] | None = None
+        self._pending_heartbeat = False
+        self._last_sent_vector: tuple[int, int, int] | None = None
+        self._last_sent_time = 0.0
+        self._writer_stats = WriterStats()
+        # 抓包（capture_path 配置时启用），写盘在 CaptureWriter 的后台线程中完成
+        self._capture: CaptureWriter | None = None
+
+    def open(self) -> int:
+        """打开串口并完成握手，返回最终协商得到的波特率"""
+        port = self._discover_port()
 
-    def open(self) -> None:
-        port = self.config.port
-        
         # 检查串口设备是否存在
-        if not Path(port).exists():
+        if port is None:
+            port = self.config.port
             logger.error("串口设备不存在: {}", port)
             logger.error("请检查：")
             logger.error("1. Arduino 是否已连接到树莓派")
@@ -43,16 +125,30 @@ class SerialBridge:
             raise serial.SerialException(f"串口设备不存在: {port}")
         
         logger.info("打开串口 {} @ {}", port, self.config.baudrate)
+        if self.config.capture_path and self._capture is None:
+            self._capture = CaptureWriter(Path(self.config.capture_path))
+            logger.info("串口抓包已启用: {}", self.config.capture_path)
         try:
             self._serial = serial.Serial(
                 port,
                 self.config.baudrate,
                 timeout=self.config.timeout,
             )
+            self.baudrate = self._negotiate_baudrate()
+            self.protocol = self._negotiate_protocol()
+            if self._usb_id is None:
+                self._usb_id = self._lookup_usb_id(port)
             self._running = True
+            self._stop_event.clear()
+            self._last_message = time.monotonic()
+            self._connected.set()
             self._reader_thread = threading.Thread(target=self._read_loop, daemon=True)
             self._reader_thread.start()
-            logger.info("串口连接成功")
+            self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer_thread.start()
+            logger.info("串口连接成功（波特率: {}，协议: {}）", self.baudrate, self.protocol)
+            logger.info("指令到电机时延上界: {:.1f} ms", self.command_latency_bound() * 1000)
+            return self.baudrate
         except serial.SerialException as e:
             logger.error("串口打开失败: {}", e)
             logger.error("可能的原因：")
@@ -62,90 +158,543 @@ class SerialBridge:
             raise
 
     def stop(self) -> None:
-        self._running = False
+        with self._write_cond:
+            self._running = False
+            self._write_cond.notify_all()
+        self._stop_event.set()
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._writer_thread.join(timeout=1.0)
         if self._reader_thread and self._reader_thread.is_alive():
             self._reader_thread.join(timeout=1.0)
+        stats = self.writer_stats()
+        logger.info(
+            "串口发送统计: 发送 {} 覆盖 {} 去重 {} 合并 {} 心跳 {}",
+            stats.sent, stats.dropped, stats.suppressed, stats.coalesced, stats.heartbeats,
+        )
+        link = self.link_stats()
+        logger.info(
+            "串口接收统计: 消息 {} SPEED ERR {} CMD ERR {} UNKNOWN {} NAK {} 碰撞 {} CRC 错误 {} 解析错误 {} 重连 {}",
+            link.messages, link.speed_errors, link.command_errors, link.unknown_replies,
+            link.nak, link.collisions, link.crc_errors, link.parse_errors, link.reconnects,
+        )
+        latency = self.latency_stats()
+        if latency.samples:
+            logger.info(
+                "串口往返时延: p50 {:.1f} ms p95 {:.1f} ms 最大 {:.1f} ms 抖动 {:.1f} ms 丢失 {}",
+                latency.p50 * 1000, latency.p95 * 1000, latency.max * 1000, latency.jitter * 1000, latency.lost,
+            )
         if self._serial:
             logger.info("关闭串口")
-            self._serial.close()
-            self._serial = None
+            self._close_port()
+        if self._capture is not None:
+            self._capture.close()
+            logger.info(
+                "串口抓包已保存: {}（{} 条记录，{} 字节，丢弃 {} 条）",
+                self._capture.path, self._capture.records, self._capture.bytes, self._capture.dropped,
+            )
+            self._capture = None
+
+    def _query_line(
+        self,
+        command: str,
+        accept,
+        timeout: float,
+        resend_interval: float | None = None,
+    ) -> str | None:
+        """
+        握手阶段（读线程启动前）发送文本指令并等待满足 accept 的回复行
+        resend_interval 不为 None 时定期重发（Arduino 打开串口时会复位，复位期间发送的内容会丢失）
+        """
+        assert self._serial is not None
+        deadline = time.monotonic() + timeout
+        next_send = 0.0
+        while time.monotonic() < deadline:
+            now = time.monotonic()
+            if now >= next_send:
+                payload = (command + "\n").encode("ascii")
+                self._serial.write(payload)
+                if self._capture is not None:
+                    self._capture.record(TX, now, payload)
+                next_send = now + resend_interval if resend_interval is not None else float("inf")
+            raw = self._serial.readline()
+            if raw and self._capture is not None:
+                self._capture.record(RX, time.monotonic(), raw)
+            line = raw.decode("utf-8", errors="ignore").strip()
+            if line and accept(line):
+                return line
+        return None
+
+    def _negotiate_baudrate(self) -> int:
+        """
+        波特率协商：以初始波特率查询固件支持的速率，从高到低尝试切换，
+        每次切换后做回显测试并确认；失败则回到初始波特率（固件在超时未确认时也会自动回退）
+        """
+        initial = self.config.baudrate
+        candidates = sorted({rate for rate in self.config.baud_candidates if rate > initial}, reverse=True)
+        if not candidates:
+            return initial
+        reply = self._query_line(
+            proto.BAUD_QUERY,
+            lambda line: line.startswith(proto.BAUD_LIST_PREFIX) or line == "UNKNOWN",
+            self.config.handshake_timeout,
+            resend_interval=0.3,
+        )
+        if reply is None or reply == "UNKNOWN":
+            logger.warning("固件不支持波特率协商，保持 {}", initial)
+            return initial
+        supported = {int(token) for token in reply.split()[1:] if token.isdigit()}
+        for rate in candidates:
+            if rate in supported and self._try_baudrate(rate, initial):
+                logger.info("波特率已提升到 {}", rate)
+                return rate
+        return initial
+
+    def _try_baudrate(self, rate: int, fallback: int) -> bool:
+        assert self._serial is not None
+        reply = self._query_line(
+            f"{proto.BAUD_SET} {rate}",
+            lambda line: line.startswith(proto.BAUD_SET_OK) or line == proto.BAUD_SET_ERR,
+            timeout=0.5,
+        )
+        if reply != f"{proto.BAUD_SET_OK} {rate}":
+            return False
+        self._serial.baudrate = rate
+        self._serial.reset_input_buffer()
+        if self._echo_test():
+            for _ in range(3):
+                confirmed = self._query_line(
+                    proto.BAUD_CONFIRM, lambda line: line == proto.BAUD_CONFIRMED, timeout=0.3
+                )
+                if confirmed:
+                    return True
+        # 等待固件确认超时；BAUD CONFIRM 可能已被固件收到而只是回复丢失，此时固件不会回退，
+        # 因此先在新速率下探测，无应答才回到原速率
+        time.sleep(proto.BAUD_REVERT_TIMEOUT + 0.2)
+        if self._probe(rate):
+            logger.warning("波特率 {} 的确认回复丢失，固件已切换，沿用该速率", rate)
+            return True
+        logger.warning("波特率 {} 验证失败，回退到 {}", rate, fallback)
+        if not self._probe(fallback):
+            logger.warning("波特率 {} 下固件无应答", fallback)
+        return False
+
+    def _probe(self, rate: int, attempts: int = 3) -> bool:
+        """切换到 rate 并清空残余数据，回显测试确认固件是否在该速率下应答"""
+        assert self._serial is not None
+        self._serial.baudrate = rate
+        self._serial.reset_input_buffer()
+        # 先结束固件缓冲区中可能残留的半行（空行不会产生回复）
+        self._serial.write(b"\n")
+        if self._capture is not None:
+            self._capture.record(TX, time.monotonic(), b"\n")
+        for _ in range(attempts):
+            token = f"{proto.ECHO} {secrets.token_hex(8)}"
+            if self._query_line(token, lambda line: line.startswith(proto.ECHO), timeout=0.3) == token:
+                return True
+        return False
+
+    def _echo_test(self, rounds: int = 8) -> bool:
+        """回显测试：随机内容必须逐条原样返回"""
+        for _ in range(rounds):
+            token = f"{proto.ECHO} {secrets.token_hex(8)}"
+            if self._query_line(token, lambda line: line.startswith(proto.ECHO), timeout=0.3) != token:
+                return False
+        return True
+
+    def _negotiate_protocol(self) -> str:
+        """
+        协商通信协议：配置为 binary 时发送 PROTO BIN 直到固件确认
+        旧固件回复 UNKNOWN 或超时则回退到文本协议
+        """
+        if self.config.protocol != "binary":
+            return "text"
+        assert self._serial is not None
+        reply = self._query_line(
+            proto.NEGOTIATE_BINARY,
+            lambda line: line in (proto.NEGOTIATE_BINARY_OK, "UNKNOWN"),
+            self.config.handshake_timeout,
+            resend_interval=0.3,
+        )
+        if reply == proto.NEGOTIATE_BINARY_OK:
+            self._serial.reset_input_buffer()
+            return "binary"
+        if reply == "UNKNOWN":
+            logger.warning("固件不支持二进制协议，回退到文本协议")
+        else:
+            logger.warning("二进制协议协商超时，回退到文本协议")
+        return "text"
+
+    def _next_seq(self) -> int:
+        self._seq = (self._seq + 1) & 0xFF
+        return self._seq
 
     def send_vector(self, vector: MotionVector) -> None:
-        if not vector.active:
-            command = "V 0 0 0"
+        """放入发送邮箱后立即返回，由写线程发送"""
+        if vector.active:
+            components = (
+                self._scale_component(vector.vx),
+                self._scale_component(vector.vy),
+                self._scale_component(vector.omega),
+            )
         else:
-            vx = self._scale_component(vector.vx)
-            vy = self._scale_component(vector.vy)
-            omega = self._scale_component(vector.omega)
-            command = f"V {vx} {vy} {omega}"
-        self._write_line(command)
+            components = (0, 0, 0)
+        with self._write_cond:
+            if self._pending_vector is not None:
+                self._writer_stats.dropped += 1
+            self._pending_vector = components
+            self._write_cond.notify()
 
     def send_heartbeat(self) -> None:
         if self.config.heartbeat_interval <= 0:
             return
-        self._write_line("PING")
+        with self._write_cond:
+            self._pending_heartbeat = True
+            self._write_cond.notify()
 
     def read_status(self) -> ArduinoStatus:
-        with self._lock:
-            return self._status
+        # 读线程只做引用替换，直接返回当前快照即可
+        return self._status
+
+    def link_stats(self) -> LinkStats:
+        """返回读线程计数的快照"""
+        return replace(self._link_stats)
+
+    def latency_stats(self) -> LatencySnapshot:
+        """PING/PONG 往返时延统计"""
+        return self._ping_rtt.snapshot(time.monotonic())
+
+    def ack_latency_stats(self) -> LatencySnapshot:
+        """速度指令到 ACK 的时延统计（仅二进制协议有数据）"""
+        return self._ack_rtt.snapshot(time.monotonic())
+
+    def command_latency_bound(self) -> float:
+        """当前波特率与协议下“指令到电机”的时延上界（秒），不含写线程排队"""
+        frame_bytes = proto.HOST_FRAME_LEN if self.protocol == "binary" else proto.MAX_TEXT_COMMAND_LEN
+        return proto.command_latency_bound(self.baudrate, frame_bytes)
+
+    def recent_messages(self) -> list[tuple[float, proto.DeviceMessage]]:
+        """最近收到的固件消息 (接收时刻, 消息)，用于诊断"""
+        return list(self._recent_messages)
+
+    def add_listener(self, callback: Callable[[proto.DeviceMessage], None]) -> None:
+        """注册消息回调（在读线程中调用，需尽快返回）"""
+        self._listeners.append(callback)
 
-    def _write_line(self, payload: str) -> None:
-        if self._serial is None or not self._serial.is_open:
-            logger.debug("串口未就绪，跳过发送: {}", payload)
+    def remove_listener(self, callback: Callable[[proto.DeviceMessage], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def writer_stats(self) -> WriterStats:
+        """返回写线程计数的快照"""
+        with self._write_cond:
+            return replace(self._writer_stats)
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._write_cond:
+                while self._running and self._pending_vector is None and not self._pending_heartbeat:
+                    self._write_cond.wait()
+                if not self._running:
+                    break
+            try:
+                self._write_pending()
+            except (serial.SerialException, OSError) as exc:
+                logger.error("串口写入异常: {}", exc)
+                # 由读线程负责重连，期间的指令被丢弃；未启用重连时读线程随之退出
+                self._connected.clear()
+                if not self.config.reconnect:
+                    logger.error("未启用自动重连，串口发送已停止，之后的指令不会发出")
+                    break
+
+    def _write_pending(self) -> None:
+        """取出邮箱中的指令与心跳，去重后发送（可合并为一次写入）"""
+        with self._write_cond:
+            vector, self._pending_vector = self._pending_vector, None
+            heartbeat, self._pending_heartbeat = self._pending_heartbeat, False
+            stats = self._writer_stats
+
+            payload = b""
+            vector_seq = ping_seq = None
+            if vector is not None:
+                now = time.monotonic()
+                if (
+                    self.config.suppress_repeats
+                    and vector == self._last_sent_vector
+                    and now - self._last_sent_time < self.config.keepalive_interval
+                ):
+                    stats.suppressed += 1
+                else:
+                    payload, vector_seq = self._encode_vector(vector)
+                    self._last_sent_vector = vector
+                    self._last_sent_time = now
+                    stats.sent += 1
+            heartbeat_payload = b""
+            if heartbeat:
+                heartbeat_payload, ping_seq = self._encode_heartbeat()
+                stats.heartbeats += 1
+            if payload and heartbeat_payload and self.config.coalesce_heartbeat:
+                payload += heartbeat_payload
+                heartbeat_payload = b""
+                stats.coalesced += 1
+
+        if payload:
+            sent_at = time.monotonic()
+            self._write_bytes(payload)
+            # 合并发送时心跳与指令同时出发
+            if vector_seq is not None:
+                self._ack_rtt.sent(vector_seq, sent_at)
+            if ping_seq is not None and not heartbeat_payload:
+                self._ping_rtt.sent(ping_seq, sent_at)
+        if heartbeat_payload:
+            sent_at = time.monotonic()
+            self._write_bytes(heartbeat_payload)
+            self._ping_rtt.sent(ping_seq, sent_at)
+
+    def _encode_vector(self, components: tuple[int, int, int]) -> tuple[bytes, int | None]:
+        """返回 (报文, 序号)；文本协议的速度指令不带序号"""
+        if self.protocol == "binary":
+            seq = self._next_seq()
+            return proto.encode_command(proto.CMD_VECTOR, seq, *components), seq
+        return "V {} {} {}\n".format(*components).encode("ascii"), None
+
+    def _encode_heartbeat(self) -> tuple[bytes, int]:
+        seq = self._next_seq()
+        if self.protocol == "binary":
+            return proto.encode_command(proto.CMD_PING, seq), seq
+        return f"PING {seq}\n".encode("ascii"), seq
+
+    def _write_bytes(self, payload: bytes) -> None:
+        """只由写线程调用；重连握手期间（读线程持有 _link_lock）直接跳过，不阻塞写线程"""
+        if not self._connected.is_set() or not self._link_lock.acquire(blocking=False):
+            logger.debug("串口重连中，跳过发送: {}", payload)
             return
-        message = payload.strip() + "\n"
-        with self._lock:
-            self._serial.write(message.encode("utf-8"))
+        try:
+            if self._serial is None or not self._serial.is_open:
+                logger.debug("串口未就绪，跳过发送: {}", payload)
+                return
+            sent_at = time.monotonic()
+            self._serial.write(payload)
+            if self._capture is not None:
+                self._capture.record(TX, sent_at, payload)
+        finally:
+            self._link_lock.release()
 
     def _read_loop(self) -> None:
-        assert self._serial is not None
         while self._running:
+            port = self._serial
             try:
-                raw = self._serial.readline()
-                if not raw:
-                    continue
-                line = raw.decode("utf-8", errors="ignore").strip()
-                if not line:
-                    continue
-                logger.debug("串口收到: {}", line)
-                if line.startswith("STATUS"):
-                    limits = self._parse_status_line(line)
-                    if limits:
-                        with self._lock:
-                            self._status = ArduinoStatus(time.monotonic(), limits)
-                elif line == "PONG":
-                    with self._lock:
-                        self._status = ArduinoStatus(time.monotonic(), self._status.limits)
-                else:
-                    # 其他提示信息仅记录日志
-                    continue
-            except serial.SerialException as exc:
+                if port is None or not self._connected.is_set():
+                    raise serial.SerialException("串口连接已断开")
+                # 阻塞等待首字节（最多 timeout），之后一次取走缓冲区中的全部数据
+                chunk = port.read(port.in_waiting or 1)
+                if chunk:
+                    self._feed(chunk)
+                self._check_link(time.monotonic())
+            except (serial.SerialException, OSError) as exc:
+                if not self._running:
+                    break
                 logger.error("串口异常: {}", exc)
+                if not self.config.reconnect or not self._reconnect():
+                    # 写线程随之跳过发送（_write_bytes 检查 _connected）
+                    self._connected.clear()
+                    if self._running:
+                        logger.error("串口连接已断开且未能恢复，串口收发已停止")
+                    break
+
+    def _reconnect(self) -> bool:
+        """
+        读线程中执行：关闭旧连接，按指数退避重新发现设备、打开并重新握手
+        返回是否重连成功（stop() 时返回 False）
+        """
+        self._connected.clear()
+        with self._link_lock:
+            self._close_port()
+        started = time.monotonic()
+        delay = self.config.reconnect_initial_delay
+        attempts = 0
+        while self._running:
+            attempts += 1
+            port = self._discover_port()
+            if port is not None:
+                try:
+                    with self._link_lock:
+                        self._serial = serial.Serial(port, self.config.baudrate, timeout=self.config.timeout)
+                        # 丢弃复位过程中以旧波特率收到的乱码
+                        self._serial.reset_input_buffer()
+                        self.baudrate = self._negotiate_baudrate()
+                        self.protocol = self._negotiate_protocol()
+                except (serial.SerialException, OSError) as exc:
+                    logger.debug("串口重连失败（第 {} 次）: {}", attempts, exc)
+                    with self._link_lock:
+                        self._close_port()
+                else:
+                    self._reset_link_state()
+                    self._link_stats.reconnects += 1
+                    self._connected.set()
+                    logger.info(
+                        "串口已重连: {}（波特率 {}，协议 {}，第 {} 次尝试，耗时 {:.2f} s）",
+                        port, self.baudrate, self.protocol, attempts, time.monotonic() - started,
+                    )
+                    return True
+            if self._stop_event.wait(delay):
                 break
+            delay = min(delay * 2, self.config.reconnect_max_delay)
+        return False
 
-    @staticmethod
-    def _scale_component(value: float) -> int:
-        scaled = int(round(value * 100))
-        return max(-127, min(127, scaled))
+    def _reset_link_state(self) -> None:
+        """重连后丢弃断线前排队的数据：旧指令、半截接收数据、未回复的往返时延请求"""
+        with self._write_cond:
+            self._pending_vector = None
+            self._pending_heartbeat = False
+            # 强制下一条指令立即发出，不受去重影响
+            self._last_sent_vector = None
+        self._rx_buffer.clear()
+        self._last_message = time.monotonic()
+        self._error_run = 0
+        self._link_lost = None
+        self._ping_rtt.discard_pending()
+        self._ack_rtt.discard_pending()
 
-    @staticmethod
-    def _parse_status_line(line: str) -> dict[str, bool] | None:
-        parts = line.split()
-        if len(parts) < 5:
+    def _check_link(self, now: float) -> None:
+        """读线程中调用：链路已丢失时抛出 LinkLostError，由读线程按断线处理"""
+        reason, self._link_lost = self._link_lost, None
+        timeout = self.config.link_loss_factor * self.config.watchdog_timeout
+        if reason is None and timeout > 0 and now - self._last_message > timeout:
+            reason = f"{now - self._last_message:.1f} s 未收到有效消息"
+        if reason is not None:
+            raise LinkLostError(f"链路丢失: {reason}")
+
+    def _count_error(self) -> None:
+        """解析/CRC 错误连续出现（波特率不一致时收到的都是乱码）达到阈值时标记链路丢失"""
+        self._error_run += 1
+        threshold = self.config.link_error_threshold
+        if threshold > 0 and self._error_run == threshold:
+            self._link_lost = f"连续 {self._error_run} 次解析/CRC 错误"
+
+    def _close_port(self) -> None:
+        if self._serial is None:
+            return
+        try:
+            self._serial.close()
+        except (serial.SerialException, OSError) as exc:
+            logger.debug("关闭串口异常: {}", exc)
+        self._serial = None
+
+    def _discover_port(self) -> str | None:
+        """按 USB VID/PID 查找设备；未知 VID/PID 时使用配置的串口路径"""
+        if self._usb_id is not None:
+            vid, pid = self._usb_id
+            for info in list_ports.comports():
+                if info.vid == vid and (pid is None or info.pid == pid):
+                    return info.device
             return None
-        result: dict[str, bool] = {}
-        for token in parts[1:]:
-            if "=" not in token:
-                continue
-            key, value = token.split("=", 1)
-            result[key] = value == "1"
-        if {"front", "back", "left", "right"} <= result.keys():
-            # 将 back 映射为 rear，保证兼容性
-            return {
-                "front": result["front"],
-                "rear": result["back"],
-                "left": result["left"],
-                "right": result["right"],
-            }
+        return self.config.port if Path(self.config.port).exists() else None
+
+    @staticmethod
+    def _lookup_usb_id(port: str) -> tuple[int, int | None] | None:
+        """查询已连接串口的 USB VID/PID（支持 /dev/serial/by-id 等符号链接）"""
+        target = os.path.realpath(port)
+        for info in list_ports.comports():
+            if info.vid is not None and os.path.realpath(info.device) == target:
+                logger.debug("串口 {} 的 USB ID: {:04x}:{:04x}", port, info.vid, info.pid or 0)
+                return info.vid, info.pid
         return None
 
+    def _feed(self, chunk: bytes) -> None:
+        """把收到的字节加入缓冲区，增量切分并分发完整的消息"""
+        now = time.monotonic()
+        if self._capture is not None:
+            self._capture.record(RX, now, chunk)
+        stats = self._link_stats
+        stats.bytes_received += len(chunk)
+        self._rx_buffer += chunk
+        for item in proto.split_stream(self._rx_buffer):
+            if isinstance(item, proto.CrcError):
+                stats.crc_errors += 1
+                self._count_error()
+                logger.warning("下行帧校验失败: {}", item)
+                continue
+            if isinstance(item, proto.ReplyFrame):
+                message = proto.frame_to_message(item)
+            else:
+                logger.debug("串口收到: {}", item)
+                message = proto.parse_line(item)
+            if message is None:
+                stats.parse_errors += 1
+                self._count_error()
+                logger.debug("无法解析的串口数据: {}", item)
+                continue
+            self._dispatch(message, now)
+        if len(self._rx_buffer) > _MAX_RX_BUFFER:
+            # 长时间没有换行或同步字节，视为噪声丢弃
+            stats.parse_errors += 1
+            self._count_error()
+            self._rx_buffer.clear()
+
+    def _dispatch(self, message: proto.DeviceMessage, now: float) -> None:
+        stats = self._link_stats
+        stats.messages += 1
+        self._last_message = now
+        self._error_run = 0
+        kind = message.kind
+        if kind == proto.MSG_READY:
+            # 固件复位后回到上电状态（初始波特率、文本协议）；协商过的链路需要重新握手
+            if self.baudrate != self.config.baudrate or self.protocol != "text":
+                self._link_lost = "收到 READY，Arduino 已复位"
+            else:
+                logger.warning("Arduino 已复位")
+        elif kind == proto.MSG_NAK:
+            stats.nak += 1
+            logger.warning("Arduino 拒绝指令 seq={}", message.seq)
+        elif kind == proto.MSG_SPEED_ERR or message.flags & proto.STATUS_SPEED_ERR:
+            stats.speed_errors += 1
+            logger.warning("Arduino 电机驱动写入失败")
+        elif kind == proto.MSG_CMD_ERR:
+            stats.command_errors += 1
+            logger.warning("Arduino 指令格式错误")
+        elif kind == proto.MSG_UNKNOWN:
+            stats.unknown_replies += 1
+            logger.warning("Arduino 不识别的指令")
+        elif kind == proto.MSG_COLLISION:
+            stats.collisions += 1
+        if message.flags & proto.STATUS_COLLISION:
+            stats.collisions += 1
+
+        rtt = self._status.rtt
+        if message.seq is not None:
+            tracker = self._ping_rtt if kind == proto.MSG_PONG else self._ack_rtt if kind == proto.MSG_ACK else None
+            if tracker is not None:
+                sample = tracker.received(message.seq, now)
+                if sample is not None and kind == proto.MSG_PONG:
+                    rtt = sample
+                    self._check_rtt(sample)
+
+        # 状态快照整体替换（不可变对象），read_status() 无需加锁
+        if message.limits is not None:
+            stats.status_updates += 1
+            self._status = ArduinoStatus(now, MappingProxyType(dict(message.limits)), rtt)
+        elif kind in _LIVENESS_KINDS:
+            # 固件只在限位变化或周期性上报 STATUS，指令回复同样证明链路存活
+            self._status = ArduinoStatus(now, self._status.limits, rtt)
+
+        self._recent_messages.append((now, message))
+        for listener in self._listeners:
+            try:
+                listener(message)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("串口消息回调异常: {}", exc)
+
+    def _check_rtt(self, rtt: float) -> None:
+        """往返时延超过看门狗超时的一半时告警（状态变化时各记录一次）"""
+        degraded = rtt > self.config.watchdog_timeout / 2
+        if degraded != self._link_degraded:
+            self._link_degraded = degraded
+            if degraded:
+                logger.warning("串口往返时延 {:.1f} ms 接近看门狗超时，链路可能劣化", rtt * 1000)
+            else:
+                logger.info("串口往返时延恢复正常 ({:.1f} ms)", rtt * 1000)
+
+    @staticmethod
+    def _scale_component(value: float) -> int:
+        scaled = int(round(value * 100))
+        return max(-127, min(127, scaled))
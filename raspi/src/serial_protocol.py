@@ -0,0 +1,249 @@
+"""
+串口二进制协议编解码
+与 arduino/fishcar/fishcar.ino 中的定义保持一致
+
+上行（树莓派 -> Arduino）固定 7 字节:
+  [0xA5][type][seq][vx:int8][vy:int8][omega:int8][crc8]
+下行（Arduino -> 树莓派）固定 5 字节:
+  [0xA6][type][seq][status][crc8]
+crc8 为 CRC-8/SMBUS（多项式 0x07，初值 0），覆盖同步字节之后、crc 之前的所有字节。
+同步字节均 >= 0x80，可与 ASCII 文本行在同一字节流中区分。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Union
+
+HOST_SYNC = 0xA5
+DEVICE_SYNC = 0xA6
+HOST_FRAME_LEN = 7
+DEVICE_FRAME_LEN = 5
+
+# 上行帧类型
+CMD_VECTOR = 0x01
+CMD_PING = 0x02
+
+# 下行帧类型
+REPLY_ACK = 0x81
+REPLY_PONG = 0x82
+REPLY_STATUS = 0x83
+REPLY_NAK = 0x8E
+
+# 状态字节位定义
+STATUS_FRONT = 0x01
+STATUS_BACK = 0x02
+STATUS_LEFT = 0x04
+STATUS_RIGHT = 0x08
+STATUS_SPEED_ERR = 0x10
+STATUS_COLLISION = 0x20
+
+# 协议协商（文本指令）
+NEGOTIATE_BINARY = "PROTO BIN"
+NEGOTIATE_BINARY_OK = "PROTO BIN OK"
+
+# 波特率协商（文本指令，在初始波特率下进行）
+BAUD_QUERY = "BAUD?"  # 回复: BAUDS 9600 115200 ...
+BAUD_LIST_PREFIX = "BAUDS "
+BAUD_SET = "BAUD"  # BAUD <rate>，回复 BAUD OK <rate> 或 BAUD ERR，随后双方切换
+BAUD_SET_OK = "BAUD OK"
+BAUD_SET_ERR = "BAUD ERR"
+BAUD_CONFIRM = "BAUD CONFIRM"  # 新速率下验证通过后确认，回复 BAUD CONFIRMED
+BAUD_CONFIRMED = "BAUD CONFIRMED"
+BAUD_REVERT_TIMEOUT = 1.0  # 固件切换后未收到确认时回退到原速率的超时（秒）
+ECHO = "ECHO"  # ECHO <token>，原样返回
+
+# 固件处理时延上界（秒）：最后一个字节到达后，逐字节状态机在下一次 loop 迭代内
+# 完成解析并写入 I2C（约 0.6 ms @100kHz），留出余量取 2 ms
+FIRMWARE_PROCESSING_BOUND = 0.002
+# 最长的文本速度指令 "V -127 -127 -127\n"（分量限幅见 SerialBridge._scale_component）
+MAX_TEXT_COMMAND_LEN = 17
+_BITS_PER_BYTE = 10  # 8N1：起始位 + 8 数据位 + 停止位
+
+
+def command_latency_bound(baudrate: int, frame_bytes: int) -> float:
+    """指令从写入串口到电机速度更新的时延上界（秒）= 线路传输时间 + 固件处理上界"""
+    return frame_bytes * _BITS_PER_BYTE / baudrate + FIRMWARE_PROCESSING_BOUND
+
+
+def _build_crc8_table() -> tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return tuple(table)
+
+
+_CRC8_TABLE = _build_crc8_table()
+
+
+def crc8(data: bytes) -> int:
+    crc = 0
+    for byte in data:
+        crc = _CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_command(command: int, seq: int, vx: int = 0, vy: int = 0, omega: int = 0) -> bytes:
+    """编码上行帧，速度分量为 -127~127 的整数"""
+    body = bytes((command, seq & 0xFF, vx & 0xFF, vy & 0xFF, omega & 0xFF))
+    return bytes((HOST_SYNC,)) + body + bytes((crc8(body),))
+
+
+@dataclass(frozen=True)
+class ReplyFrame:
+    """解码后的下行帧"""
+    kind: int
+    seq: int
+    status: int
+
+    @property
+    def limits(self) -> dict[str, bool]:
+        return status_to_limits(self.status)
+
+
+def status_to_limits(status: int) -> dict[str, bool]:
+    return {
+        "front": bool(status & STATUS_FRONT),
+        "rear": bool(status & STATUS_BACK),
+        "left": bool(status & STATUS_LEFT),
+        "right": bool(status & STATUS_RIGHT),
+    }
+
+
+def encode_reply(kind: int, seq: int, status: int) -> bytes:
+    """编码下行帧（测试与固件模拟器使用）"""
+    body = bytes((kind, seq & 0xFF, status & 0xFF))
+    return bytes((DEVICE_SYNC,)) + body + bytes((crc8(body),))
+
+
+class CrcError(ValueError):
+    """下行帧校验失败"""
+
+
+def split_stream(buffer: bytearray) -> list[Union[str, ReplyFrame, CrcError]]:
+    """
+    从接收缓冲区中切分出完整的文本行与二进制帧（原地移除已消费的字节）
+    不完整的尾部数据保留在缓冲区中等待后续字节
+    """
+    items: list[Union[str, ReplyFrame, CrcError]] = []
+    pos = 0
+    size = len(buffer)
+    while pos < size:
+        if buffer[pos] == DEVICE_SYNC:
+            if size - pos < DEVICE_FRAME_LEN:
+                break
+            frame = bytes(buffer[pos:pos + DEVICE_FRAME_LEN])
+            if crc8(frame[1:4]) != frame[4]:
+                # 校验失败：文本中不会出现同步字节，按整帧丢弃
+                items.append(CrcError(frame.hex()))
+                pos += DEVICE_FRAME_LEN
+                continue
+            items.append(ReplyFrame(frame[1], frame[2], frame[3]))
+            pos += DEVICE_FRAME_LEN
+            continue
+        newline = buffer.find(b"\n", pos)
+        sync = buffer.find(bytes((DEVICE_SYNC,)), pos)
+        if sync != -1 and (newline == -1 or sync < newline):
+            # 文本片段被二进制帧打断（通常是残缺行），丢弃到同步字节为止
+            pos = sync
+            continue
+        if newline == -1:
+            break
+        line = bytes(buffer[pos:newline]).decode("utf-8", errors="ignore").strip()
+        if line:
+            items.append(line)
+        pos = newline + 1
+    del buffer[:pos]
+    return items
+
+
+# 固件消息类型
+MSG_STATUS = "status"
+MSG_PONG = "pong"
+MSG_ACK = "ack"
+MSG_NAK = "nak"
+MSG_SPEED_OK = "speed_ok"
+MSG_SPEED_ERR = "speed_err"
+MSG_CMD_ERR = "cmd_err"
+MSG_UNKNOWN = "unknown"
+MSG_COLLISION = "collision"
+MSG_READY = "ready"
+MSG_INFO = "info"  # 握手等其他已知文本回复
+
+
+@dataclass(frozen=True)
+class DeviceMessage:
+    """解析后的固件消息（文本行或二进制帧）"""
+    kind: str
+    limits: Optional[dict[str, bool]] = None  # 携带限位状态的消息（STATUS / 二进制帧）
+    seq: Optional[int] = None  # 二进制帧序号
+    flags: int = 0  # 二进制状态字节
+    detail: str = ""  # 原始文本或附加信息（如碰撞方向）
+
+
+_SIMPLE_LINES = {
+    "PONG": MSG_PONG,
+    "SPEED OK": MSG_SPEED_OK,
+    "SPEED ERR": MSG_SPEED_ERR,
+    "CMD ERR": MSG_CMD_ERR,
+    "UNKNOWN": MSG_UNKNOWN,
+    "READY": MSG_READY,
+}
+
+_INFO_PREFIXES = ("PROTO ", "BAUD", ECHO)
+
+_REPLY_KINDS = {
+    REPLY_ACK: MSG_ACK,
+    REPLY_PONG: MSG_PONG,
+    REPLY_STATUS: MSG_STATUS,
+    REPLY_NAK: MSG_NAK,
+}
+
+
+def parse_status_line(line: str) -> Optional[dict[str, bool]]:
+    """解析 `STATUS front=0 back=0 left=0 right=0`，back 映射为 rear"""
+    parts = line.split()
+    if len(parts) < 5:
+        return None
+    result: dict[str, bool] = {}
+    for token in parts[1:]:
+        if "=" not in token:
+            continue
+        key, value = token.split("=", 1)
+        result[key] = value == "1"
+    if {"front", "back", "left", "right"} <= result.keys():
+        return {
+            "front": result["front"],
+            "rear": result["back"],
+            "left": result["left"],
+            "right": result["right"],
+        }
+    return None
+
+
+def parse_line(line: str) -> Optional[DeviceMessage]:
+    """解析一行固件文本输出，无法识别时返回 None"""
+    kind = _SIMPLE_LINES.get(line)
+    if kind is not None:
+        return DeviceMessage(kind, detail=line)
+    if line.startswith("PONG "):
+        seq = line[5:].strip()
+        return DeviceMessage(MSG_PONG, seq=int(seq) & 0xFF, detail=line) if seq.isdigit() else None
+    if line.startswith("STATUS"):
+        limits = parse_status_line(line)
+        return DeviceMessage(MSG_STATUS, limits=limits, detail=line) if limits else None
+    if line.startswith("COLLISION_"):
+        return DeviceMessage(MSG_COLLISION, detail=line[len("COLLISION_"):].lower())
+    if line.startswith(_INFO_PREFIXES):
+        return DeviceMessage(MSG_INFO, detail=line)
+    return None
+
+
+def frame_to_message(frame: ReplyFrame) -> Optional[DeviceMessage]:
+    """二进制下行帧转换为消息，未知类型返回 None"""
+    kind = _REPLY_KINDS.get(frame.kind)
+    if kind is None:
+        return None
+    return DeviceMessage(kind, limits=frame.limits, seq=frame.seq, flags=frame.status)
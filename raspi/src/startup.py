@@ -0,0 +1,83 @@
+"""
+启动时间线模块
+记录各个初始化阶段（配置、模型加载、摄像头、串口等）的起止时间，便于定位启动瓶颈
+"""
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class StartupPhase:
+    """单个启动阶段（时间相对于时间线起点，单位秒）"""
+    name: str
+    start: float
+    duration: float
+    ok: bool
+
+
+class StartupTimeline:
+    """线程安全的启动时间线，可在并行初始化的多个线程中同时记录"""
+
+    def __init__(self) -> None:
+        self._origin = time.monotonic()
+        self._lock = threading.Lock()
+        self._phases: list[StartupPhase] = []
+        self._marks: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """记录一个阶段的耗时，异常时同样记录（标记为失败）"""
+        start = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            end = time.monotonic()
+            with self._lock:
+                self._phases.append(StartupPhase(name, start - self._origin, end - start, ok))
+
+    def run(self, name: str, func: Callable[..., T], *args, **kwargs) -> T:
+        """在计时阶段内执行函数，便于直接提交给线程池"""
+        with self.phase(name):
+            return func(*args, **kwargs)
+
+    def mark(self, name: str) -> float:
+        """记录一个时间点（如首条指令发出），返回距起点的秒数"""
+        elapsed = time.monotonic() - self._origin
+        with self._lock:
+            self._marks.setdefault(name, elapsed)
+            return self._marks[name]
+
+    @property
+    def phases(self) -> list[StartupPhase]:
+        with self._lock:
+            return sorted(self._phases, key=lambda p: p.start)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._origin
+
+    def report(self) -> None:
+        """输出启动时间线"""
+        logger.info("启动时间线（总耗时 {:.3f}s）:", self.elapsed())
+        for phase in self.phases:
+            logger.info(
+                "  {:<16} 开始 +{:.3f}s  耗时 {:.3f}s{}",
+                phase.name,
+                phase.start,
+                phase.duration,
+                "" if phase.ok else "  [失败]",
+            )
+        with self._lock:
+            marks = sorted(self._marks.items(), key=lambda item: item[1])
+        for name, at in marks:
+            logger.info("  {:<16} @ +{:.3f}s", name, at)
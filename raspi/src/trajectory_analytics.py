@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+轨迹统计分析工具
+对 TrajectoryRecorder 保存的轨迹（流式日志目录 / .trj、.trjz 分段 / JSON）计算停留热力图、速度与加速度分布、
+激活时间占比与鱼缸覆盖率，输出 CSV 与 PNG。
+流式日志按分段内存映射、按块向量化处理，内存占用与会话长度无关，多日日志可直接在树莓派上分析。
+
+使用方法:
+  python -m src.trajectory_analytics logs/trajectory [--session 20250101-120000000] -o logs/analytics
+  python -m src.trajectory_analytics logs/trajectory.json -o logs/analytics
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from .trajectory_log import COMPRESSED_SUFFIX, SUFFIX, TrajectoryLogReader, load_segment
+from .trajectory_recorder import TRAJECTORY_DTYPE
+
+# 每次向量化处理的行数（约 49 MB 的原始记录）
+CHUNK_ROWS = 1 << 20
+
+
+@dataclass(frozen=True)
+class Histogram:
+    edges: np.ndarray  # 长度 bins + 1
+    values: np.ndarray  # 长度 bins
+
+
+@dataclass(frozen=True)
+class AnalyticsReport:
+    points: int
+    duration: float  # 有效时间（秒），不含超过 max_gap 的间隔
+    active_time: float
+    distance: float  # 积分位置的累计路程（归一化单位）
+    outside_time: float  # 位于热力图范围之外的时间
+    extent: tuple[float, float, float, float]  # min_x, max_x, min_y, max_y
+    occupancy: np.ndarray  # [y, x] 各网格的停留时间（秒）
+    speed: Histogram  # 记录的指令速度分布，值为停留时间（秒）
+    acceleration: Histogram  # 加速度分布，值为区间个数
+
+    @property
+    def active_ratio(self) -> float:
+        return self.active_time / self.duration if self.duration > 0 else 0.0
+
+    @property
+    def coverage(self) -> float:
+        """有停留时间的网格占全部网格的比例"""
+        return float(np.count_nonzero(self.occupancy)) / self.occupancy.size
+
+    @property
+    def mean_speed(self) -> float:
+        return self.distance / self.duration if self.duration > 0 else 0.0
+
+
+class TrajectoryAnalyzer:
+    """
+    按块累积统计量；相邻块之间保留上一行与上一区间的速度，结果与一次性处理整个会话相同。
+    相邻两点的区间按前一个点的状态计入（指令在两次 update 之间保持不变）。
+    速度与加速度取自记录的 vx/vy 而不是相邻位置的差分：简化后的日志（simplify_tolerance > 0）中相邻关键点
+    可能相隔接近 1 秒，位置差分只能得到区间平均速度。
+    max_gap 默认留出高于 simplify_max_interval（1 秒）与 .trjz 时间量化（1 ms）的余量。
+    """
+
+    def __init__(
+        self,
+        grid: int = 50,
+        extent: tuple[float, float, float, float] = (-1.0, 1.0, -1.0, 1.0),
+        max_speed: float = 2.0,
+        max_acceleration: float = 10.0,
+        histogram_bins: int = 40,
+        max_gap: float = 1.5,
+    ) -> None:
+        self.grid = grid
+        self.extent = extent
+        self.max_gap = max_gap
+        self._speed_edges = np.linspace(0.0, max_speed, histogram_bins + 1)
+        self._accel_edges = np.linspace(-max_acceleration, max_acceleration, histogram_bins + 1)
+        self._occupancy = np.zeros((grid, grid))
+        self._speed_hist = np.zeros(histogram_bins)
+        self._accel_hist = np.zeros(histogram_bins, dtype=np.int64)
+        self._points = 0
+        self._duration = 0.0
+        self._active_time = 0.0
+        self._distance = 0.0
+        self._tail: Optional[np.ndarray] = None  # 上一块的最后一行
+        self._tail_speed = np.nan  # 上一块最后一个区间的速度（无效区间为 NaN）
+        self._tail_dt = np.nan
+
+    def feed(self, array: np.ndarray) -> None:
+        for start in range(0, len(array), CHUNK_ROWS):
+            self._feed_chunk(array[start:start + CHUNK_ROWS])
+
+    def _feed_chunk(self, chunk: np.ndarray) -> None:
+        if not len(chunk):
+            return
+        self._points += len(chunk)
+        if self._tail is not None:
+            chunk = np.concatenate((self._tail, chunk))
+        self._tail = np.array(chunk[-1:])
+        if len(chunk) < 2:
+            return
+
+        t = chunk["timestamp"]
+        x = chunk["x"]
+        y = chunk["y"]
+        dt = np.diff(t)
+        valid = (dt > 0) & (dt <= self.max_gap)
+        step = np.hypot(np.diff(x), np.diff(y))
+        start_x = x[:-1][valid]
+        start_y = y[:-1][valid]
+        valid_dt = dt[valid]
+
+        self._duration += float(valid_dt.sum())
+        self._active_time += float(dt[valid & chunk["active"][:-1]].sum())
+        self._distance += float(step[valid].sum())
+
+        min_x, max_x, min_y, max_y = self.extent
+        occupancy, _, _ = np.histogram2d(
+            start_y, start_x, bins=self.grid, range=((min_y, max_y), (min_x, max_x)), weights=valid_dt,
+        )
+        self._occupancy += occupancy
+
+        # 区间内保持前一个点的指令速度（未激活时为 0）
+        commanded = np.where(chunk["active"][:-1], np.hypot(chunk["vx"][:-1], chunk["vy"][:-1]), 0.0)
+        speed = np.full(dt.shape, np.nan)
+        speed[valid] = commanded[valid]
+        self._speed_hist += np.histogram(
+            np.clip(speed[valid], self._speed_edges[0], self._speed_edges[-1]),
+            bins=self._speed_edges, weights=valid_dt,
+        )[0]
+
+        # 相邻两个有效区间的速度差除以区间中点间隔
+        speeds = np.concatenate(([self._tail_speed], speed))
+        dts = np.concatenate(([self._tail_dt], dt))
+        accel = np.diff(speeds) / (0.5 * (dts[:-1] + dts[1:]))
+        accel = accel[np.isfinite(accel)]
+        self._accel_hist += np.histogram(
+            np.clip(accel, self._accel_edges[0], self._accel_edges[-1]), bins=self._accel_edges,
+        )[0]
+        self._tail_speed = speed[-1]
+        self._tail_dt = dt[-1]
+
+    def report(self) -> AnalyticsReport:
+        inside = float(self._occupancy.sum())
+        return AnalyticsReport(
+            points=self._points,
+            duration=self._duration,
+            active_time=self._active_time,
+            distance=self._distance,
+            outside_time=max(0.0, self._duration - inside),
+            extent=self.extent,
+            occupancy=self._occupancy.copy(),
+            speed=Histogram(self._speed_edges, self._speed_hist.copy()),
+            acceleration=Histogram(self._accel_edges, self._accel_hist.copy()),
+        )
+
+
+def load_json_array(path: Path) -> np.ndarray:
+    """TrajectoryRecorder.save() 的 JSON 转换为结构化数组"""
+    with path.open("r", encoding="utf-8") as fh:
+        points = json.load(fh)["points"]
+    return np.array([tuple(p[name] for name in TRAJECTORY_DTYPE.names) for p in points], dtype=TRAJECTORY_DTYPE)
+
+
+def iter_input(path: Path, session: Optional[str] = None) -> Iterator[np.ndarray]:
+    """按分段产出结构化数组：目录为流式日志会话，.trj/.trjz 为单个分段，其余按 JSON 读取"""
+    if path.is_dir():
+        yield from TrajectoryLogReader(path).iter_arrays(session)
+    elif path.suffix in (SUFFIX, COMPRESSED_SUFFIX):
+        yield load_segment(path)
+    else:
+        yield load_json_array(path)
+
+
+def analyze(arrays: Iterable[np.ndarray], **kwargs) -> AnalyticsReport:
+    analyzer = TrajectoryAnalyzer(**kwargs)
+    for array in arrays:
+        analyzer.feed(array)
+    return analyzer.report()
+
+
+def summary_rows(report: AnalyticsReport) -> list[tuple[str, float]]:
+    return [
+        ("points", report.points),
+        ("duration_s", report.duration),
+        ("active_time_s", report.active_time),
+        ("active_ratio", report.active_ratio),
+        ("distance", report.distance),
+        ("mean_speed", report.mean_speed),
+        ("coverage", report.coverage),
+        ("outside_time_s", report.outside_time),
+    ]
+
+
+def _write_csv(path: Path, header: Iterable[str], rows: Iterable[Iterable]) -> None:
+    with path.open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _histogram_rows(histogram: Histogram) -> Iterator[tuple[float, float, float]]:
+    edges = histogram.edges
+    return zip(edges[:-1].tolist(), edges[1:].tolist(), histogram.values.tolist())
+
+
+def render_heatmap(occupancy: np.ndarray, cell: int = 8) -> np.ndarray:
+    """停留时间热力图（对数刻度，+y 朝上），未到达的网格为黑色"""
+    scaled = np.log1p(occupancy)
+    peak = scaled.max()
+    gray = (scaled / peak * 255).astype(np.uint8) if peak > 0 else np.zeros(occupancy.shape, np.uint8)
+    image = cv2.applyColorMap(np.flipud(gray), cv2.COLORMAP_JET)
+    image[np.flipud(occupancy) == 0] = 0
+    return cv2.resize(image, None, fx=cell, fy=cell, interpolation=cv2.INTER_NEAREST)
+
+
+def render_histogram(histogram: Histogram, width: int = 480, height: int = 240) -> np.ndarray:
+    image = np.full((height, width, 3), 255, np.uint8)
+    values = histogram.values
+    peak = values.max()
+    if peak <= 0:
+        return image
+    bar = width / len(values)
+    tops = height - np.round(values / peak * (height - 20)).astype(int)
+    for i, top in enumerate(tops.tolist()):
+        cv2.rectangle(image, (int(i * bar), top), (int((i + 1) * bar) - 1, height - 1), (200, 120, 40), -1)
+    label = f"{histogram.edges[0]:.2f} .. {histogram.edges[-1]:.2f}"
+    cv2.putText(image, label, (5, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 0, 0), 1)
+    return image
+
+
+def write_report(report: AnalyticsReport, output: Path) -> None:
+    output.mkdir(parents=True, exist_ok=True)
+    _write_csv(output / "summary.csv", ("metric", "value"), summary_rows(report))
+    _write_csv(output / "speed_histogram.csv", ("speed_min", "speed_max", "seconds"), _histogram_rows(report.speed))
+    _write_csv(
+        output / "acceleration_histogram.csv", ("accel_min", "accel_max", "count"), _histogram_rows(report.acceleration),
+    )
+    # 第一行对应 min_y，第一列对应 min_x
+    np.savetxt(output / "occupancy.csv", report.occupancy, delimiter=",", fmt="%.3f")
+    cv2.imwrite(str(output / "occupancy.png"), render_heatmap(report.occupancy))
+    cv2.imwrite(str(output / "speed_histogram.png"), render_histogram(report.speed))
+    cv2.imwrite(str(output / "acceleration_histogram.png"), render_histogram(report.acceleration))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="轨迹统计分析")
+    parser.add_argument("input", type=Path, help="流式轨迹日志目录、.trj/.trjz 分段或轨迹 JSON")
+    parser.add_argument("--session", help="日志目录中的会话名（默认最新）")
+    parser.add_argument("-o", "--output", type=Path, default=Path("logs/analytics"), help="输出目录")
+    parser.add_argument("--grid", type=int, default=50, help="热力图每边的网格数")
+    parser.add_argument("--extent", type=float, nargs=4, default=(-1.0, 1.0, -1.0, 1.0),
+                        metavar=("MIN_X", "MAX_X", "MIN_Y", "MAX_Y"), help="热力图覆盖的坐标范围")
+    parser.add_argument("--max-speed", type=float, default=2.0, help="速度直方图上限")
+    parser.add_argument("--max-accel", type=float, default=10.0, help="加速度直方图范围 ±")
+    parser.add_argument("--bins", type=int, default=40, help="直方图分箱数")
+    parser.add_argument("--max-gap", type=float, default=1.5,
+                        help="超过该间隔（秒）的相邻点不计入统计，应大于 simplify_max_interval")
+    args = parser.parse_args()
+
+    report = analyze(
+        iter_input(args.input, args.session),
+        grid=args.grid,
+        extent=tuple(args.extent),
+        max_speed=args.max_speed,
+        max_acceleration=args.max_accel,
+        histogram_bins=args.bins,
+        max_gap=args.max_gap,
+    )
+    write_report(report, args.output)
+    logger.info(
+        "{} 个点，有效时长 {:.1f} s，激活占比 {:.1%}，覆盖率 {:.1%}，平均速度 {:.3f}",
+        report.points, report.duration, report.active_ratio, report.coverage, report.mean_speed,
+    )
+    logger.info("结果已写入 {}", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+轨迹压缩
+StreamingSimplifier 在线简化轨迹（开窗法，流式 Douglas-Peucker 的常用近似）：被丢弃的每个点到保留折线的距离
+不超过 tolerance，直线与静止段只保留端点；激活状态变化处总会保留关键点，相邻关键点的时间间隔不超过 max_interval。
+
+encode_records / decode_records 把轨迹点量化为整数后做逐字段差分、zigzag 与 varint 编码，
+单个点通常只占几个字节；解码完全向量化。量化带来的额外位置误差不超过 POSITION_QUANTUM / 2 * sqrt(2)。
+"""
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .trajectory_recorder import TRAJECTORY_DTYPE
+
+TIME_QUANTUM = 1e-3  # 秒
+POSITION_QUANTUM = 1e-4  # 归一化坐标
+VELOCITY_QUANTUM = 1e-3
+_QUANTA = np.array([TIME_QUANTUM, POSITION_QUANTUM, POSITION_QUANTUM,
+                    VELOCITY_QUANTUM, VELOCITY_QUANTUM, VELOCITY_QUANTUM, 1.0])
+_FIELDS = len(_QUANTA)
+_MAX_VARINT_BYTES = 10
+
+
+class StreamingSimplifier:
+    """
+    push() 每输入一个点，返回需要保留的关键点（0 或 1 个）；
+    窗口内的点在确定不再需要时才被丢弃，因此最新的一个点总是待定的（见 pending），结束时调用 flush()
+    """
+
+    def __init__(self, tolerance: float, max_interval: float = 1.0, max_window: int = 256) -> None:
+        if tolerance <= 0:
+            raise ValueError("tolerance 必须为正数")
+        self.tolerance = tolerance
+        self.max_interval = max_interval
+        self.max_window = max_window
+        self.points_in = 0
+        self.points_out = 0
+        self.max_error = 0.0  # 被丢弃的点到保留折线的最大距离
+        self._xs = np.empty(max_window)
+        self._ys = np.empty(max_window)
+        self.reset()
+
+    def reset(self) -> None:
+        self._anchor: Optional[tuple] = None
+        self._last: Optional[tuple] = None  # 待定的最新点（不等于 anchor）
+        self._size = 0  # 窗口内（anchor 之后、不含 _last）的点数
+        self._window_error = 0.0
+
+    @property
+    def pending(self) -> Optional[tuple]:
+        return self._last
+
+    @property
+    def ratio(self) -> float:
+        """输入点数 / 保留点数"""
+        return self.points_in / self.points_out if self.points_out else 0.0
+
+    def push(self, record: tuple) -> list[tuple]:
+        self.points_in += 1
+        anchor = self._anchor
+        if anchor is None:
+            self._anchor = record
+            return self._emit([record])
+        last = self._last
+        if last is None:
+            self._last = record
+            return []
+
+        # 激活状态变化、时间跨度或窗口过大时不再延长当前线段
+        split = (
+            not (record[6] == last[6] == anchor[6])
+            or record[0] - anchor[0] > self.max_interval
+            or self._size >= self.max_window
+        )
+        if not split:
+            error = self._segment_error(anchor, record, last)
+            split = error > self.tolerance
+        if split:
+            out = [self._commit()]
+        else:
+            # last 可以被丢弃：移入窗口，record 成为新的待定点
+            self._xs[self._size] = last[1]
+            self._ys[self._size] = last[2]
+            self._size += 1
+            self._window_error = error
+            out = []
+        self._last = record
+        return self._emit(out)
+
+    def flush(self) -> list[tuple]:
+        """保留待定的最新点（结束记录或导出前调用）"""
+        if self._last is None:
+            return []
+        return self._emit([self._commit()])
+
+    def _commit(self) -> tuple:
+        """把待定点作为关键点保留，并以它作为新的起点"""
+        last = self._last
+        self.max_error = max(self.max_error, self._window_error)
+        self._anchor = last
+        self._last = None
+        self._size = 0
+        self._window_error = 0.0
+        return last
+
+    def _emit(self, records: list[tuple]) -> list[tuple]:
+        self.points_out += len(records)
+        return records
+
+    def _segment_error(self, start: tuple, end: tuple, last: tuple) -> float:
+        """窗口内各点（含 last）到线段 start→end 的最大距离"""
+        size = self._size
+        xs = np.append(self._xs[:size], last[1])
+        ys = np.append(self._ys[:size], last[2])
+        ax, ay = start[1], start[2]
+        dx, dy = end[1] - ax, end[2] - ay
+        length2 = dx * dx + dy * dy
+        if length2 > 0.0:
+            t = np.clip(((xs - ax) * dx + (ys - ay) * dy) / length2, 0.0, 1.0)
+            return float(np.hypot(xs - ax - t * dx, ys - ay - t * dy).max())
+        return float(np.hypot(xs - ax, ys - ay).max())
+
+
+def encode_records(array: np.ndarray) -> bytes:
+    """结构化轨迹数组 -> 差分 varint 字节串（第一行相对于 0 编码，可独立解码）"""
+    if not len(array):
+        return b""
+    columns = [array[name].astype(np.float64) for name in TRAJECTORY_DTYPE.names]
+    quantized = np.rint(np.column_stack(columns) / _QUANTA).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, _FIELDS), np.int64)).ravel()
+    return _encode_varints(((deltas << 1) ^ (deltas >> 63)).view(np.uint64))
+
+
+def decode_records(payload: bytes, counts: Sequence[int]) -> np.ndarray:
+    """
+    解码若干个依次拼接的 encode_records 结果，counts 为各段的点数；
+    各段的差分在段首重新开始
+    """
+    total = int(sum(counts))
+    result = np.empty(total, dtype=TRAJECTORY_DTYPE)
+    if not total:
+        return result
+    raw = _decode_varints(payload)
+    if raw.size != total * _FIELDS:
+        raise ValueError(f"轨迹数据长度不符: {raw.size} 个整数，期望 {total * _FIELDS}")
+    deltas = ((raw >> np.uint64(1)).view(np.int64) ^ -(raw & np.uint64(1)).view(np.int64)).reshape(total, _FIELDS)
+    values = np.cumsum(deltas, axis=0)
+    # 每段的累加从 0 开始：减去上一段结束时的累计值
+    ends = np.cumsum(counts)[:-1]
+    if ends.size:
+        base = np.zeros((len(counts), _FIELDS), np.int64)
+        base[1:] = values[ends - 1]
+        values -= np.repeat(base, counts, axis=0)
+    scaled = values * _QUANTA
+    for i, name in enumerate(TRAJECTORY_DTYPE.names):
+        result[name] = scaled[:, i]
+    return result
+
+
+def _encode_varints(values: np.ndarray) -> bytes:
+    """无符号 LEB128，向量化"""
+    sizes = np.ones(values.shape, np.int64)
+    for k in range(1, _MAX_VARINT_BYTES):
+        sizes += values >= np.uint64(1 << (7 * k))
+    offsets = np.cumsum(sizes) - sizes
+    out = np.empty(int(sizes.sum()), np.uint8)
+    for k in range(int(sizes.max())):
+        mask = sizes > k
+        chunk = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (sizes[mask] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[offsets[mask] + k] = (chunk | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def _decode_varints(payload: bytes) -> np.ndarray:
+    data = np.frombuffer(payload, np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if not ends.size:
+        return np.empty(0, np.uint64)
+    data = data[:ends[-1] + 1]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    group = np.repeat(np.arange(ends.size), ends - starts + 1)
+    shifts = ((np.arange(data.size) - starts[group]) * 7).astype(np.uint64)
+    parts = (data & 0x7F).astype(np.uint64) << shifts
+    return np.add.reduceat(parts, starts)
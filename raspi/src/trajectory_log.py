@@ -0,0 +1,313 @@
+"""
+流式轨迹日志
+轨迹点由后台线程批量追加写入二进制分段文件，定期 fsync，按大小与时间轮转；
+断电或崩溃最多丢失最后一个刷新周期的数据。读取时通过内存映射按需加载，
+会话长度只受磁盘空间限制，不再受 TrajectoryRecorder.max_points 限制。
+
+文件布局: <目录>/<会话>-<序号>.trj，会话名为写入器启动时刻（YYYYmmdd-HHMMSSmmm）
+分段格式（小端）: [b"FTRJ"][version:u8][itemsize:u16][start_wall_time:f64] + N 条 TRAJECTORY_DTYPE 记录
+压缩分段（compress=True，后缀 .trjz）: 文件头的 magic 为 b"FTRZ"，其后为若干块
+  [count:u32][length:u32][payload]，payload 为 trajectory_compression.encode_records 的结果，每块独立解码
+"""
+from __future__ import annotations
+
+import os
+import queue
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+from loguru import logger
+
+from .trajectory_compression import decode_records, encode_records
+from .trajectory_recorder import TRAJECTORY_DTYPE, TrajectoryPoint, TrajectoryView
+
+MAGIC = b"FTRJ"
+COMPRESSED_MAGIC = b"FTRZ"
+VERSION = 1
+SUFFIX = ".trj"
+COMPRESSED_SUFFIX = ".trjz"
+_HEADER = struct.Struct("<4sBHd")
+_CHUNK = struct.Struct("<II")
+_TICK = object()  # 队列等待超时，用于定时刷新
+
+
+class TrajectoryLogWriter:
+    """append() 只把记录放入队列，打包、写盘、fsync 与轮转都在后台线程完成"""
+
+    def __init__(
+        self,
+        directory: Path,
+        flush_interval: float = 1.0,
+        fsync_interval: float = 5.0,
+        rotate_bytes: int = 64 * 1024 * 1024,
+        rotate_seconds: float = 3600.0,
+        batch_size: int = 256,
+        compress: bool = False,
+    ) -> None:
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.batch_size = batch_size
+        self.compress = compress
+        wall = time.time()
+        self.session = time.strftime("%Y%m%d-%H%M%S", time.localtime(wall)) + f"{int(wall * 1000) % 1000:03d}"
+        self.points_written = 0
+        self.bytes_written = 0  # 不含文件头
+        self.segments = 0
+        directory.mkdir(parents=True, exist_ok=True)
+        self._fh = None
+        self._segment_bytes = 0
+        self._segment_opened = 0.0
+        self._failed = False
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trajectory-log", daemon=True)
+        self._thread.start()
+
+    def append(self, record: tuple) -> None:
+        """record 字段顺序与 TRAJECTORY_DTYPE 一致；写盘失败后不再接收记录"""
+        if not self._failed:
+            self._queue.put(record)
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5.0)
+        logger.info("轨迹日志已关闭: {} 个点，{} 个分段（会话 {}）", self.points_written, self.segments, self.session)
+        if self.compress and self.bytes_written:
+            logger.info("轨迹日志压缩比 {:.1f}（{} 字节）", self.compression_ratio, self.bytes_written)
+
+    @property
+    def compression_ratio(self) -> float:
+        """未压缩记录大小 / 实际写入字节数"""
+        if not self.bytes_written:
+            return 0.0
+        return self.points_written * TRAJECTORY_DTYPE.itemsize / self.bytes_written
+
+    def _run(self) -> None:
+        try:
+            self._loop()
+        except OSError as exc:
+            # 磁盘写满、介质被拔出等情况下继续重试只会让队列无限增长
+            self._failed = True
+            logger.error("写入轨迹日志失败，停止记录（会话 {}，已写入 {} 个点）: {}", self.session, self.points_written, exc)
+            self._close_file()
+
+    def _loop(self) -> None:
+        batch: list[tuple] = []
+        last_flush = last_fsync = time.monotonic()
+        while True:
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _TICK
+            if item is None:
+                break
+            if item is not _TICK:
+                batch.append(item)
+            now = time.monotonic()
+            if batch and (len(batch) >= self.batch_size or now - last_flush >= self.flush_interval):
+                self._write(batch)
+                batch = []
+                last_flush = now
+            elif not batch:
+                last_flush = now
+            if self._fh is not None and now - last_fsync >= self.fsync_interval:
+                self._fsync()
+                last_fsync = now
+        if batch:
+            self._write(batch)
+        if self._fh is not None:
+            self._fsync()
+            self._fh.close()
+            self._fh = None
+
+    def _write(self, batch: list[tuple]) -> None:
+        if self._fh is None or self._should_rotate():
+            self._rotate()
+        array = np.array(batch, dtype=TRAJECTORY_DTYPE)
+        if self.compress:
+            payload = encode_records(array)
+            data = _CHUNK.pack(len(array), len(payload)) + payload
+        else:
+            data = array.tobytes()
+        self._fh.write(data)
+        self._fh.flush()
+        self._segment_bytes += len(data)
+        self.bytes_written += len(data)
+        self.points_written += len(batch)
+
+    def _close_file(self) -> None:
+        if self._fh is None:
+            return
+        try:
+            self._fh.close()
+        except OSError:
+            pass
+        self._fh = None
+
+    def _should_rotate(self) -> bool:
+        return (
+            self._segment_bytes >= self.rotate_bytes
+            or time.monotonic() - self._segment_opened >= self.rotate_seconds
+        )
+
+    def _rotate(self) -> None:
+        if self._fh is not None:
+            self._fsync()
+            self._fh.close()
+            self._fh = None
+        suffix, magic = (COMPRESSED_SUFFIX, COMPRESSED_MAGIC) if self.compress else (SUFFIX, MAGIC)
+        path = self.directory / f"{self.session}-{self.segments:04d}{suffix}"
+        self._fh = path.open("xb")
+        self._fh.write(_HEADER.pack(magic, VERSION, TRAJECTORY_DTYPE.itemsize, time.time()))
+        self._segment_bytes = _HEADER.size
+        self._segment_opened = time.monotonic()
+        self.segments += 1
+        logger.debug("轨迹日志新分段: {}", path)
+
+    def _fsync(self) -> None:
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+
+def load_segment(path: Path) -> np.ndarray:
+    """
+    内存映射一个分段（只读），末尾不完整的记录被忽略；
+    压缩分段整体解码到内存（体积通常只有原始记录的几十分之一）
+    """
+    with path.open("rb") as fh:
+        header = fh.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return np.empty(0, dtype=TRAJECTORY_DTYPE)
+    magic, version, itemsize, _ = _HEADER.unpack(header)
+    if magic not in (MAGIC, COMPRESSED_MAGIC) or version != VERSION or itemsize != TRAJECTORY_DTYPE.itemsize:
+        raise ValueError(f"不支持的轨迹日志分段: {path}")
+    if magic == COMPRESSED_MAGIC:
+        return _load_compressed(path)
+    count = (path.stat().st_size - _HEADER.size) // itemsize
+    if count == 0:
+        return np.empty(0, dtype=TRAJECTORY_DTYPE)
+    return np.memmap(path, dtype=TRAJECTORY_DTYPE, mode="r", offset=_HEADER.size, shape=(count,))
+
+
+def _load_compressed(path: Path) -> np.ndarray:
+    raw = memoryview(path.read_bytes())
+    pos = _HEADER.size
+    counts: list[int] = []
+    payloads: list[memoryview] = []
+    while pos + _CHUNK.size <= len(raw):
+        count, length = _CHUNK.unpack_from(raw, pos)
+        pos += _CHUNK.size
+        if pos + length > len(raw):
+            break
+        counts.append(count)
+        payloads.append(raw[pos:pos + length])
+        pos += length
+    return decode_records(b"".join(payloads), counts)
+
+
+class TrajectoryLogReader:
+    """按会话列出分段并惰性加载"""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def sessions(self) -> list[str]:
+        return sorted({path.name.rsplit("-", 1)[0] for path in self._all_segments()})
+
+    def segments(self, session: Optional[str] = None) -> list[Path]:
+        """会话的全部分段（按序号排序），session 为 None 时取最新的会话"""
+        if session is None:
+            sessions = self.sessions()
+            if not sessions:
+                return []
+            session = sessions[-1]
+        return sorted(path for path in self._all_segments() if path.name.rsplit("-", 1)[0] == session)
+
+    def _all_segments(self) -> Iterator[Path]:
+        for suffix in (SUFFIX, COMPRESSED_SUFFIX):
+            yield from self.directory.glob(f"*{suffix}")
+
+    def iter_arrays(self, session: Optional[str] = None) -> Iterator[np.ndarray]:
+        """逐个分段返回内存映射数组，只有访问到的页才会读入内存"""
+        for path in self.segments(session):
+            array = load_segment(path)
+            if len(array):
+                yield array
+
+    def load(self, session: Optional[str] = None) -> "SessionView":
+        """整个会话的轨迹，各分段保持内存映射，不拼接成一个数组"""
+        return SessionView([TrajectoryView(array) for array in self.iter_arrays(session)])
+
+
+class SessionView:
+    """
+    按顺序串联多个分段的只读视图
+    按下标访问得到 TrajectoryPoint；按字段访问只拼接该字段（例如 8 字节的时间戳），
+    不会把整条记录读入内存；需要逐段处理时直接遍历 segments
+    """
+
+    __slots__ = ("segments", "_offsets")
+
+    def __init__(self, segments: list[TrajectoryView]) -> None:
+        self.segments = segments
+        self._offsets = np.cumsum([len(segment) for segment in segments], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return int(self._offsets[-1]) if self.segments else 0
+
+    def __getitem__(self, index: int) -> TrajectoryPoint:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        k = int(np.searchsorted(self._offsets, index, side="right"))
+        start = int(self._offsets[k - 1]) if k else 0
+        return self.segments[k][index - start]
+
+    def __iter__(self) -> Iterator[TrajectoryPoint]:
+        for segment in self.segments:
+            yield from segment
+
+    def field(self, name: str) -> np.ndarray:
+        arrays = [segment.array[name] for segment in self.segments]
+        if not arrays:
+            return np.empty(0, dtype=TRAJECTORY_DTYPE[name])
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.concatenate(arrays)
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self.field("timestamp")
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.field("x")
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.field("y")
+
+    @property
+    def vx(self) -> np.ndarray:
+        return self.field("vx")
+
+    @property
+    def vy(self) -> np.ndarray:
+        return self.field("vy")
+
+    @property
+    def omega(self) -> np.ndarray:
+        return self.field("omega")
+
+    @property
+    def active(self) -> np.ndarray:
+        return self.field("active")
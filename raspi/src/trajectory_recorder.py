@@ -5,18 +5,41 @@
 from __future__ import annotations
 
 import json
+import math
 import time
 from collections import deque
+from collections.abc import Sequence
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Iterator, Optional, Union, overload
 
 import numpy as np
 
 from .motion_mapping import MotionVector
 
+if TYPE_CHECKING:
+    from .trajectory_compression import StreamingSimplifier
+    from .trajectory_log import TrajectoryLogWriter
 
-@dataclass
+# 轮速反馈换算：SerialBridge 把归一化速度乘以 100 下发，固件 calculateMecanum 中角速度系数 r = 10
+_WHEEL_SPEED_SCALE = 100.0
+_MECANUM_OMEGA_SCALE = 10.0
+# 单步转角小于该值时用中点法代替精确圆弧公式（避免除以接近 0 的角速度）
+_ARC_EPSILON = 1e-6
+
+# 轨迹点的结构化存储格式（字段顺序与 TrajectoryPoint 一致）
+TRAJECTORY_DTYPE = np.dtype([
+    ("timestamp", np.float64),
+    ("x", np.float64),
+    ("y", np.float64),
+    ("vx", np.float64),
+    ("vy", np.float64),
+    ("omega", np.float64),
+    ("active", np.bool_),
+])
+
+
+@dataclass(slots=True)
 class TrajectoryPoint:
     """轨迹点数据"""
     timestamp: float
@@ -28,97 +51,305 @@ class TrajectoryPoint:
     active: bool  # 是否激活
 
 
+class TrajectoryView(Sequence):
+    """
+    轨迹点的只读视图（不复制数据）
+    按下标访问得到 TrajectoryPoint；按字段访问（view.x、view.active 等）得到 NumPy 数组视图，适合向量化处理
+    视图引用环形缓冲区，之后的 update() 可能覆盖其中的数据，需要长期保留时请调用 copy()
+    """
+
+    __slots__ = ("array",)
+
+    def __init__(self, array: np.ndarray) -> None:
+        self.array = array
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    @overload
+    def __getitem__(self, index: int) -> TrajectoryPoint: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "TrajectoryView": ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TrajectoryPoint, "TrajectoryView"]:
+        if isinstance(index, slice):
+            return TrajectoryView(self.array[index])
+        return TrajectoryPoint(*self.array[index].tolist())
+
+    def __iter__(self) -> Iterator[TrajectoryPoint]:
+        for row in self.array.tolist():
+            yield TrajectoryPoint(*row)
+
+    def copy(self) -> "TrajectoryView":
+        return TrajectoryView(self.array.copy())
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self.array["timestamp"]
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.array["x"]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.array["y"]
+
+    @property
+    def vx(self) -> np.ndarray:
+        return self.array["vx"]
+
+    @property
+    def vy(self) -> np.ndarray:
+        return self.array["vy"]
+
+    @property
+    def omega(self) -> np.ndarray:
+        return self.array["omega"]
+
+    @property
+    def active(self) -> np.ndarray:
+        return self.array["active"]
+
+
+class _SlidingExtreme:
+    """滑动窗口最值（单调队列），每次写入摊还 O(1)"""
+
+    __slots__ = ("_items", "_maximum")
+
+    def __init__(self, maximum: bool) -> None:
+        self._items: deque[tuple[int, float]] = deque()
+        self._maximum = maximum
+
+    def push(self, seq: int, value: float) -> None:
+        items = self._items
+        if self._maximum:
+            while items and items[-1][1] <= value:
+                items.pop()
+        else:
+            while items and items[-1][1] >= value:
+                items.pop()
+        items.append((seq, value))
+
+    def evict(self, seq: int) -> None:
+        """淘汰序号不大于 seq 的点"""
+        if self._items and self._items[0][0] <= seq:
+            self._items.popleft()
+
+    @property
+    def value(self) -> float:
+        return self._items[0][1]
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+def wheel_speeds_to_velocity(wheel_speeds: Sequence[float]) -> tuple[float, float, float]:
+    """固件 calculateMecanum 的逆运算：轮速 (FL, FR, RL, RR) 换算为归一化车体速度 (vx, vy, omega)"""
+    fl, fr, rl, rr = wheel_speeds
+    vx = (fl + fr + rl + rr) / (4 * _WHEEL_SPEED_SCALE)
+    vy = (fl - fr - rl + rr) / (4 * _WHEEL_SPEED_SCALE)
+    omega = (fl - fr + rl - rr) / (4 * _WHEEL_SPEED_SCALE * _MECANUM_OMEGA_SCALE)
+    return vx, vy, omega
+
+
 class TrajectoryRecorder:
-    """轨迹记录器"""
+    """
+    轨迹记录器
+    轨迹点存放在预分配的结构化 NumPy 环形缓冲区中：每个点同时写入前后两半，
+    因此任意最近 N 个点总是一段连续内存，可零拷贝返回；边界由单调队列随写入增量维护。
+    内存与每帧开销不随 max_points 增长。
+    """
     
     def __init__(
         self,
         max_points: int = 1000,
         sample_interval: float = 0.1,  # 采样间隔（秒）
         save_path: Optional[Path] = None,
+        log: Optional["TrajectoryLogWriter"] = None,
+        simplifier: Optional["StreamingSimplifier"] = None,
     ) -> None:
+        if max_points <= 0:
+            raise ValueError("max_points 必须为正数")
         self.max_points = max_points
         self.sample_interval = sample_interval
         self.save_path = save_path
+        # 流式日志（可选）：每个采样点同时追加到磁盘，会话长度不受 max_points 限制
+        self.log = log
+        # 在线简化（可选）：只存储关键点，缓冲区与日志中的点数大幅减少
+        self.simplifier = simplifier
         
-        # 使用 deque 存储轨迹点（自动限制最大数量）
-        self.points: deque[TrajectoryPoint] = deque(maxlen=max_points)
+        # 环形缓冲区（长度 2 * max_points，见类说明）
+        self._buffer = np.zeros(2 * max_points, dtype=TRAJECTORY_DTYPE)
+        self._head = 0  # 下一个写入位置 [0, max_points)
+        self._count = 0
+        self._seq = 0  # 自上次清空以来写入的点数
+        # 边界：min_x, min_y, max_x, max_y
+        self._extremes = (
+            _SlidingExtreme(maximum=False),
+            _SlidingExtreme(maximum=False),
+            _SlidingExtreme(maximum=True),
+            _SlidingExtreme(maximum=True),
+        )
         
         # 当前位置（通过速度积分得到）
         self.current_x = 0.0
         self.current_y = 0.0
         self.current_theta = 0.0  # 角度（弧度）
         
-        # 上次采样时间
-        self.last_sample_time = time.monotonic()
+        # 当前保持的车体速度（零阶保持：每条指令一直作用到下一次 update）
+        self._held = (0.0, 0.0, 0.0)
+        self._last_update = time.monotonic()
+        
+        # 上次采样时间（只控制存储密度，不影响积分）
+        self.last_sample_time = self._last_update
         
         # 是否启用记录
         self.enabled = True
+
+    @property
+    def sequence(self) -> int:
+        """自上次清空以来存储的点数（单调递增，可用于增量读取新点）"""
+        return self._seq
+
+    @property
+    def points(self) -> TrajectoryView:
+        """全部轨迹点（由旧到新）的零拷贝视图"""
+        return self.get_recent_points(self._count)
         
-    def update(self, vector: MotionVector) -> None:
-        """更新轨迹（根据运动向量积分得到位置）"""
+    def update(
+        self,
+        vector: MotionVector,
+        wheel_speeds: Optional[Sequence[float]] = None,
+        now: Optional[float] = None,
+    ) -> None:
+        """
+        更新轨迹：先把上一条指令按实际持续时间积分到当前时刻，再保持新指令；
+        sample_interval 只决定多久存储一个点，每次调用都会参与积分。
+        wheel_speeds 为固件上报的实际轮速 (FL, FR, RL, RR)（-127~127）时，以其换算的车体速度代替指令速度。
+        """
         if not self.enabled:
             return
-            
-        now = time.monotonic()
-        dt = now - self.last_sample_time
+        if now is None:
+            now = time.monotonic()
+        self._integrate(now - self._last_update)
+        self._last_update = now
         
-        # 采样间隔控制
-        if dt < self.sample_interval:
+        if wheel_speeds is not None:
+            self._held = wheel_speeds_to_velocity(wheel_speeds)
+        elif vector.active:
+            self._held = (vector.vx, vector.vy, vector.omega)
+        else:
+            self._held = (0.0, 0.0, 0.0)
+        
+        # 采样间隔控制（仅存储）
+        if now - self.last_sample_time < self.sample_interval:
             return
-            
         self.last_sample_time = now
         
-        # 如果小车激活，更新位置
-        if vector.active:
-            # 简单的欧拉积分（可以改进为更精确的方法）
-            # 考虑旋转的影响
-            cos_theta = np.cos(self.current_theta)
-            sin_theta = np.sin(self.current_theta)
-            
-            # 将速度从局部坐标系转换到全局坐标系
-            vx_global = vector.vx * cos_theta - vector.vy * sin_theta
-            vy_global = vector.vx * sin_theta + vector.vy * cos_theta
-            
-            # 积分得到位置
-            self.current_x += vx_global * dt
-            self.current_y += vy_global * dt
-            self.current_theta += vector.omega * dt
-            
-            # 限制角度范围
-            self.current_theta = np.fmod(self.current_theta, 2 * np.pi)
-        else:
-            # 小车停止，位置不变
-            pass
-        
-        # 创建轨迹点
-        point = TrajectoryPoint(
-            timestamp=now,
-            x=self.current_x,
-            y=self.current_y,
-            vx=vector.vx,
-            vy=vector.vy,
-            omega=vector.omega,
-            active=vector.active,
+        record = (
+            now,
+            self.current_x,
+            self.current_y,
+            vector.vx,
+            vector.vy,
+            vector.omega,
+            vector.active,
         )
-        
-        self.points.append(point)
-    
+        if self.simplifier is None:
+            self._store(record)
+        else:
+            for kept in self.simplifier.push(record):
+                self._store(kept)
+
+    def flush(self) -> None:
+        """简化器中待定的最新点立即存储（导出或退出前调用）"""
+        if self.simplifier is not None:
+            for kept in self.simplifier.flush():
+                self._store(kept)
+
+    def pending_point(self) -> Optional[TrajectoryPoint]:
+        """已采样但尚未存储的最新点（未启用简化时为 None）"""
+        if self.simplifier is None or self.simplifier.pending is None:
+            return None
+        return TrajectoryPoint(*self.simplifier.pending)
+
+    def _store(self, record: tuple) -> None:
+        self._append(record)
+        if self.log is not None:
+            self.log.append(record)
+
+    def _integrate(self, dt: float) -> None:
+        """在 dt 内以恒定的车体速度 (vx, vy, omega) 运动：角速度不为 0 时沿精确圆弧积分"""
+        vx, vy, omega = self._held
+        if dt <= 0.0 or (vx == 0.0 and vy == 0.0 and omega == 0.0):
+            return
+        theta = self.current_theta
+        dtheta = omega * dt
+        if abs(dtheta) < _ARC_EPSILON:
+            # 中点法：误差为 O(dtheta^3)，此时可忽略
+            mid = theta + 0.5 * dtheta
+            cos_int = math.cos(mid) * dt
+            sin_int = math.sin(mid) * dt
+        else:
+            # ∫cos(theta + omega t)dt 与 ∫sin(theta + omega t)dt 的解析解
+            end = theta + dtheta
+            cos_int = (math.sin(end) - math.sin(theta)) / omega
+            sin_int = (math.cos(theta) - math.cos(end)) / omega
+        self.current_x += vx * cos_int - vy * sin_int
+        self.current_y += vx * sin_int + vy * cos_int
+        self.current_theta = math.fmod(theta + dtheta, 2 * math.pi)
+
+    def _append(self, record: tuple) -> None:
+        head = self._head
+        size = self.max_points
+        buffer = self._buffer
+        seq = self._seq
+        min_x, min_y, max_x, max_y = self._extremes
+        if self._count == size:
+            # 淘汰最旧的点
+            evicted = seq - size
+            for extreme in self._extremes:
+                extreme.evict(evicted)
+        else:
+            self._count += 1
+        buffer[head] = record
+        buffer[head + size] = record
+        self._head = head + 1 if head + 1 < size else 0
+        self._seq = seq + 1
+
+        x, y = record[1], record[2]
+        min_x.push(seq, x)
+        max_x.push(seq, x)
+        min_y.push(seq, y)
+        max_y.push(seq, y)
+
     def get_points(self) -> list[TrajectoryPoint]:
         """获取所有轨迹点"""
         return list(self.points)
     
-    def get_recent_points(self, count: int = 100) -> list[TrajectoryPoint]:
-        """获取最近的轨迹点"""
-        return list(self.points)[-count:]
+    def get_recent_points(self, count: int = 100) -> TrajectoryView:
+        """获取最近的轨迹点（零拷贝视图，由旧到新）"""
+        count = max(0, min(count, self._count))
+        end = self._head + self.max_points
+        return TrajectoryView(self._buffer[end - count:end])
     
     def clear(self) -> None:
         """清空轨迹"""
-        self.points.clear()
+        self._head = 0
+        self._count = 0
+        self._seq = 0
+        for extreme in self._extremes:
+            extreme.clear()
+        if self.simplifier is not None:
+            self.simplifier.reset()
         self.current_x = 0.0
         self.current_y = 0.0
         self.current_theta = 0.0
-        self.last_sample_time = time.monotonic()
+        self._held = (0.0, 0.0, 0.0)
+        self._last_update = time.monotonic()
+        self.last_sample_time = self._last_update
     
     def reset_position(self, x: float = 0.0, y: float = 0.0, theta: float = 0.0) -> None:
         """重置起始位置"""
@@ -132,11 +363,12 @@ class TrajectoryRecorder:
         if save_to is None:
             return
         
+        points = self.points
         data = {
-            "points": [asdict(p) for p in self.points],
+            "points": [asdict(p) for p in points],
             "metadata": {
-                "total_points": len(self.points),
-                "duration": self.points[-1].timestamp - self.points[0].timestamp if len(self.points) > 1 else 0.0,
+                "total_points": len(points),
+                "duration": float(points.timestamp[-1] - points.timestamp[0]) if len(points) > 1 else 0.0,
             }
         }
         
@@ -149,26 +381,21 @@ class TrajectoryRecorder:
         with path.open("r", encoding="utf-8") as f:
             data = json.load(f)
         
-        self.points.clear()
-        for p_data in data["points"]:
+        self.clear()
+        # 超过 max_points 时只保留最新的点
+        for p_data in data["points"][-self.max_points:]:
             point = TrajectoryPoint(**p_data)
-            self.points.append(point)
+            self._append((point.timestamp, point.x, point.y, point.vx, point.vy, point.omega, point.active))
         
         # 设置当前位置为最后一个点
-        if self.points:
+        if self._count:
             last = self.points[-1]
             self.current_x = last.x
             self.current_y = last.y
     
     def get_bounds(self) -> tuple[float, float, float, float]:
         """获取轨迹边界 (min_x, min_y, max_x, max_y)"""
-        if not self.points:
+        if not self._count:
             return (0.0, 0.0, 0.0, 0.0)
-        
-        xs = [p.x for p in self.points]
-        ys = [p.y for p in self.points]
-        
-        return (min(xs), min(ys), max(xs), max(ys))
-
-
-
+        min_x, min_y, max_x, max_y = (float(extreme.value) for extreme in self._extremes)
+        return (min_x, min_y, max_x, max_y)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+离线控制参数自动调参工具
+根据录制的检测日志与同一会话的轨迹（录制时实际发出的指令）拟合被控对象模型，
+用 scipy.optimize 在进程池中搜索 MotionMappingConfig 参数，并输出覆盖配置文件。
+
+使用方法:
+  python -m src.tune_gains -c config/default.yaml --detections logs/detections.csv \
+      --trajectory logs/trajectory/ [-o config/tuned.yaml]
+然后运行主程序时指定: python -m src.main --overlay config/tuned.yaml
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import yaml
+from loguru import logger
+
+try:
+    from .aquarium_calibration import AquariumBounds, AquariumCalibrator
+    from .config_loader import MotionMappingConfig, load_config
+    from .detection_log import load_detection_log
+    from .motion_mapping import MecanumMapper
+    from .trajectory_log import TrajectoryLogReader
+except ImportError:
+    # 如果作为独立脚本运行
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from src.aquarium_calibration import AquariumBounds, AquariumCalibrator
+    from src.config_loader import MotionMappingConfig, load_config
+    from src.detection_log import load_detection_log
+    from src.motion_mapping import MecanumMapper
+    from src.trajectory_log import TrajectoryLogReader
+
+# 可调参数及其搜索范围
+TUNABLE_BOUNDS: dict[str, tuple[float, float]] = {
+    "gain_x": (0.1, 3.0),
+    "gain_y": (0.1, 3.0),
+    "deadzone": (0.0, 0.3),
+    "min_speed": (0.0, 0.4),
+}
+
+# 仿真中归一化坐标的限幅，防止发散的候选参数产生溢出
+_POSITION_LIMIT = 2.0
+
+
+@dataclass
+class SessionData:
+    """一次录制会话（归一化到 [-1, 1] 的目标坐标与当时发出的指令）"""
+    timestamps: np.ndarray  # (N,)
+    targets: np.ndarray  # (N, 2)，无目标为 NaN
+    commands: np.ndarray  # (N, 2)，录制时发出的 vx, vy
+
+
+@dataclass(frozen=True)
+class PlantModel:
+    """
+    被控对象模型：target[k+1] = target[k] + disturbance[k] - gain * command[k] * dt
+    disturbance 为拟合残差，即鱼自身的运动
+    """
+    gain: tuple[float, float]
+    disturbance: np.ndarray  # (N, 2)
+
+
+def load_session(
+    config: MotionMappingConfig,
+    detections_path: Path,
+    trajectory_path: Path,
+    aquarium_bounds: Optional[AquariumBounds] = None,
+) -> SessionData:
+    """
+    加载检测日志，指令取自同一会话的轨迹文件（JSON）或流式轨迹日志目录（取最新会话）。
+    不能用当前配置重算指令：那样拟合的是正要被替换的控制器本身。
+    轨迹为空或与检测日志在时间上没有重叠时抛出 ValueError
+    """
+    timestamps, centers = load_detection_log(detections_path)
+    mapper = MecanumMapper(config, aquarium_bounds)
+    targets = np.full_like(centers, np.nan)
+    valid = ~np.isnan(centers).any(axis=1)
+    for i in np.flatnonzero(valid):
+        targets[i] = mapper.normalize_center((centers[i, 0], centers[i, 1]))
+
+    commands = np.zeros_like(targets)
+    point_times, point_cmds = _load_trajectory_commands(trajectory_path)
+    if not point_times.size:
+        raise ValueError(f"轨迹中没有记录指令: {trajectory_path}")
+    # 每帧取时间上最近的前一个轨迹点作为当时的指令
+    idx = np.searchsorted(point_times, timestamps, side="right") - 1
+    has_cmd = idx >= 0
+    if not has_cmd.any() or timestamps[0] > point_times[-1]:
+        raise ValueError(f"轨迹与检测日志的时间没有重叠（不是同一会话？）: {trajectory_path}")
+    commands[has_cmd] = point_cmds[idx[has_cmd]]
+    return SessionData(timestamps, targets, commands)
+
+
+def _load_trajectory_commands(path: Path) -> tuple[np.ndarray, np.ndarray]:
+    """轨迹点的时间戳与 (vx, vy) 指令，未激活的点指令为 0"""
+    if path.is_dir():
+        view = TrajectoryLogReader(path).load()
+        active = view.active[:, None]
+        return view.timestamp, np.where(active, np.column_stack((view.vx, view.vy)), 0.0)
+    with path.open("r", encoding="utf-8") as fh:
+        points = json.load(fh)["points"]
+    times = np.array([p["timestamp"] for p in points], dtype=np.float64)
+    cmds = np.array([(p["vx"], p["vy"]) if p["active"] else (0.0, 0.0) for p in points], dtype=np.float64)
+    return times, cmds.reshape(-1, 2)
+
+
+def _segments(session: SessionData, max_dt: float) -> list[tuple[int, int]]:
+    """切分为连续有目标且帧间隔正常的片段 [start, end)"""
+    valid = ~np.isnan(session.targets).any(axis=1)
+    dt = np.diff(session.timestamps, append=np.inf)
+    segments: list[tuple[int, int]] = []
+    start: Optional[int] = None
+    for i, ok in enumerate(valid):
+        if ok and start is None:
+            start = i
+        if start is not None and (not ok or dt[i] <= 0 or dt[i] > max_dt):
+            end = i + 1 if ok else i
+            if end - start >= 2:
+                segments.append((start, end))
+            start = None
+    return segments
+
+
+def fit_plant(session: SessionData, max_dt: float, default_gain: float = 1.0) -> PlantModel:
+    """按轴最小二乘拟合指令到目标位移的增益，残差作为扰动"""
+    gains = [default_gain, default_gain]
+    delta = np.zeros_like(session.targets)
+    move = np.zeros_like(session.targets)
+    mask = np.zeros(len(session.timestamps), dtype=bool)
+    for start, end in _segments(session, max_dt):
+        dt = np.diff(session.timestamps[start:end])
+        delta[start:end - 1] = np.diff(session.targets[start:end], axis=0)
+        move[start:end - 1] = session.commands[start:end - 1] * dt[:, None]
+        mask[start:end - 1] = True
+
+    for axis in range(2):
+        denom = float(np.sum(move[mask, axis] ** 2))
+        if denom > 1e-9:
+            gain = -float(np.sum(delta[mask, axis] * move[mask, axis])) / denom
+            if gain > 0:
+                gains[axis] = gain
+    disturbance = np.where(mask[:, None], delta + np.asarray(gains) * move, 0.0)
+    return PlantModel((gains[0], gains[1]), disturbance)
+
+
+class TuningObjective:
+    """候选参数的闭环仿真代价：跟踪误差均方 + effort_weight * 指令均方（可被进程池序列化）"""
+
+    def __init__(
+        self,
+        base_config: MotionMappingConfig,
+        session: SessionData,
+        plant: PlantModel,
+        names: Sequence[str],
+        effort_weight: float,
+    ) -> None:
+        self.base_config = base_config
+        self.session = session
+        self.plant = plant
+        self.names = tuple(names)
+        self.effort_weight = effort_weight
+        self.segments = _segments(session, base_config.max_dt)
+
+    def config_for(self, params: Sequence[float]) -> MotionMappingConfig:
+        return replace(self.base_config, **{name: float(value) for name, value in zip(self.names, params)})
+
+    def __call__(self, params: Sequence[float]) -> float:
+        error, effort = self.simulate(self.config_for(params))
+        return error + self.effort_weight * effort
+
+    def simulate(self, config: MotionMappingConfig) -> tuple[float, float]:
+        """返回 (误差均方, 指令均方)，误差相对小车参考点计算"""
+        mapper = MecanumMapper(config)
+        reference = np.array([config.reference_x, config.reference_y])
+        gain = np.asarray(self.plant.gain)
+        timestamps = self.session.timestamps
+        error_sum = 0.0
+        effort_sum = 0.0
+        count = 0
+        for start, end in self.segments:
+            mapper.reset()
+            target = self.session.targets[start].copy()
+            for k in range(start, end - 1):
+                vector = mapper.calculate_normalized(target[0], target[1], timestamps[k])
+                command = np.array([vector.vx, vector.vy]) if vector.active else np.zeros(2)
+                dt = timestamps[k + 1] - timestamps[k]
+                target = target + self.plant.disturbance[k] - gain * command * dt
+                np.clip(target, -_POSITION_LIMIT, _POSITION_LIMIT, out=target)
+                error = target - reference
+                error_sum += float(error @ error)
+                effort_sum += float(command @ command)
+                count += 1
+        if count == 0:
+            return 0.0, 0.0
+        return error_sum / count, effort_sum / count
+
+
+def optimize(
+    objective: TuningObjective,
+    workers: int,
+    maxiter: int,
+    seed: Optional[int] = None,
+):
+    """差分进化搜索，候选评估分发到进程池"""
+    # 延迟导入 scipy，避免拖慢其他模块的导入
+    from scipy.optimize import differential_evolution
+
+    bounds = [TUNABLE_BOUNDS[name] for name in objective.names]
+    x0 = [getattr(objective.base_config, name) for name in objective.names]
+    x0 = [float(np.clip(value, low, high)) for value, (low, high) in zip(x0, bounds)]
+    if workers <= 1:
+        return differential_evolution(objective, bounds, x0=x0, maxiter=maxiter, seed=seed, polish=False)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return differential_evolution(
+            objective,
+            bounds,
+            x0=x0,
+            maxiter=maxiter,
+            seed=seed,
+            polish=False,
+            updating="deferred",
+            workers=pool.map,
+        )
+
+
+def write_overlay(path: Path, params: dict[str, float]) -> None:
+    """写出只包含 motion_mapping 调参结果的覆盖配置"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    overlay = {"motion_mapping": {name: round(float(value), 4) for name, value in params.items()}}
+    with path.open("w", encoding="utf-8") as fh:
+        fh.write("# 由 tune_gains 自动生成，使用 --overlay 加载\n")
+        yaml.safe_dump(overlay, fh, allow_unicode=True, sort_keys=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="离线控制参数自动调参")
+    parser.add_argument("-c", "--config", type=Path, default=Path(__file__).parent.parent / "config" / "default.yaml",
+                        help="基础配置文件")
+    parser.add_argument("--detections", type=Path, required=True, help="检测日志 CSV（trajectory.detection_log_path）")
+    parser.add_argument("--trajectory", type=Path, required=True,
+                        help="同一会话的流式轨迹日志目录或轨迹 JSON，提供录制时实际发出的指令")
+    parser.add_argument("-o", "--output", type=Path, default=Path(__file__).parent.parent / "config" / "tuned.yaml",
+                        help="输出的覆盖配置文件")
+    parser.add_argument("--params", nargs="+", choices=sorted(TUNABLE_BOUNDS), default=list(TUNABLE_BOUNDS),
+                        help="参与优化的参数")
+    parser.add_argument("--effort-weight", type=float, default=0.05, help="指令代价权重")
+    parser.add_argument("--plant-gain", type=float, default=1.0, help="无法拟合时使用的被控对象增益")
+    parser.add_argument("--workers", type=int, default=4, help="并行进程数")
+    parser.add_argument("--maxiter", type=int, default=30, help="差分进化最大迭代次数")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    args = parser.parse_args()
+
+    app_config = load_config(args.config)
+    base = app_config.motion_mapping
+    aquarium_bounds = AquariumCalibrator(Path(app_config.calibration_path)).load_from_config()
+    try:
+        session = load_session(base, args.detections, args.trajectory, aquarium_bounds)
+    except (OSError, ValueError) as exc:
+        logger.error("无法加载录制数据: {}", exc)
+        sys.exit(1)
+    plant = fit_plant(session, base.max_dt, args.plant_gain)
+    logger.info("已加载 {} 帧，被控对象增益 x={:.3f} y={:.3f}", len(session.timestamps), *plant.gain)
+
+    objective = TuningObjective(base, session, plant, args.params, args.effort_weight)
+    if not objective.segments:
+        logger.error("检测日志中没有可用的连续片段")
+        sys.exit(1)
+    baseline_error, baseline_effort = objective.simulate(base)
+    logger.info("当前参数: 误差={:.5f} 指令={:.5f}", baseline_error, baseline_effort)
+
+    result = optimize(objective, args.workers, args.maxiter, args.seed)
+    best = dict(zip(objective.names, (float(v) for v in result.x)))
+    best_error, best_effort = objective.simulate(objective.config_for(result.x))
+    logger.info("最优参数: {}", ", ".join(f"{k}={v:.4f}" for k, v in best.items()))
+    logger.info("优化后: 误差={:.5f} 指令={:.5f}", best_error, best_effort)
+
+    write_overlay(args.output, best)
+    logger.info("已写入覆盖配置: {}（运行时使用 --overlay {} 加载）", args.output, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,12 +9,15 @@ from pathlib import Path
 from typing import Optional
 
 import cv2
+import numpy as np
 from loguru import logger
 
 from .aquarium_calibration import AquariumBounds
 from .config_loader import VisualizationConfig
 from .detector import DetectionResult
+from .mjpeg_stream import MjpegStreamer
 from .motion_mapping import MotionVector
+from .overlays import TRAJECTORY_COLOR, TRAJECTORY_THICKNESS, StaticOverlay, TrajectoryLayer
 from .trajectory_recorder import TrajectoryRecorder
 
 
@@ -28,6 +31,8 @@ class Visualizer:
         self.config = config
         self.aquarium_bounds = aquarium_bounds
         self.trajectory_recorder = trajectory_recorder
+        self._trajectory_layer = TrajectoryLayer(max_points=500)  # 最多显示最近500个点
+        self._static_overlay = StaticOverlay()
         self._last_time = time.time()
         self._fps = 0.0
         self._display_available = False
@@ -38,6 +43,16 @@ class Visualizer:
         # 使用内部变量跟踪 enabled 状态（因为 config 是 frozen dataclass）
         self._enabled = config.enabled
         
+        # MJPEG 推流（启用后取代 headless 模式下的定期存图）
+        self._streamer: Optional[MjpegStreamer] = None
+        if config.stream_enabled:
+            streamer = MjpegStreamer(config.stream_host, config.stream_port, config.stream_fps, config.stream_quality)
+            try:
+                streamer.start()
+                self._streamer = streamer
+            except OSError as exc:
+                logger.error("MJPEG 推流启动失败（端口 {}）: {}，改为定期保存图像", config.stream_port, exc)
+        
         # 检测是否有显示环境
         if not config.enabled:
             self._display_available = False
@@ -47,17 +62,25 @@ class Visualizer:
             if not display:
                 logger.warning("未检测到 DISPLAY 环境变量，自动切换到 headless 模式")
                 logger.info("=" * 60)
-                logger.info("Headless 模式：摄像头画面将保存到文件")
-                logger.info("保存路径: {}", self._save_path)
-                logger.info("保存间隔: 每 {} 秒", self._save_interval)
+                if self._streamer:
+                    logger.info("Headless 模式：通过 MJPEG 推流查看实时画面")
+                    logger.info(
+                        "浏览器打开: http://{}:{}/（单帧: /snapshot.jpg）", self._streamer.host, self._streamer.port,
+                    )
+                    logger.info("无客户端连接时不绘制也不编码画面")
+                else:
+                    logger.info("Headless 模式：摄像头画面将保存到文件")
+                    logger.info("保存路径: {}", self._save_path)
+                    logger.info("保存间隔: 每 {} 秒", self._save_interval)
+                    logger.info("查看最新画面: cat {} 或使用 scp 下载", self._save_path)
                 logger.info("=" * 60)
-                logger.info("查看最新画面: cat {} 或使用 scp 下载", self._save_path)
                 logger.info("")
                 self._display_available = False
                 # 自动禁用可视化窗口显示
                 self._enabled = False
-                # 确保保存目录存在
-                self._save_path.parent.mkdir(parents=True, exist_ok=True)
+                if not self._streamer:
+                    # 确保保存目录存在
+                    self._save_path.parent.mkdir(parents=True, exist_ok=True)
             else:
                 # 有 DISPLAY 环境变量，但需要测试 OpenCV 是否真的支持窗口显示
                 # 先假设可用，如果后续失败会自动切换
@@ -76,6 +99,9 @@ class Visualizer:
         # 只有在完全禁用可视化且不需要保存时才返回
         if not self._enabled and self._display_available:
             return
+        # headless 且启用推流：没有客户端观看时画面无处可去，跳过绘制
+        if not self._display_available and self._streamer and not self._streamer.active:
+            return
 
         # 创建显示图像（无论是否有显示环境，都需要绘制用于保存）
         display = frame.copy()
@@ -84,16 +110,8 @@ class Visualizer:
         if self.trajectory_recorder and self.config.show_trajectory:
             self._draw_trajectory(display)
         
-        # 绘制鱼缸边界
-        if self.config.show_aquarium_bounds and self.aquarium_bounds:
-            bounds_pts = self.aquarium_bounds.to_array().astype(int)
-            cv2.polylines(display, [bounds_pts], True, (255, 255, 0), 2)
-            # 标注四个角点
-            labels = ["TL", "TR", "BR", "BL"]
-            for i, (pt, label) in enumerate(zip(bounds_pts, labels)):
-                cv2.circle(display, tuple(pt), 5, (255, 255, 0), -1)
-                cv2.putText(display, label, (pt[0] + 5, pt[1] - 5),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
+        # 鱼缸边界与角点标签（预渲染，只在标定或配置变化时重建）
+        self._static_overlay.composite(display, self.config, self.aquarium_bounds)
         
         # 绘制检测结果
         relative_coords = None
@@ -137,6 +155,9 @@ class Visualizer:
             cv2.putText(display, f"FPS: {self._fps:.1f}", (10, y_pos), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
 
+        if self._streamer:
+            self._streamer.publish(display)
+
         # 尝试显示窗口或保存图像
         if self._display_available and self._enabled:
             # 有显示环境：尝试显示窗口
@@ -148,19 +169,23 @@ class Visualizer:
                 # 如果显示失败，禁用后续的可视化尝试
                 if self._display_available:
                     logger.warning("显示窗口失败，自动切换到 headless 模式: {}", exc)
-                    logger.info("程序将在无头模式下继续运行，定期保存检测图像到: {}", self._save_path)
+                    if self._streamer:
+                        logger.info("程序将在无头模式下继续运行，通过 MJPEG 推流查看画面（端口 {}）", self._streamer.port)
+                    else:
+                        logger.info("程序将在无头模式下继续运行，定期保存检测图像到: {}", self._save_path)
                     self._display_available = False
                     self._enabled = False
-                    self._save_path.parent.mkdir(parents=True, exist_ok=True)
-                    # 立即保存一次图像
-                    try:
-                        cv2.imwrite(str(self._save_path), display)
-                        self._last_save_time = time.time()
-                    except Exception:
-                        pass
+                    if not self._streamer:
+                        self._save_path.parent.mkdir(parents=True, exist_ok=True)
+                        # 立即保存一次图像
+                        try:
+                            cv2.imwrite(str(self._save_path), display)
+                            self._last_save_time = time.time()
+                        except Exception:
+                            pass
         
-        # Headless 模式：定期保存带标注的图像（无论 enabled 状态）
-        if not self._display_available:
+        # Headless 模式（未启用推流）：定期保存带标注的图像（无论 enabled 状态）
+        if not self._display_available and not self._streamer:
             current_time = time.time()
             if current_time - self._last_save_time >= self._save_interval:
                 try:
@@ -174,62 +199,43 @@ class Visualizer:
                     logger.warning("保存图像失败: {}", exc)
 
     def _draw_trajectory(self, display) -> None:
-        """在画面上绘制小车轨迹"""
-        if not self.trajectory_recorder:
-            return
-        
-        points = self.trajectory_recorder.get_recent_points(500)  # 最多显示最近500个点
-        if len(points) < 2:
+        """在画面上绘制小车轨迹（已存储的线段来自增量绘制的持久图层）"""
+        recorder = self.trajectory_recorder
+        if not recorder:
             return
         
-        h, w = display.shape[:2]
-        
-        # 获取轨迹边界
-        min_x, min_y, max_x, max_y = self.trajectory_recorder.get_bounds()
-        if max_x == min_x:
-            max_x = min_x + 0.1
-        if max_y == min_y:
-            max_y = min_y + 0.1
+        layer = self._trajectory_layer
+        layer.update(recorder, display.shape)
+        layer.composite(display)
         
-        # 将归一化坐标转换为像素坐标
-        def norm_to_pixel(nx: float, ny: float) -> tuple[int, int]:
-            # 归一化坐标范围通常是 -1 到 1，映射到画面中心区域
-            # 留出边距
-            margin = 50
-            px = int((nx + 1) / 2 * (w - 2 * margin) + margin)
-            py = int((ny + 1) / 2 * (h - 2 * margin) + margin)
-            return (px, py)
-        
-        # 绘制轨迹线（渐变色，越新越亮）
-        for i in range(len(points) - 1):
-            p1 = points[i]
-            p2 = points[i + 1]
-            
-            # 根据时间计算颜色（越新越亮）
-            alpha = i / len(points)
-            color_intensity = int(255 * (1 - alpha * 0.5))  # 从255到127
-            
-            pt1 = norm_to_pixel(p1.x, p1.y)
-            pt2 = norm_to_pixel(p2.x, p2.y)
-            
-            # 只绘制激活的点
-            if p1.active and p2.active:
-                cv2.line(display, pt1, pt2, (0, color_intensity, 255 - color_intensity), 2)
+        # 最新的点：启用轨迹简化时补上尚未存储的点，使轨迹末端跟随当前位置
+        count = len(recorder.points)
+        if not count:
+            return
+        last = recorder.points[-1]
+        pending = recorder.pending_point()
+        xs = np.array([last.x] if pending is None else [last.x, pending.x])
+        ys = np.array([last.y] if pending is None else [last.y, pending.y])
+        px, py = layer.to_pixels(xs, ys, display.shape)
+        if pending is not None and last.active and pending.active:
+            cv2.line(display, (int(px[0]), int(py[0])), (int(px[1]), int(py[1])), TRAJECTORY_COLOR, TRAJECTORY_THICKNESS)
         
         # 绘制当前位置
-        if points:
-            last = points[-1]
-            if last.active:
-                current_pos = norm_to_pixel(last.x, last.y)
-                cv2.circle(display, current_pos, 6, (0, 255, 0), -1)
-                cv2.circle(display, current_pos, 8, (0, 255, 0), 2)
+        current = pending if pending is not None else last
+        if current.active:
+            current_pos = (int(px[-1]), int(py[-1]))
+            cv2.circle(display, current_pos, 6, (0, 255, 0), -1)
+            cv2.circle(display, current_pos, 8, (0, 255, 0), 2)
         
         # 显示轨迹信息
-        info_text = f"Trajectory: {len(points)} points"
+        h, w = display.shape[:2]
+        info_text = f"Trajectory: {min(count, layer.max_points)} points"
         cv2.putText(display, info_text, (w - 200, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
     
     def close(self) -> None:
+        if self._streamer:
+            self._streamer.stop()
         if self._enabled and self._display_available:
             try:
                 cv2.destroyAllWindows()
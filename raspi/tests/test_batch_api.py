@@ -0,0 +1,85 @@
+"""批量接口与逐条接口的一致性测试。"""
+
+import numpy as np
+import pytest
+
+from src.aquarium_calibration import AquariumBounds
+from src.config_loader import MotionMappingConfig
+from src.detector import DetectionResult
+from src.motion_mapping import MecanumMapper, MotionBatch
+from src.safety import LIMIT_KEYS, SafetyManager
+from src.serial_comm import ArduinoStatus
+
+
+def _config(**overrides) -> MotionMappingConfig:
+    params = dict(
+        deadzone=0.1,
+        gain_x=0.8,
+        gain_y=0.8,
+        gain_rotation=0.3,
+        max_speed=1.0,
+        min_speed=0.15,
+        invert_x=False,
+        invert_y=False,
+        reference_width=640,
+        reference_height=480,
+    )
+    params.update(overrides)
+    return MotionMappingConfig(**params)
+
+
+def _bits(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64).view(np.int64)
+
+
+def _samples(n: int = 2000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = np.column_stack([rng.uniform(-50, 690, n), rng.uniform(-50, 530, n)])
+    # 覆盖中心点、死区边界、无目标等特殊情况
+    centers[:4] = [(320, 240), (352, 240), (320, 264), (0, 480)]
+    centers[rng.random(n) < 0.1] = np.nan
+    limits = rng.random((n, len(LIMIT_KEYS))) < 0.3
+    status_ts = rng.uniform(0.0, 10.0, n)
+    now = status_ts + rng.uniform(0.0, 1.0, n)
+    return centers, limits, status_ts, now
+
+
+# 倾斜视角下的鱼缸四角
+TILTED_BOUNDS = AquariumBounds((80, 60), (590, 40), (620, 450), (40, 420))
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {},
+        {"invert_x": True, "invert_y": True},
+        {"gain_x": 3.0, "min_speed": 0.0},
+        {"normalization": "aquarium", "invert_y": True},
+    ],
+)
+def test_batch_matches_scalar_bit_for_bit(overrides):
+    mapper = MecanumMapper(_config(**overrides), TILTED_BOUNDS)
+    safety = SafetyManager(watchdog_timeout=0.5)
+    centers, limits, status_ts, now = _samples()
+
+    mapped = mapper.calculate_batch(centers)
+    safe = safety.apply_batch(mapped, limits, status_ts, now)
+
+    scalar_mapped = []
+    scalar_safe = []
+    for center, limit_row, ts, t in zip(centers, limits, status_ts, now):
+        has_target = not np.isnan(center).any()
+        detection = DetectionResult(
+            has_target, (float(center[0]), float(center[1])) if has_target else None, None, None
+        )
+        vector = mapper.calculate(detection)
+        status = ArduinoStatus(float(ts), dict(zip(LIMIT_KEYS, map(bool, limit_row))))
+        scalar_mapped.append(vector)
+        scalar_safe.append(safety.apply(vector, status, now=float(t)))
+
+    for batch, vectors in ((mapped, scalar_mapped), (safe, scalar_safe)):
+        assert isinstance(batch, MotionBatch)
+        for field in ("vx", "vy", "omega"):
+            expected = [getattr(v, field) for v in vectors]
+            np.testing.assert_array_equal(_bits(getattr(batch, field)), _bits(expected))
+        np.testing.assert_array_equal(batch.active, [v.active for v in vectors])
@@ -0,0 +1,160 @@
+"""固件模拟器测试：状态机与固件行为一致，SerialBridge 可通过 PTY 连接。"""
+
+import time
+from dataclasses import replace
+
+import pytest
+
+from src import serial_protocol as proto
+from src.config_loader import SerialConfig
+from src.firmware_emulator import FirmwareEmulator, FirmwareModel
+from src.motion_mapping import MotionVector
+from src.serial_comm import SerialBridge
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_model_text_commands_and_collision_guards():
+    model = FirmwareModel(status_interval=0.0)
+    assert model.feed(b"V 30 -10 0\n", 0.0) == b"SPEED OK\r\n"
+    assert model.wheel_speeds == (20, 40, 40, 20)
+    # 同一速度不重复写电机
+    model.feed(b"V 30 -10 0\n", 0.1)
+    assert model.motor_writes == 1
+
+    # 按下后侧与左侧开关：立即清零后退分量 vy（不等待下一条指令），vx 向右不受影响，并上报状态
+    out = model.set_limits(proto.STATUS_LEFT | proto.STATUS_BACK, 0.2)
+    assert out == b"COLLISION_BACK\r\nSTATUS front=0 back=1 left=1 right=0\r\n"
+    assert model.wheel_speeds == (30, 30, 30, 30)
+
+    assert model.feed(b"PING 7\nBAUD?\nFOO\nV 1\n", 0.3) == (
+        b"PONG 7\r\nBAUDS 9600 115200 250000 500000\r\nUNKNOWN\r\nCMD ERR\r\n"
+    )
+
+
+def test_model_binary_frames_and_baud_revert():
+    model = FirmwareModel(status_interval=0.0)
+    model.feed(b"PROTO BIN\n", 0.0)
+    reply = model.feed(proto.encode_command(proto.CMD_VECTOR, 5, 0, 50, 0), 0.0)
+    assert proto.split_stream(bytearray(reply)) == [proto.ReplyFrame(proto.REPLY_ACK, 5, 0)]
+
+    model.set_limits(proto.STATUS_FRONT, 0.1)
+    reply = model.feed(proto.encode_command(proto.CMD_VECTOR, 6, 0, 50, 0), 0.1)
+    status = proto.STATUS_FRONT | proto.STATUS_COLLISION
+    assert proto.split_stream(bytearray(reply)) == [proto.ReplyFrame(proto.REPLY_ACK, 6, status)]
+    assert model.wheel_speeds == (0, 0, 0, 0)
+
+    model.feed(b"BAUD 500000\n", 1.0)
+    assert model.baudrate == 500000
+    model.tick(1.0 + proto.BAUD_REVERT_TIMEOUT)
+    assert model.baudrate == 9600
+
+
+def test_bridge_connects_to_emulator_and_reconnects(tmp_path):
+    emulator = FirmwareEmulator(tmp_path / "fishcar", processing_delay=0.0)
+    emulator.start()
+    config = SerialConfig(
+        port=emulator.port,
+        baudrate=9600,
+        timeout=0.05,
+        heartbeat_interval=0.0,
+        watchdog_timeout=0.5,
+        protocol="binary",
+        baud_candidates=(115200,),
+        handshake_timeout=1.0,
+    )
+    bridge = SerialBridge(replace(config, reconnect_initial_delay=0.01))
+    try:
+        assert bridge.open() == 115200
+        assert bridge.protocol == "binary"
+        bridge.send_vector(MotionVector(0.2, 0.3, 0.0, True))
+        assert _wait_for(lambda: emulator.model.command == (20, 30, 0))
+
+        emulator.set_limits(right=True)
+        assert _wait_for(lambda: bridge.read_status().limits["right"])
+        # vx 被右侧限位在固件本地清零，只剩 vy
+        assert emulator.model.wheel_speeds == (30, -30, -30, 30)
+
+        emulator.disconnect()
+        time.sleep(0.05)
+        emulator.reconnect()
+        assert _wait_for(lambda: bridge.link_stats().reconnects == 1)
+        bridge.send_vector(MotionVector(-0.1, 0.0, 0.0, True))
+        assert _wait_for(lambda: emulator.model.command == (-10, 0, 0))
+    finally:
+        bridge.stop()
+        emulator.stop()
+
+
+
+@pytest.mark.parametrize("baud_candidates", [(115200,), ()])
+def test_bridge_recovers_when_firmware_resets_without_reenumeration(tmp_path, baud_candidates):
+    # 提升波特率后复位：上位机只收到乱码，靠超时检测；保持 9600 时二进制协议丢失，靠 READY 检测
+    emulator = FirmwareEmulator(tmp_path / "fishcar", processing_delay=0.0, status_interval=0.1)
+    emulator.start()
+    config = SerialConfig(
+        port=emulator.port,
+        baudrate=9600,
+        timeout=0.05,
+        heartbeat_interval=0.0,
+        watchdog_timeout=0.25,
+        protocol="binary",
+        baud_candidates=baud_candidates,
+        handshake_timeout=1.0,
+        reconnect_initial_delay=0.01,
+    )
+    bridge = SerialBridge(config)
+    try:
+        bridge.open()
+        bridge.send_vector(MotionVector(0.2, 0.0, 0.0, True))
+        assert _wait_for(lambda: emulator.model.command == (20, 0, 0))
+
+        emulator.reset()
+        assert _wait_for(lambda: bridge.link_stats().reconnects == 1, timeout=5.0)
+        assert bridge.protocol == "binary"
+        assert emulator.model.binary_mode
+        assert emulator.model.baudrate == bridge.baudrate
+        bridge.send_vector(MotionVector(0.0, 0.3, 0.0, True))
+        assert _wait_for(lambda: emulator.model.command == (0, 30, 0))
+    finally:
+        bridge.stop()
+        emulator.stop()
+
+
+def test_lost_baud_confirmation_is_reprobed_at_new_rate(tmp_path):
+    emulator = FirmwareEmulator(tmp_path / "fishcar", processing_delay=0.0)
+    emulator.start()
+    model = emulator.model
+    handle_line = model._handle_line
+
+    def lose_confirmed_reply(cmd, now):
+        # 固件收到 BAUD CONFIRM 并保持新速率，但回复丢失
+        reply = handle_line(cmd, now)
+        return b"" if cmd == proto.BAUD_CONFIRM else reply
+
+    model._handle_line = lose_confirmed_reply
+    config = SerialConfig(
+        port=emulator.port,
+        baudrate=9600,
+        timeout=0.05,
+        heartbeat_interval=0.0,
+        watchdog_timeout=0.5,
+        baud_candidates=(115200,),
+        handshake_timeout=1.0,
+    )
+    bridge = SerialBridge(config)
+    try:
+        assert bridge.open() == 115200
+        assert model.baudrate == 115200
+        bridge.send_vector(MotionVector(0.1, 0.0, 0.0, True))
+        assert _wait_for(lambda: model.command == (10, 0, 0))
+    finally:
+        bridge.stop()
+        emulator.stop()
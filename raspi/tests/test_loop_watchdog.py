@@ -0,0 +1,81 @@
+"""主循环卡顿看门狗测试。"""
+
+import threading
+import time
+from pathlib import Path
+
+import yaml
+
+from src.config_loader import load_config
+from src.loop_watchdog import LoopWatchdog
+
+
+def test_stall_triggers_stop_once_and_records_location():
+    stops = []
+    stopped = threading.Event()
+
+    def on_stall():
+        stops.append(time.monotonic())
+        stopped.set()
+
+    watchdog = LoopWatchdog(0.03, on_stall)
+    watchdog.start()
+    try:
+        watchdog.beat("detect")
+        assert stopped.wait(1.0)
+        time.sleep(0.08)  # 持续卡顿期间不重复停车
+        watchdog.beat("render")
+    finally:
+        watchdog.stop()
+
+    assert len(stops) == 1
+    (stall,) = watchdog.stalls()
+    assert stall.stage == "detect"
+    assert stall.duration >= 0.1
+    assert "test_stall_triggers_stop_once_and_records_location" in stall.location
+
+
+def test_regular_beats_do_not_trigger():
+    stops = []
+    watchdog = LoopWatchdog(0.05, lambda: stops.append(time.monotonic()))
+    watchdog.start()
+    try:
+        for _ in range(10):
+            watchdog.beat("camera")
+            time.sleep(0.01)
+    finally:
+        watchdog.stop()
+    assert stops == []
+    assert watchdog.stalls() == []
+
+
+def test_detect_stage_uses_its_own_deadline():
+    stops = []
+    watchdog = LoopWatchdog(0.03, lambda: stops.append(time.monotonic()), stage_deadlines={"detect": 0.5})
+    watchdog.start()
+    try:
+        watchdog.beat("detect")
+        time.sleep(0.1)  # 慢推理，但未超过推理阶段的截止时间
+        watchdog.beat("control")
+        time.sleep(0.1)
+        watchdog.beat("render")
+    finally:
+        watchdog.stop()
+    assert len(stops) == 1
+    (stall,) = watchdog.stalls()
+    assert stall.stage == "control"
+
+
+def test_deadline_config_section_and_legacy_serial_key(tmp_path):
+    default = Path(__file__).parent.parent / "config" / "default.yaml"
+    config = load_config(default).loop_watchdog
+    assert config.deadline == 0.5
+    assert config.detect_deadline > config.deadline
+
+    # 旧配置中的 serial.loop_deadline 仍然生效
+    raw = yaml.safe_load(default.read_text(encoding="utf-8"))
+    del raw["loop_watchdog"]
+    raw["serial"]["loop_deadline"] = 0.8
+    legacy = tmp_path / "legacy.yaml"
+    legacy.write_text(yaml.safe_dump(raw, allow_unicode=True), encoding="utf-8")
+    assert load_config(legacy).loop_watchdog.deadline == 0.8
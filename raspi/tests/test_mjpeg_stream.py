@@ -0,0 +1,82 @@
+"""MJPEG 推流测试。"""
+
+import http.client
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.mjpeg_stream import BOUNDARY, MjpegStreamer
+
+
+@pytest.fixture
+def streamer():
+    streamer = MjpegStreamer("127.0.0.1", 0, fps=50.0, quality=60)
+    streamer.start()
+    yield streamer
+    streamer.stop()
+
+
+def _publish_until(streamer: MjpegStreamer, done: threading.Event) -> None:
+    frame = np.full((48, 64, 3), 128, np.uint8)
+    while not done.is_set():
+        streamer.publish(frame)
+        time.sleep(0.005)
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_encodes_only_while_clients_are_connected(streamer):
+    streamer.publish(np.zeros((48, 64, 3), np.uint8))
+    time.sleep(0.05)
+    assert streamer.frames_encoded == 0
+
+    done = threading.Event()
+    publisher = threading.Thread(target=_publish_until, args=(streamer, done), daemon=True)
+    publisher.start()
+    conn = http.client.HTTPConnection("127.0.0.1", streamer.port, timeout=5)
+    conn.request("GET", "/stream")
+    response = conn.getresponse()
+    try:
+        assert response.status == 200
+        assert BOUNDARY.decode() in response.getheader("Content-Type")
+        assert response.readline().strip() == b"--" + BOUNDARY
+        assert response.readline().strip() == b"Content-Type: image/jpeg"
+        length = int(response.readline().split(b":")[1])
+        response.readline()
+        assert response.read(length)[:2] == b"\xff\xd8"
+        assert streamer.clients == 1
+    finally:
+        response.close()
+        conn.close()
+    assert _wait_for(lambda: streamer.clients == 0)
+    encoded = streamer.frames_encoded
+    time.sleep(0.1)
+    done.set()
+    publisher.join()
+    assert streamer.frames_encoded - encoded <= 1  # 断开后最多再编码在途的一帧
+
+
+def test_snapshot_waits_for_a_fresh_frame(streamer):
+    done = threading.Event()
+    publisher = threading.Thread(target=_publish_until, args=(streamer, done), daemon=True)
+    publisher.start()
+    conn = http.client.HTTPConnection("127.0.0.1", streamer.port, timeout=5)
+    try:
+        conn.request("GET", "/snapshot.jpg")
+        response = conn.getresponse()
+        assert response.status == 200
+        assert response.read()[:2] == b"\xff\xd8"
+    finally:
+        conn.close()
+        done.set()
+        publisher.join()
+    assert streamer.clients == 0
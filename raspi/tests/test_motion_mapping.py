@@ -0,0 +1,81 @@
+"""MecanumMapper 控制模式测试。"""
+
+import pytest
+
+from src.aquarium_calibration import AquariumBounds
+from src.config_loader import MotionMappingConfig
+from src.detector import DetectionResult
+from src.motion_mapping import MecanumMapper, PIDController
+
+
+def _config(**overrides) -> MotionMappingConfig:
+    params = dict(
+        deadzone=0.02,
+        gain_x=1.5,
+        gain_y=1.5,
+        gain_rotation=0.0,
+        max_speed=1.0,
+        min_speed=0.0,
+        invert_x=False,
+        invert_y=False,
+        reference_width=640,
+        reference_height=480,
+        mode="pid",
+        ki=0.5,
+        kd=0.05,
+    )
+    params.update(overrides)
+    return MotionMappingConfig(**params)
+
+
+def _detection(nx: float, ny: float) -> DetectionResult:
+    center = ((nx + 1) / 2 * 640, (ny + 1) / 2 * 480)
+    return DetectionResult(True, center, None, 0.9)
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        MecanumMapper(_config(mode="bang-bang"))
+
+
+def test_pid_converges_with_irregular_frame_intervals():
+    mapper = MecanumMapper(_config())
+    # 模拟跟随：小车按指令移动，目标相对参考点的误差随之减小
+    ex, ey, t = 0.8, -0.6, 0.0
+    intervals = [0.033, 0.05, 0.1, 0.04]
+    for step in range(200):
+        vector = mapper.calculate(_detection(ex, ey), timestamp=t)
+        dt = intervals[step % len(intervals)]
+        ex -= vector.vx * dt
+        ey -= vector.vy * dt
+        t += dt
+    assert abs(ex) < 0.02 and abs(ey) < 0.02
+
+
+def test_pid_anti_windup_bounds_integral():
+    pid = PIDController(kp=1.0, ki=5.0, kd=0.0, derivative_tau=0.0, integral_limit=0.5, output_limit=1.0)
+    for _ in range(100):
+        assert pid.update(2.0, 0.1) == 1.0
+    # 输出饱和期间积分不再累积，误差反向后立即退出饱和
+    assert pid.integral < 0.5
+    assert pid.update(-0.5, 0.1) < 0.5
+
+
+def test_pid_resets_on_large_frame_gap():
+    mapper = MecanumMapper(_config(ki=1.0))
+    mapper.calculate(_detection(0.5, 0.0), timestamp=0.0)
+    mapper.calculate(_detection(0.5, 0.0), timestamp=0.1)
+    assert mapper._pid_x.integral > 0
+    mapper.calculate(_detection(0.5, 0.0), timestamp=10.0)
+    assert mapper._pid_x.integral == 0.0
+
+
+def test_aquarium_normalization_maps_corners_to_unit_square():
+    bounds = AquariumBounds((80, 60), (590, 40), (620, 450), (40, 420))
+    mapper = MecanumMapper(_config(normalization="aquarium", mode="proportional"), bounds)
+    expected = [(-1, -1), (1, -1), (1, 1), (-1, 1)]
+    for corner, target in zip([bounds.top_left, bounds.top_right, bounds.bottom_right, bounds.bottom_left], expected):
+        assert mapper.normalize_center(corner) == pytest.approx(target, abs=1e-6)
+    # 未标定时回退到按画面尺寸归一化
+    fallback = MecanumMapper(_config(normalization="aquarium"))
+    assert fallback.normalize_center((320, 240)) == (0.0, 0.0)
@@ -0,0 +1,89 @@
+"""可视化叠加层缓存测试。"""
+
+from dataclasses import replace
+
+import numpy as np
+
+from src.aquarium_calibration import AquariumBounds
+from src.config_loader import VisualizationConfig
+from src.overlays import BOUNDS_COLOR, StaticOverlay, TrajectoryLayer
+from src.trajectory_recorder import TrajectoryRecorder
+
+SHAPE = (240, 320, 3)
+
+
+def _add(recorder: TrajectoryRecorder, start: int, stop: int) -> None:
+    for i in range(start, stop):
+        angle = i * 0.2
+        recorder._append((float(i), 0.8 * np.cos(angle), 0.8 * np.sin(angle), 0.0, 0.0, 0.0, i % 7 != 0))
+
+
+def _full_render(recorder: TrajectoryRecorder, max_points: int) -> np.ndarray:
+    layer = TrajectoryLayer(max_points=max_points)
+    layer.update(recorder, SHAPE)
+    display = np.zeros(SHAPE, np.uint8)
+    layer.composite(display)
+    return display
+
+
+def test_incremental_updates_match_full_redraw():
+    recorder = TrajectoryRecorder(max_points=1000)
+    layer = TrajectoryLayer(max_points=100)
+    for stop in range(5, 60, 5):
+        _add(recorder, stop - 5, stop)
+        layer.update(recorder, SHAPE)
+    display = np.zeros(SHAPE, np.uint8)
+    layer.composite(display)
+
+    assert layer.redraws == 1
+    np.testing.assert_array_equal(display, _full_render(recorder, 100))
+
+
+def test_redraws_on_extent_change_clear_and_window_overflow():
+    recorder = TrajectoryRecorder(max_points=1000)
+    layer = TrajectoryLayer(max_points=10)
+    _add(recorder, 0, 10)
+    layer.update(recorder, SHAPE)
+    assert layer.redraws == 1
+
+    _add(recorder, 10, 25)  # 图层中超过 2 * max_points 个点
+    layer.update(recorder, SHAPE)
+    assert layer.redraws == 2
+
+    recorder._append((30.0, 1.7, 0.0, 0.0, 0.0, 0.0, True))  # 超出 -1~1
+    layer.update(recorder, SHAPE)
+    assert layer.redraws == 3 and layer._extent == (-1.0, 2.0, -1.0, 1.0)
+
+    recorder.clear()
+    layer.update(recorder, SHAPE)
+    assert layer.redraws == 4
+    display = np.zeros(SHAPE, np.uint8)
+    layer.composite(display)
+    assert not display.any()
+
+
+def test_static_overlay_rebuilds_only_when_inputs_change():
+    config = VisualizationConfig(
+        enabled=False, window_name="test", show_vectors=False, show_fps=False,
+        show_aquarium_bounds=True, show_relative_coords=False, show_trajectory=False,
+    )
+    bounds = AquariumBounds((40, 40), (280, 40), (280, 200), (40, 200))
+    overlay = StaticOverlay()
+    for _ in range(3):
+        display = np.full(SHAPE, 50, np.uint8)
+        overlay.composite(display, config, bounds)
+    assert overlay.rebuilds == 1
+    assert tuple(display[120, 40]) == BOUNDS_COLOR  # 左边线
+    assert tuple(display[120, 160]) == (50, 50, 50)  # 内部不受影响
+
+    bounds.top_left = (60, 40)  # 重新标定（原地修改）
+    overlay.composite(display, config, bounds)
+    overlay.composite(display, replace(config, show_fps=True), bounds)
+    overlay.composite(display, replace(config, show_aquarium_bounds=False), None)
+    assert overlay.rebuilds == 3
+
+    # HUD 开关不影响预渲染图层，也不会遮住画面
+    display = np.full(SHAPE, 50, np.uint8)
+    overlay.composite(display, replace(config, show_aquarium_bounds=False, show_vectors=True, show_fps=True), None)
+    assert overlay.rebuilds == 3
+    assert (display == 50).all()
@@ -0,0 +1,61 @@
+"""事件驱动安全停车测试。"""
+
+import time
+from dataclasses import replace
+
+from src.config_loader import SerialConfig
+from src.motion_mapping import MotionVector
+from src.safety import SafetyManager
+from src.serial_comm import SerialBridge
+
+
+class FakeSerial:
+    is_open = True
+
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+
+def _attached(watchdog_timeout: float = 0.5) -> tuple[SafetyManager, SerialBridge]:
+    config = SerialConfig(
+        port="/dev/null", baudrate=9600, timeout=0.1, heartbeat_interval=0.0, watchdog_timeout=watchdog_timeout,
+    )
+    bridge = SerialBridge(config)
+    bridge._serial = FakeSerial()
+    bridge._connected.set()
+    safety = SafetyManager(watchdog_timeout)
+    safety.attach(bridge)
+    return safety, bridge
+
+
+def test_limit_change_stops_blocked_axis_without_main_loop():
+    safety, bridge = _attached()
+    try:
+        bridge._feed(b"STATUS front=0 back=0 left=0 right=0\r\n")
+        sent = safety.submit(MotionVector(0.3, 0.5, 0.1, True))
+        assert bridge._pending_vector == (30, 50, 10)
+        assert sent.active
+
+        # 读线程解析到前方限位：不经过主循环直接把 vy 清零
+        bridge._feed(b"STATUS front=1 back=0 left=0 right=0\r\n")
+        assert bridge._pending_vector == (30, 0, 10)
+        # 状态没有变化的回复不会重复下发
+        bridge._feed(b"STATUS front=1 back=0 left=0 right=0\r\n")
+        assert safety.stats().limit_stops == 1
+    finally:
+        safety.detach()
+
+
+def test_watchdog_expiry_sends_stop():
+    safety, bridge = _attached(watchdog_timeout=0.05)
+    try:
+        bridge._feed(b"SPEED OK\r\n")
+        safety.submit(MotionVector(0.3, 0.5, 0.0, True))
+        bridge._status = replace(bridge.read_status(), timestamp=time.monotonic() - 1.0)
+        deadline = time.monotonic() + 1.0
+        while safety.stats().watchdog_stops == 0 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert safety.stats().watchdog_stops == 1
+        assert bridge._pending_vector == (0, 0, 0)
+    finally:
+        safety.detach()
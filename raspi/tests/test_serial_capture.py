@@ -0,0 +1,123 @@
+"""串口抓包读写与时序统计测试。"""
+
+import threading
+import time
+from dataclasses import replace
+
+import pytest
+
+from src.config_loader import SerialConfig
+from src.motion_mapping import MotionVector
+from src import serial_capture
+from src.serial_capture import RX, TX, CaptureRecord, CaptureWriter, analyze, read_capture, write_capture
+from src.serial_comm import SerialBridge
+
+
+def test_capture_round_trip_ignores_truncated_tail(tmp_path):
+    path = tmp_path / "serial.cap"
+    writer = CaptureWriter(path)
+    writer.record(TX, 1.0, b"V 10 0 0\n")
+    writer.record(RX, 1.004, b"SPEED OK\r\n")
+    writer.record(TX, 1.0, b"")  # 空数据不记录
+    writer.close()
+    with path.open("ab") as fh:
+        fh.write(b"\x00\x01\x02")
+
+    assert read_capture(path) == [
+        CaptureRecord(1.0, TX, b"V 10 0 0\n"),
+        CaptureRecord(1.004, RX, b"SPEED OK\r\n"),
+    ]
+
+
+def test_capture_queue_is_bounded_and_closed_writer_ignores_records(tmp_path):
+    path = tmp_path / "serial.cap"
+    writer = CaptureWriter(path, max_queued=2)
+    release = threading.Event()
+    write = writer._write
+
+    def slow_write(*args):
+        # 模拟磁盘卡顿：第一条记录写盘时阻塞，后续记录堆积在队列中
+        release.wait(2.0)
+        write(*args)
+
+    writer._write = slow_write
+    for i in range(6):
+        writer.record(TX, float(i), b"x")
+        time.sleep(0.01)
+    assert writer.dropped == 3
+    release.set()
+    writer.close()
+    writer.record(RX, 9.0, b"late")  # 关闭后到达的数据被忽略
+    assert [record.timestamp for record in read_capture(path)] == [0.0, 1.0, 2.0]
+
+
+def test_close_does_not_raise_when_writer_is_stuck(tmp_path, monkeypatch):
+    monkeypatch.setattr(serial_capture, "_CLOSE_TIMEOUT", 0.05)
+    writer = CaptureWriter(tmp_path / "serial.cap", max_queued=1)
+    release = threading.Event()
+    writer._write = lambda *args: release.wait(2.0)
+    for i in range(3):
+        writer.record(TX, float(i), b"x")
+        time.sleep(0.01)
+    writer.close()  # 队列已满且写盘卡住，不能抛出 queue.Full
+    assert writer.dropped == 2
+    release.set()
+
+
+def test_write_capture_keeps_every_record(tmp_path):
+    path = tmp_path / "replay.cap"
+    records = [CaptureRecord(i * 1e-3, i % 2, b"V 1 0 0\n") for i in range(20000)]
+    write_capture(path, records)
+    assert read_capture(path) == records
+
+
+def test_read_capture_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a capture")
+    with pytest.raises(ValueError):
+        read_capture(path)
+
+
+def test_analyze_gaps_latency_and_bursts():
+    records = [
+        CaptureRecord(0.000, TX, b"V 1 0 0\n"),
+        CaptureRecord(0.003, RX, b"SPEED OK\r\n"),
+        CaptureRecord(0.050, TX, b"V 2 0 0\n"),
+        CaptureRecord(0.051, TX, b"PING 1\n"),
+        CaptureRecord(0.052, TX, b"V 3 0 0\n"),
+        CaptureRecord(0.060, RX, b"SPEED OK\r\n"),
+        CaptureRecord(0.100, TX, b"V 4 0 0\n"),
+    ]
+    stats = analyze(records)
+
+    assert stats.command_gaps.count == 4
+    assert stats.command_gaps.max == pytest.approx(0.05)
+    assert stats.reply_latency.count == 2
+    assert stats.reply_latency.max == pytest.approx(0.008)
+    assert stats.unanswered == 3
+    assert (stats.bursts, stats.max_burst) == (1, 3)
+    assert stats.tx_bytes == sum(len(r.data) for r in records if r.direction == TX)
+
+
+def test_bridge_captures_both_directions(tmp_path):
+    config = SerialConfig(
+        port="/dev/null", baudrate=9600, timeout=0.1, heartbeat_interval=0.0, watchdog_timeout=0.5,
+    )
+    bridge = SerialBridge(replace(config, capture_path=str(tmp_path / "link.cap")))
+
+    class FakeSerial:
+        is_open = True
+
+        def write(self, data):
+            return len(data)
+
+    bridge._serial = FakeSerial()
+    bridge._connected.set()
+    bridge._capture = CaptureWriter(tmp_path / "link.cap")
+    bridge.send_vector(MotionVector(0.1, 0.0, 0.0, True))
+    bridge._write_pending()
+    bridge._feed(b"SPEED OK\r\n")
+    bridge._capture.close()
+
+    records = read_capture(tmp_path / "link.cap")
+    assert [(r.direction, r.data) for r in records] == [(TX, b"V 10 0 0\n"), (RX, b"SPEED OK\r\n")]
@@ -0,0 +1,220 @@
+"""SerialBridge 收发测试。"""
+
+import threading
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+
+from src import serial_protocol as proto
+from src.config_loader import SerialConfig
+from src.motion_mapping import MotionVector
+from src import serial_comm
+from src.serial_comm import SerialBridge
+
+CONFIG = SerialConfig(
+    port="/dev/null",
+    baudrate=9600,
+    timeout=0.1,
+    heartbeat_interval=1.0,
+    watchdog_timeout=0.5,
+)
+
+
+class FakeSerial:
+    is_open = True
+
+    def __init__(self) -> None:
+        self.writes: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.writes.append(bytes(data))
+        return len(data)
+
+    def reset_input_buffer(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.is_open = False
+
+
+def _bridge(**overrides) -> tuple[SerialBridge, FakeSerial]:
+    bridge = SerialBridge(replace(CONFIG, **overrides))
+    fake = FakeSerial()
+    bridge._serial = fake
+    bridge._connected.set()
+    return bridge, fake
+
+
+def test_mailbox_keeps_only_latest_command():
+    bridge, fake = _bridge()
+    bridge.send_vector(MotionVector(0.1, 0.0, 0.0, True))
+    bridge.send_vector(MotionVector(0.2, 0.0, 0.0, True))
+    bridge.send_vector(MotionVector(0.3, -0.5, 0.0, True))
+    bridge._write_pending()
+    assert fake.writes == [b"V 30 -50 0\n"]
+    assert bridge.writer_stats().dropped == 2
+
+
+def test_repeats_suppressed_until_keepalive():
+    bridge, fake = _bridge(keepalive_interval=60.0)
+    for _ in range(3):
+        bridge.send_vector(MotionVector(0.0, 0.0, 0.0, False))
+        bridge._write_pending()
+    assert fake.writes == [b"V 0 0 0\n"]
+    assert bridge.writer_stats().suppressed == 2
+
+    bridge, fake = _bridge(keepalive_interval=0.0)
+    for _ in range(3):
+        bridge.send_vector(MotionVector(0.0, 0.0, 0.0, False))
+        bridge._write_pending()
+    assert len(fake.writes) == 3
+
+
+def test_heartbeat_coalesced_with_vector():
+    bridge, fake = _bridge()
+    bridge.send_vector(MotionVector(0.5, 0.5, 0.0, True))
+    bridge.send_heartbeat()
+    bridge._write_pending()
+    assert fake.writes == [b"V 50 50 0\nPING 1\n"]
+    assert bridge.writer_stats().coalesced == 1
+
+    bridge, fake = _bridge(coalesce_heartbeat=False)
+    bridge.send_vector(MotionVector(0.5, 0.5, 0.0, True))
+    bridge.send_heartbeat()
+    bridge._write_pending()
+    assert fake.writes == [b"V 50 50 0\n", b"PING 1\n"]
+
+
+def test_reader_parses_chunks_incrementally_and_counts_errors():
+    bridge, _ = _bridge()
+    seen = []
+    bridge.add_listener(seen.append)
+    stream = (
+        b"READY\r\nSTATUS front=1 back=0 left=0 right=1\r\nSPEED OK\r\n"
+        b"COLLISION_FRONT\r\nSPEED ERR\r\nCMD ERR\r\nUNKNOWN\r\ngarbage\r\n"
+        + proto.encode_reply(proto.REPLY_ACK, 3, proto.STATUS_LEFT | proto.STATUS_COLLISION)
+    )
+    # 任意切分，模拟按块到达
+    for i in range(0, len(stream), 5):
+        bridge._feed(stream[i:i + 5])
+
+    kinds = [message.kind for message in seen]
+    assert kinds == [
+        proto.MSG_READY, proto.MSG_STATUS, proto.MSG_SPEED_OK, proto.MSG_COLLISION,
+        proto.MSG_SPEED_ERR, proto.MSG_CMD_ERR, proto.MSG_UNKNOWN, proto.MSG_ACK,
+    ]
+    stats = bridge.link_stats()
+    assert stats.bytes_received == len(stream)
+    assert (stats.speed_errors, stats.command_errors, stats.unknown_replies) == (1, 1, 1)
+    assert stats.collisions == 2
+    assert stats.parse_errors == 1
+    status = bridge.read_status()
+    assert dict(status.limits) == {"front": False, "rear": False, "left": True, "right": False}
+
+
+def test_ping_round_trip_latency_is_tracked():
+    bridge, fake = _bridge()
+    for seq in (1, 2, 3):
+        bridge.send_heartbeat()
+        bridge._write_pending()
+        assert fake.writes[-1] == f"PING {seq}\n".encode()
+        bridge._feed(f"STATUS front=0 back=0 left=0 right=0\r\nPONG {seq}\r\n".encode())
+    # 未知序号的 PONG 不计入统计
+    bridge._feed(b"PONG 200\r\n")
+
+    stats = bridge.latency_stats()
+    assert stats.samples == 3
+    assert stats.lost == 0
+    assert 0 <= stats.p50 <= stats.p95 <= stats.max
+    assert sum(stats.histogram) == 3
+    assert bridge.read_status().rtt == stats.last
+
+
+def test_status_on_change_only_keeps_limits_and_liveness():
+    bridge, _ = _bridge()
+    bridge._feed(b"STATUS front=1 back=0 left=0 right=0\r\n")
+    bridge._status = replace(bridge.read_status(), timestamp=0.0)
+    # V 指令只回复 SPEED OK：限位沿用最近一次上报，时间戳刷新
+    bridge._feed(b"SPEED OK\r\n")
+    status = bridge.read_status()
+    assert status.timestamp > 0.0
+    assert status.limits["front"] is True
+    # 二进制协议下限位变化以 STATUS 帧上报
+    bridge._feed(proto.encode_reply(proto.REPLY_STATUS, 0, proto.STATUS_RIGHT))
+    assert dict(bridge.read_status().limits) == {"front": False, "rear": False, "left": False, "right": True}
+    assert bridge.link_stats().status_updates == 2
+
+
+def test_reconnect_rediscovers_port_by_usb_id_and_resets_queue(monkeypatch):
+    bridge, old = _bridge(usb_vid=0x2341, usb_pid=0x0043)
+    bridge._running = True
+    ports = [
+        SimpleNamespace(device="/dev/ttyUSB0", vid=0x1A86, pid=0x7523),
+        SimpleNamespace(device="/dev/ttyACM1", vid=0x2341, pid=0x0043),
+    ]
+    opened = []
+
+    def fake_serial(port, baudrate, timeout):
+        opened.append(port)
+        return FakeSerial()
+
+    monkeypatch.setattr(serial_comm.list_ports, "comports", lambda: ports)
+    monkeypatch.setattr(serial_comm.serial, "Serial", fake_serial)
+
+    bridge.send_vector(MotionVector(0.5, 0.0, 0.0, True))
+    bridge._rx_buffer += b"STATUS fr"
+    bridge._ping_rtt.sent(1, 0.0)
+
+    assert bridge._reconnect()
+    assert opened == ["/dev/ttyACM1"]
+    assert old.is_open is False
+    assert bridge._connected.is_set()
+    assert bridge._pending_vector is None
+    assert not bridge._rx_buffer
+    assert bridge.link_stats().reconnects == 1
+    # 断线前未回复的 PING 不计为丢失
+    assert bridge.latency_stats().lost == 0
+
+    # 重连后第一条指令不受去重影响
+    bridge.send_vector(MotionVector(0.5, 0.0, 0.0, True))
+    bridge._write_pending()
+    assert bridge._serial.writes == [b"V 50 0 0\n"]
+
+
+def test_link_loss_detected_from_ready_errors_and_silence():
+    bridge, _ = _bridge(link_error_threshold=3, link_loss_factor=4.0)
+    # 协商过的链路收到 READY：固件已复位
+    bridge.protocol = "binary"
+    bridge._feed(b"READY\r\n")
+    with pytest.raises(serial_comm.LinkLostError):
+        bridge._check_link(bridge._last_message)
+    bridge._check_link(bridge._last_message)
+
+    # 连续乱码（有效消息之间的错误不累计）
+    bridge._feed(b"x1\r\nx2\r\nSPEED OK\r\nx3\r\nx4\r\n")
+    bridge._check_link(bridge._last_message)
+    bridge._feed(b"x5\r\n")
+    with pytest.raises(serial_comm.LinkLostError):
+        bridge._check_link(bridge._last_message)
+
+    # 超过 4 * watchdog_timeout 未收到有效消息
+    bridge._check_link(bridge._last_message + 1.9)
+    with pytest.raises(serial_comm.LinkLostError):
+        bridge._check_link(bridge._last_message + 2.1)
+
+
+def test_writer_failure_without_reconnect_marks_bridge_disconnected():
+    bridge, fake = _bridge(reconnect=False)
+
+    def broken_write(data):
+        raise serial_comm.serial.SerialException("device disconnected")
+
+    fake.write = broken_write
+    bridge._running = True
+    thread = threading.Thread(target=bridge._write_loop, daemon=True)
+    thread.start()
+    bridge.send_vector(MotionVector(0.5, 0.0, 0.0, True))
+    thread.join(timeout=1.0)
+    assert not thread.is_alive()
+    assert not bridge._connected.is_set()
@@ -0,0 +1,42 @@
+"""串口二进制协议编解码测试。"""
+
+from src import serial_protocol as proto
+
+
+def test_crc8_matches_smbus_check_value():
+    assert proto.crc8(b"123456789") == 0xF4
+
+
+def test_encode_command_layout():
+    frame = proto.encode_command(proto.CMD_VECTOR, 300, -100, 127, -1)
+    assert len(frame) == proto.HOST_FRAME_LEN
+    assert frame[0] == proto.HOST_SYNC
+    assert frame[1:6] == bytes((proto.CMD_VECTOR, 300 & 0xFF, 156, 127, 255))
+    assert frame[6] == proto.crc8(frame[1:6])
+
+
+def test_split_stream_handles_mixed_and_partial_input():
+    reply = proto.encode_reply(proto.REPLY_ACK, 7, proto.STATUS_FRONT | proto.STATUS_SPEED_ERR)
+    corrupt = bytearray(proto.encode_reply(proto.REPLY_PONG, 8, 0))
+    corrupt[3] ^= 0xFF
+    buffer = bytearray(b"READY\r\n" + reply + bytes(corrupt) + b"PROTO BIN OK\n" + reply[:3])
+
+    items = proto.split_stream(buffer)
+
+    assert items[0] == "READY"
+    assert items[1] == proto.ReplyFrame(proto.REPLY_ACK, 7, proto.STATUS_FRONT | proto.STATUS_SPEED_ERR)
+    assert items[1].limits == {"front": True, "rear": False, "left": False, "right": False}
+    assert isinstance(items[2], proto.CrcError)
+    assert items[-1] == "PROTO BIN OK"
+    # 不完整的帧保留在缓冲区中
+    assert bytes(buffer) == reply[:3]
+    buffer += reply[3:]
+    assert proto.split_stream(buffer) == [items[1]]
+    assert not buffer
+
+
+def test_command_latency_bound_covers_longest_text_command():
+    longest = b"V -127 -127 -127\n"
+    assert len(longest) == proto.MAX_TEXT_COMMAND_LEN
+    bound = proto.command_latency_bound(115200, len(longest))
+    assert bound == len(longest) * 10 / 115200 + proto.FIRMWARE_PROCESSING_BOUND
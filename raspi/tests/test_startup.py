@@ -0,0 +1,49 @@
+"""启动时间线与并行初始化测试。"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.main import Application
+from src.startup import StartupTimeline
+
+
+def test_timeline_records_phases_in_start_order_and_first_mark():
+    timeline = StartupTimeline()
+    with timeline.phase("config"):
+        time.sleep(0.01)
+    assert timeline.run("camera", lambda value: value * 2, 21) == 42
+    first = timeline.mark("first_command")
+    assert timeline.mark("first_command") == first  # 只记录第一次
+
+    phases = timeline.phases
+    assert [phase.name for phase in phases] == ["config", "camera"]
+    assert all(phase.ok for phase in phases)
+    assert phases[0].duration >= 0.01
+    assert phases[1].start >= phases[0].start + phases[0].duration
+
+
+def test_parallel_init_waits_for_all_and_raises_first_error():
+    timeline = StartupTimeline()
+    finished = []
+
+    def slow_detector():
+        time.sleep(0.05)
+        finished.append("detector")
+
+    def broken_serial():
+        raise OSError("串口设备不存在")
+
+    app = SimpleNamespace(
+        timeline=timeline,
+        _load_detector=slow_detector,
+        camera=SimpleNamespace(open=lambda: finished.append("camera")),
+        serial=SimpleNamespace(open=broken_serial),
+    )
+    with pytest.raises(OSError, match="串口"):
+        Application._initialize_subsystems(app)
+    # 失败不会打断其他初始化线程，失败的阶段同样记录在时间线中
+    assert sorted(finished) == ["camera", "detector"]
+    status = {phase.name: phase.ok for phase in timeline.phases}
+    assert status == {"detector": True, "camera": True, "serial": False}
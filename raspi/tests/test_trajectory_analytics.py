@@ -0,0 +1,73 @@
+"""轨迹统计分析测试。"""
+
+import numpy as np
+import pytest
+
+from src import trajectory_analytics
+from src.trajectory_analytics import TrajectoryAnalyzer, analyze, iter_input, write_report
+from src.trajectory_log import TrajectoryLogWriter
+from src.trajectory_recorder import TRAJECTORY_DTYPE
+
+
+def _session(n: int = 101) -> np.ndarray:
+    # 10 Hz，前 5 s 以 0.2/s 沿 +x 运动（激活），之后静止
+    array = np.zeros(n, dtype=TRAJECTORY_DTYPE)
+    t = np.arange(n) * 0.1
+    array["timestamp"] = t
+    array["x"] = -0.5 + 0.2 * np.minimum(t, 5.0)
+    array["active"] = t < 5.0 - 1e-9
+    array["vx"] = np.where(array["active"], 0.2, 0.0)
+    return array
+
+
+def test_metrics_on_synthetic_session():
+    report = analyze([_session()], grid=10, histogram_bins=8, max_speed=1.0)
+    assert report.duration == pytest.approx(10.0)
+    assert report.active_ratio == pytest.approx(0.5)
+    assert report.distance == pytest.approx(1.0)
+    assert report.occupancy.sum() == pytest.approx(10.0)
+    # 速度只有 0.2（5 s）与 0（5 s）两档
+    assert report.speed.values[0] == pytest.approx(5.0)
+    assert report.speed.values[1] == pytest.approx(5.0)
+    # 运动中 y=0 行穿过 5 个网格
+    assert report.coverage == pytest.approx(6 / 100)
+
+
+def test_speed_uses_recorded_velocity_on_simplified_input():
+    # 简化后只剩关键点（间隔接近 1 s，.trjz 量化后可能略超过 1 s），速度不应被区间平均
+    array = _session()[[0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]]
+    array["timestamp"][1:] += 0.001
+    array["vx"][array["active"]] = [0.15, 0.35, 0.15, 0.35, 0.25]
+    report = analyze([array], histogram_bins=8, max_speed=0.8)
+    assert report.duration == pytest.approx(10.001)
+    assert report.speed.values[1] == pytest.approx(2.001)  # 0.1 ~ 0.2
+    assert report.speed.values[3] == pytest.approx(2.0)  # 0.3 ~ 0.4
+    assert report.acceleration.values.sum() == 9
+
+
+def test_chunked_processing_matches_single_pass(monkeypatch):
+    array = _session(57)
+    array["timestamp"][30:] += 5.0  # 一个超过 max_gap 的间隔
+    whole = analyze([array])
+    monkeypatch.setattr(trajectory_analytics, "CHUNK_ROWS", 7)
+    analyzer = TrajectoryAnalyzer()
+    analyzer.feed(array[:20])
+    analyzer.feed(array[20:])
+    chunked = analyzer.report()
+    assert chunked.duration == pytest.approx(whole.duration)
+    np.testing.assert_allclose(chunked.occupancy, whole.occupancy)
+    np.testing.assert_allclose(chunked.speed.values, whole.speed.values)
+    np.testing.assert_array_equal(chunked.acceleration.values, whole.acceleration.values)
+
+
+def test_log_directory_to_report_files(tmp_path):
+    writer = TrajectoryLogWriter(tmp_path / "log")
+    for record in _session().tolist():
+        writer.append(record)
+    writer.close()
+
+    report = analyze(iter_input(tmp_path / "log"))
+    assert report.points == 101
+    write_report(report, tmp_path / "out")
+    names = {path.name for path in (tmp_path / "out").iterdir()}
+    assert {"summary.csv", "occupancy.png", "speed_histogram.csv"} <= names
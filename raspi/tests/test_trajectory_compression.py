@@ -0,0 +1,108 @@
+"""轨迹在线简化与差分 varint 编码测试。"""
+
+import math
+
+import numpy as np
+import pytest
+
+from src.motion_mapping import MotionVector
+from src.trajectory_compression import POSITION_QUANTUM, StreamingSimplifier, decode_records, encode_records
+from src.trajectory_log import TrajectoryLogReader, TrajectoryLogWriter, load_segment
+from src.trajectory_recorder import TRAJECTORY_DTYPE, TrajectoryRecorder
+
+
+def _path() -> list[tuple]:
+    """10 Hz：2 s 直线，1 s 静止（未激活），再沿半径 0.3 的圆弧运动 3 s"""
+    records = []
+    for i in range(60):
+        t = i * 0.1
+        if t < 2.0:
+            x, y, active = -0.5 + 0.25 * t, 0.0, True
+        elif t < 3.0:
+            x, y, active = 0.0, 0.0, False
+        else:
+            angle = (t - 3.0) * math.pi / 3
+            x, y, active = 0.3 * math.sin(angle), 0.3 - 0.3 * math.cos(angle), True
+        records.append((t, x, y, 0.25, 0.0, 0.0, active))
+    return records
+
+
+def _distance_to_segment(p, a, b) -> float:
+    d = np.subtract(b, a)
+    length2 = float(d @ d)
+    t = 0.0 if length2 == 0 else min(1.0, max(0.0, float(np.subtract(p, a) @ d) / length2))
+    return float(np.hypot(*(np.subtract(p, a) - t * d)))
+
+
+def test_simplified_path_stays_within_tolerance():
+    tolerance = 0.005
+    simplifier = StreamingSimplifier(tolerance, max_interval=1.0)
+    records = _path()
+    kept = [k for r in records for k in simplifier.push(r)] + simplifier.flush()
+
+    assert len(kept) < len(records) / 2
+    assert simplifier.points_in == len(records) and simplifier.points_out == len(kept)
+    times = [k[0] for k in kept]
+    assert times == sorted(times) and kept[0] == records[0] and kept[-1] == records[-1]
+    assert max(b - a for a, b in zip(times, times[1:])) <= 1.0 + 1e-9
+
+    worst = 0.0
+    for t, x, y, *_ in records:
+        i = max(0, np.searchsorted(times, t, side="right") - 1)
+        j = min(i + 1, len(kept) - 1)
+        worst = max(worst, _distance_to_segment((x, y), kept[i][1:3], kept[j][1:3]))
+    assert worst <= tolerance
+    assert simplifier.max_error == pytest.approx(worst, abs=1e-12)
+
+
+def test_activity_transitions_are_kept():
+    simplifier = StreamingSimplifier(0.01, max_interval=10.0)
+    records = _path()
+    kept = {k[0] for r in records for k in simplifier.push(r)} | {k[0] for k in simplifier.flush()}
+    # 最后一个激活点、第一个未激活点、最后一个未激活点与其后第一个激活点
+    assert {records[19][0], records[20][0], records[29][0], records[30][0]} <= kept
+
+
+def test_codec_round_trip_with_independent_chunks():
+    rng = np.random.default_rng(1)
+    array = np.zeros(300, dtype=TRAJECTORY_DTYPE)
+    array["timestamp"] = 12345.0 + np.cumsum(rng.uniform(0.05, 0.2, 300))
+    array["x"] = rng.uniform(-1, 1, 300)
+    array["y"] = np.cumsum(rng.normal(0, 0.01, 300))
+    array["omega"] = rng.uniform(-1, 1, 300)
+    array["active"] = rng.random(300) > 0.3
+    payload = encode_records(array[:120]) + encode_records(array[120:])
+    decoded = decode_records(payload, [120, 180])
+
+    assert np.abs(decoded["x"] - array["x"]).max() <= POSITION_QUANTUM / 2 + 1e-12
+    assert np.abs(decoded["timestamp"] - array["timestamp"]).max() <= 5e-4 + 1e-9
+    assert decoded["active"].tolist() == array["active"].tolist()
+    assert len(payload) < array.nbytes / 3
+
+
+def test_compressed_log_round_trip_ignores_torn_chunk(tmp_path):
+    writer = TrajectoryLogWriter(tmp_path, compress=True, batch_size=8)
+    for i in range(20):
+        writer.append((i * 0.1, 0.01 * i, 0.0, 0.1, 0.0, 0.0, True))
+    writer.close()
+    assert writer.compression_ratio > 3
+
+    (segment,) = TrajectoryLogReader(tmp_path).segments()
+    assert segment.suffix == ".trjz"
+    with segment.open("ab") as fh:
+        fh.write(b"\x05\x00\x00\x00\x40\x00\x00\x00\x01")
+    array = load_segment(segment)
+    assert array["x"] == pytest.approx([0.01 * i for i in range(20)])
+
+
+def test_recorder_stores_key_points_and_exposes_pending_tail():
+    recorder = TrajectoryRecorder(max_points=100, sample_interval=0.0, simplifier=StreamingSimplifier(0.001))
+    vector = MotionVector(0.5, 0.0, 0.0, True)
+    now = recorder._last_update
+    for i in range(1, 8):
+        recorder.update(vector, now=now + 0.1 * i)
+    assert len(recorder.points) == 1  # 直线：只有起点已确定
+    assert recorder.pending_point().x == pytest.approx(0.3)
+    recorder.flush()
+    assert recorder.points.x.tolist() == pytest.approx([0.0, 0.3])
+    assert recorder.pending_point() is None
@@ -0,0 +1,76 @@
+"""流式轨迹日志测试。"""
+
+import numpy as np
+
+from src.motion_mapping import MotionVector
+from src.trajectory_log import TrajectoryLogReader, TrajectoryLogWriter, load_segment
+from src.trajectory_recorder import TRAJECTORY_DTYPE, TrajectoryRecorder
+
+
+def _record(i: int) -> tuple:
+    return (float(i), float(i), -float(i), 0.1, 0.2, 0.0, i % 2 == 0)
+
+
+def test_rotation_and_lazy_round_trip(tmp_path):
+    # 每个分段约 10 条记录，batch_size=4 触发多次写入与轮转
+    rotate_bytes = 16 + 10 * TRAJECTORY_DTYPE.itemsize
+    writer = TrajectoryLogWriter(tmp_path, rotate_bytes=rotate_bytes, batch_size=4)
+    for i in range(50):
+        writer.append(_record(i))
+    writer.close()
+
+    assert writer.points_written == 50
+    reader = TrajectoryLogReader(tmp_path)
+    assert reader.sessions() == [writer.session]
+    segments = reader.segments()
+    assert len(segments) == writer.segments > 1
+    assert isinstance(load_segment(segments[0]), np.memmap)
+
+    view = reader.load()
+    assert view.timestamp.tolist() == [float(i) for i in range(50)]
+    assert view.y[-1] == -49.0
+    assert view.active.tolist() == [i % 2 == 0 for i in range(50)]
+    assert len(view.segments) == writer.segments
+    assert all(isinstance(segment.array, np.memmap) for segment in view.segments)
+    assert view[25].x == 25.0 and view[-1].timestamp == 49.0
+    assert [point.x for point in view] == [float(i) for i in range(50)]
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    writer = TrajectoryLogWriter(tmp_path)
+    for i in range(3):
+        writer.append(_record(i))
+    writer.close()
+    (segment,) = TrajectoryLogReader(tmp_path).segments()
+    with segment.open("ab") as fh:
+        fh.write(b"\x00" * (TRAJECTORY_DTYPE.itemsize // 2))
+
+    assert load_segment(segment)["x"].tolist() == [0.0, 1.0, 2.0]
+
+
+def test_recorder_streams_samples_beyond_max_points(tmp_path):
+    writer = TrajectoryLogWriter(tmp_path)
+    recorder = TrajectoryRecorder(max_points=2, sample_interval=0.0, log=writer)
+    vector = MotionVector(0.5, 0.0, 0.0, True)
+    for _ in range(5):
+        recorder.update(vector)
+    writer.close()
+
+    assert len(recorder.points) == 2
+    assert len(TrajectoryLogReader(tmp_path).load()) == 5
+
+
+def test_disk_error_stops_writer(tmp_path, monkeypatch):
+    def fail(fd):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr("src.trajectory_log.os.fsync", fail)
+    writer = TrajectoryLogWriter(tmp_path, flush_interval=0.01, fsync_interval=0.0, batch_size=1)
+    writer.append(_record(0))
+    writer._thread.join(timeout=2.0)
+
+    assert not writer._thread.is_alive()
+    assert writer._fh is None
+    writer.append(_record(1))
+    assert writer._queue.empty()
+    writer.close()
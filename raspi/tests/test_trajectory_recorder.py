@@ -0,0 +1,94 @@
+"""轨迹记录器环形缓冲区与积分测试。"""
+
+import json
+import math
+
+import numpy as np
+import pytest
+
+from src.firmware_emulator import calculate_mecanum
+from src.motion_mapping import MotionVector
+from src.trajectory_recorder import TrajectoryPoint, TrajectoryRecorder, wheel_speeds_to_velocity
+
+
+def _fill(recorder: TrajectoryRecorder, xs) -> None:
+    for i, x in enumerate(xs):
+        recorder._append((float(i), float(x), -float(x), 0.1, 0.2, 0.0, i % 2 == 0))
+
+
+def test_recent_points_are_zero_copy_views_in_order_across_wrap():
+    recorder = TrajectoryRecorder(max_points=4)
+    _fill(recorder, [1, 2, 3, 4, 5, 6])
+
+    recent = recorder.get_recent_points(3)
+    assert recent.x.tolist() == [4.0, 5.0, 6.0]
+    assert np.shares_memory(recent.array, recorder._buffer)
+    assert recorder.points.timestamp.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert recorder.points[-1] == TrajectoryPoint(5.0, 6.0, -6.0, 0.1, 0.2, 0.0, False)
+    assert len(recorder.get_recent_points(100)) == 4
+
+
+def test_bounds_follow_evicted_extremes():
+    recorder = TrajectoryRecorder(max_points=3)
+    _fill(recorder, [5, -5, 1])
+    assert recorder.get_bounds() == (-5.0, -5.0, 5.0, 5.0)
+    _fill(recorder, [2, 3])  # 淘汰 5 与 -5
+    assert recorder.get_bounds() == (1.0, -3.0, 3.0, -1.0)
+    recorder.clear()
+    assert recorder.get_bounds() == (0.0, 0.0, 0.0, 0.0)
+
+
+def test_save_load_keeps_json_format(tmp_path):
+    recorder = TrajectoryRecorder(max_points=5)
+    _fill(recorder, [1, 2, 3])
+    path = tmp_path / "trajectory.json"
+    recorder.save(path)
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["metadata"] == {"total_points": 3, "duration": 2.0}
+    assert data["points"][0] == {
+        "timestamp": 0.0, "x": 1.0, "y": -1.0, "vx": 0.1, "vy": 0.2, "omega": 0.0, "active": True,
+    }
+
+    loaded = TrajectoryRecorder(max_points=2)
+    loaded.load(path)
+    assert [p.x for p in loaded.get_points()] == [2.0, 3.0]
+    assert (loaded.current_x, loaded.current_y) == (3.0, -3.0)
+
+
+def test_every_command_is_integrated_between_samples():
+    recorder = TrajectoryRecorder(max_points=10, sample_interval=1.0)
+    recorder.update(MotionVector(1.0, 0.0, 0.0, True), now=recorder._last_update)
+    start = recorder._last_update
+    # 采样间隔内指令切换：前 0.2 s 向 +x，之后 0.3 s 停止，再 0.5 s 向 +y
+    recorder.update(MotionVector(0.0, 0.0, 0.0, False), now=start + 0.2)
+    recorder.update(MotionVector(0.0, 1.0, 0.0, True), now=start + 0.5)
+    recorder.update(MotionVector(0.0, 0.0, 0.0, False), now=start + 1.0)
+    assert (recorder.current_x, recorder.current_y) == pytest.approx((0.2, 0.5))
+    assert len(recorder.points) == 1
+
+
+def test_constant_omega_follows_exact_arc_with_irregular_steps():
+    recorder = TrajectoryRecorder(max_points=10)
+    vector = MotionVector(0.5, 0.0, 2 * math.pi, True)
+    now = recorder._last_update
+    recorder.update(vector, now=now)
+    # 一整圈（1 s）用不均匀的步长积分后回到原点
+    for step in (0.37, 0.05, 0.21, 0.3, 0.07):
+        now += step
+        recorder.update(vector, now=now)
+    assert recorder.current_x == pytest.approx(0.0, abs=1e-12)
+    assert recorder.current_y == pytest.approx(0.0, abs=1e-12)
+
+
+def test_wheel_speed_feedback_inverts_firmware_mixing():
+    commanded = (0.3, -0.2, 0.05)
+    speeds = calculate_mecanum(*(round(v * 100) for v in commanded))
+    assert wheel_speeds_to_velocity(speeds) == pytest.approx(commanded)
+
+    recorder = TrajectoryRecorder(max_points=10)
+    now = recorder._last_update
+    # 指令为停止，但轮速反馈显示仍在以 vx=0.3 运动
+    recorder.update(MotionVector(0.0, 0.0, 0.0, False), wheel_speeds=(30, 30, 30, 30), now=now)
+    recorder.update(MotionVector(0.0, 0.0, 0.0, False), now=now + 1.0)
+    assert recorder.current_x == pytest.approx(0.3)
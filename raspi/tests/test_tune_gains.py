@@ -0,0 +1,56 @@
+"""离线调参工具测试。"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.config_loader import load_config
+from src.tune_gains import SessionData, fit_plant, load_session, write_overlay
+
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "default.yaml"
+
+
+def test_fit_plant_recovers_command_gain():
+    rng = np.random.default_rng(0)
+    n = 400
+    timestamps = np.cumsum(rng.uniform(0.03, 0.06, n))
+    commands = rng.uniform(-1, 1, (n, 2))
+    targets = np.zeros((n, 2))
+    for k in range(n - 1):
+        dt = timestamps[k + 1] - timestamps[k]
+        targets[k + 1] = targets[k] - np.array([0.7, 1.3]) * commands[k] * dt
+    plant = fit_plant(SessionData(timestamps, targets, commands), max_dt=0.5)
+    np.testing.assert_allclose(plant.gain, (0.7, 1.3), rtol=1e-6)
+    np.testing.assert_allclose(plant.disturbance, 0.0, atol=1e-9)
+
+
+def test_overlay_applies_tuned_parameters(tmp_path):
+    overlay = tmp_path / "tuned.yaml"
+    write_overlay(overlay, {"gain_x": 1.25, "min_speed": 0.05})
+    base = load_config(CONFIG_PATH)
+    tuned = load_config(CONFIG_PATH, [overlay])
+    assert tuned.motion_mapping.gain_x == 1.25
+    assert tuned.motion_mapping.min_speed == 0.05
+    assert tuned.motion_mapping.gain_y == base.motion_mapping.gain_y
+    assert tuned.serial == base.serial
+
+
+def test_session_requires_recorded_commands_from_same_session(tmp_path):
+    config = load_config(CONFIG_PATH).motion_mapping
+    detections = tmp_path / "detections.csv"
+    detections.write_text("timestamp,has_target,cx,cy,confidence\n10.0,1,320,240,0.9\n10.1,1,330,240,0.9\n")
+    trajectory = tmp_path / "trajectory.json"
+    points = [{"timestamp": 10.05, "vx": 0.5, "vy": 0.0, "active": True}]
+    trajectory.write_text(json.dumps({"points": points}))
+    session = load_session(config, detections, trajectory)
+    np.testing.assert_allclose(session.commands, [[0.0, 0.0], [0.5, 0.0]])
+
+    # 其他会话的轨迹（时间不重叠）或空轨迹不能用于拟合
+    trajectory.write_text(json.dumps({"points": [{**points[0], "timestamp": 50.0}]}))
+    with pytest.raises(ValueError):
+        load_session(config, detections, trajectory)
+    trajectory.write_text(json.dumps({"points": []}))
+    with pytest.raises(ValueError):
+        load_session(config, detections, trajectory)